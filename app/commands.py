@@ -0,0 +1,24 @@
+# app/commands.py
+
+import click
+
+from app import db
+from app.services.template_artifacts import compile_missing_artifacts, refresh_template_artifacts
+
+
+def register_commands(app):
+    """注册 flask 命令行命令"""
+
+    @app.cli.command('compile-templates')
+    @click.option('--all', 'rebuild_all', is_flag=True, help='同时重新编译全部已有产物')
+    def compile_templates(rebuild_all):
+        """
+        编译模板产物：为缺少产物的已发布版本（如在引入产物之前发布的模板）补建产物。
+        页面请求只读取产物，升级数据库（flask db upgrade）后执行一次。
+        """
+        count = compile_missing_artifacts()
+        db.session.commit()
+        click.echo(f"新编译 {count} 个模板产物")
+        if rebuild_all:
+            changed = refresh_template_artifacts()
+            click.echo("已重新编译全部产物" + ("" if changed else "（均无变化）"))
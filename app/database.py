@@ -0,0 +1,48 @@
+# app/database.py
+
+from sqlalchemy import event
+
+
+def normalize_database_uri(uri):
+    """部分平台提供的 postgres:// 前缀在 SQLAlchemy 中已不再支持，统一为 postgresql://"""
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def build_engine_options(config):
+    """
+    根据配置生成 SQLALCHEMY_ENGINE_OPTIONS。
+
+    连接池参数只用于基于文件或网络的数据库；SQLite 内存数据库使用单连接池，不接受这些参数。
+    """
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite') and (':memory:' in uri or uri in ('sqlite://', 'sqlite:///')):
+        return options
+    options['pool_size'] = config['DB_POOL_SIZE']
+    options['max_overflow'] = config['DB_MAX_OVERFLOW']
+    options['pool_recycle'] = config['DB_POOL_RECYCLE']
+    return options
+
+
+def configure_sqlite(engine, config):
+    """
+    为 SQLite 的每个新连接设置 PRAGMA：
+    WAL 日志模式允许读写并发，synchronous=NORMAL 在 WAL 下仍保证一致性，
+    busy_timeout 让写入在锁被占用时等待而不是立即报 "database is locked"；
+    SQLite 默认不检查外键，开启 foreign_keys 后 ondelete='CASCADE' 等外键约束才会生效。
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if ':memory:' not in str(engine.url) and engine.url.database:
+            cursor.execute(f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.execute(f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}")
+        cursor.execute(f"PRAGMA foreign_keys={'ON' if config['SQLITE_FOREIGN_KEYS'] else 'OFF'}")
+        cursor.close()
@@ -0,0 +1,284 @@
+# app/instrumentation.py
+
+import bisect
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# 直方图的桶上界（最后一个桶为无穷大）
+TIME_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+MAX_LOGGED_STATEMENT = 2000
+_EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+
+# ==============================================================================
+# 统计
+# ==============================================================================
+
+class Histogram:
+    """固定分桶的直方图，记录次数、总和与最大值"""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """按桶估计分位数（返回所在桶的上界，落在最后一个桶时返回最大值）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "avg": round(self.total / self.count, 3) if self.count else None,
+            "max": round(self.max, 3),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": [{"le": bound, "count": count}
+                        for bound, count in zip(list(self.bounds) + ['+Inf'], self.counts)]
+        }
+
+
+class EndpointMetrics:
+    """一个端点的请求统计：总耗时、数据库耗时、查询次数、响应大小"""
+
+    __slots__ = ('total_ms', 'db_ms', 'queries', 'response_bytes', 'errors')
+
+    def __init__(self):
+        self.total_ms = Histogram(TIME_BUCKETS_MS)
+        self.db_ms = Histogram(TIME_BUCKETS_MS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.errors = 0
+
+    def to_dict(self):
+        return {
+            "requests": self.total_ms.count,
+            "errors": self.errors,
+            "total_ms": self.total_ms.to_dict(),
+            "db_ms": self.db_ms.to_dict(),
+            "queries": self.queries.to_dict(),
+            "response_bytes": self.response_bytes.to_dict()
+        }
+
+
+class MetricsRegistry:
+    """进程内的端点统计与最近的慢查询；多进程部署时每个进程各自统计"""
+
+    def __init__(self, slow_log_size):
+        self._lock = threading.Lock()
+        self._slow_log_size = slow_log_size
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self.endpoints = {}
+            self.slow_queries = deque(maxlen=self._slow_log_size)
+
+    def record_request(self, endpoint, metrics, total_ms, response_bytes, status_code):
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointMetrics()
+            stats.total_ms.observe(total_ms)
+            stats.db_ms.observe(metrics.db_ms)
+            stats.queries.observe(metrics.queries)
+            if response_bytes is not None:
+                stats.response_bytes.observe(response_bytes)
+            if status_code >= 500:
+                stats.errors += 1
+
+    def record_slow_query(self, entry):
+        with self._lock:
+            self.slow_queries.append(entry)
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {name: stats.to_dict() for name, stats in self.endpoints.items()}
+            slow_queries = list(self.slow_queries)
+            started_at = self.started_at
+        ordered = dict(sorted(endpoints.items(), key=lambda item: item[1]["total_ms"]["sum"], reverse=True))
+        return {"started_at": started_at, "endpoints": ordered, "slow_queries": slow_queries}
+
+
+class RequestMetrics:
+    """当前请求的计数，保存在 flask.g 中"""
+
+    __slots__ = ('start', 'queries', 'db_ms', 'stages')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.stages = {}
+
+
+def _current():
+    if not has_request_context():
+        return None
+    return g.get('request_metrics')
+
+
+@contextmanager
+def stage(name):
+    """
+    记录请求中一个阶段（如文档转换、文档拼接）的耗时，出现在 Server-Timing 响应头中。
+    不在请求中（后台任务、命令行）或未启用统计时不记录。
+    """
+    metrics = _current()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.stages[name] = metrics.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+# ==============================================================================
+# 慢查询
+# ==============================================================================
+
+def _explain(cursor, dialect, statement, parameters):
+    """
+    在同一个数据库连接上获取查询计划。直接使用 DBAPI 游标，不会再次触发本模块的事件。
+    PostgreSQL 中语句失败会中止整个事务，因此放在保存点内执行。
+    """
+    if dialect == 'sqlite':
+        sql = f"EXPLAIN QUERY PLAN {statement}"
+    elif dialect == 'postgresql':
+        sql = f"EXPLAIN {statement}"
+    else:
+        return None
+    explain_cursor = cursor.connection.cursor()
+    try:
+        if dialect == 'postgresql':
+            explain_cursor.execute("SAVEPOINT yoo_explain")
+        try:
+            explain_cursor.execute(sql, parameters)
+            rows = explain_cursor.fetchall()
+        except Exception as e:
+            if dialect == 'postgresql':
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT yoo_explain")
+            return f"(无法获取查询计划: {e})"
+        if dialect == 'postgresql':
+            explain_cursor.execute("RELEASE SAVEPOINT yoo_explain")
+    finally:
+        explain_cursor.close()
+    if dialect == 'sqlite':
+        # (id, parent, notused, detail)
+        return '\n'.join(str(row[-1]) for row in rows)
+    return '\n'.join(str(row[0]) for row in rows)
+
+
+# ==============================================================================
+# 挂载到应用
+# ==============================================================================
+
+def _server_timing(metrics, total_ms):
+    parts = [f'db;desc="{metrics.queries} queries";dur={metrics.db_ms:.1f}']
+    parts.extend(f'{name};dur={duration:.1f}' for name, duration in metrics.stages.items())
+    parts.append(f'total;dur={total_ms:.1f}')
+    return ', '.join(parts)
+
+
+def init_instrumentation(app, engine):
+    """
+    为应用启用请求性能统计：
+
+    - 通过 SQLAlchemy 的 before/after_cursor_execute 事件统计每个请求的查询次数与数据库耗时；
+    - 通过 Flask 的 before/after_request 统计总耗时与响应大小，写入 Server-Timing 响应头，
+      并按端点汇总为直方图（见 /admin/api/metrics）；
+    - 超过 SLOW_QUERY_MS 的查询写入日志，SELECT 语句附带查询计划（EXPLAIN）。
+    """
+    if not app.config['METRICS_ENABLED']:
+        return
+    registry = MetricsRegistry(app.config['SLOW_QUERY_LOG_SIZE'])
+    app.extensions['metrics'] = registry
+    slow_query_ms = app.config['SLOW_QUERY_MS']
+    explain_slow = app.config['SLOW_QUERY_EXPLAIN']
+    server_timing = app.config['METRICS_SERVER_TIMING']
+    logger = app.logger
+    dialect = engine.dialect.name
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'handle_error')
+    def discard_failed_query(exception_context):
+        # 执行失败的语句不会触发 after_cursor_execute
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_start'):
+            conn.info['query_start'].pop()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info['query_start'].pop()) * 1000
+        metrics = _current()
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_ms += elapsed_ms
+
+        if not slow_query_ms or elapsed_ms < slow_query_ms:
+            return
+        plan = None
+        if explain_slow and not executemany and _EXPLAINABLE.match(statement):
+            plan = _explain(cursor, dialect, statement, parameters)
+        endpoint = request.endpoint if has_request_context() else None
+        logger.warning("慢查询 %.1fms [%s]: %s%s", elapsed_ms, endpoint or '-',
+                       statement[:MAX_LOGGED_STATEMENT], f"\n查询计划:\n{plan}" if plan else '')
+        registry.record_slow_query({
+            "at": time.time(),
+            "endpoint": endpoint,
+            "duration_ms": round(elapsed_ms, 3),
+            "statement": statement[:MAX_LOGGED_STATEMENT],
+            "plan": plan
+        })
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_metrics = RequestMetrics()
+
+    @app.after_request
+    def finish_request_metrics(response):
+        metrics = g.pop('request_metrics', None)
+        if metrics is None:
+            return response
+        total_ms = (time.perf_counter() - metrics.start) * 1000
+        # 流式响应（如文件下载）没有预先确定的长度时不统计大小
+        registry.record_request(request.endpoint or '(unmatched)', metrics, total_ms,
+                                response.content_length, response.status_code)
+        if server_timing:
+            response.headers['Server-Timing'] = _server_timing(metrics, total_ms)
+        return response
+
+    return registry
@@ -3,7 +3,7 @@
 # to make them easily accessible from 'app.models'.
 
 # Import models from project.py
-from .project import Project, FixedFormData
+from .project import Project, FixedFormData, SheetRevision
 
 # Import models from template_definition.py
 from .template_definition import (
@@ -13,20 +13,27 @@ from .template_definition import (
     FieldDefinition,
     ValidationRule,
     ConditionalRule,
-    WordTemplateChapter
+    WordTemplateChapter,
+    ChapterPlaceholder,
+    CompiledTemplate
 )
 
 # Import models from the new dynamic_data.py
 from .dynamic_data import DynamicTableRow
 
+# Import models from job.py
+from .job import Job
+
 # It's a good practice to define __all__ to specify what gets imported
 # when a client does 'from app.models import *'
 __all__ = [
     # from project
-    'Project', 'FixedFormData',
+    'Project', 'FixedFormData', 'SheetRevision',
     # from template_definition
     'Template', 'Section', 'SheetDefinition', 'FieldDefinition',
-    'ValidationRule', 'ConditionalRule', 'WordTemplateChapter',
+    'ValidationRule', 'ConditionalRule', 'WordTemplateChapter', 'ChapterPlaceholder', 'CompiledTemplate',
     # from dynamic_data
-    'DynamicTableRow'
+    'DynamicTableRow',
+    # from job
+    'Job'
 ]
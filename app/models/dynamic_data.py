@@ -4,6 +4,10 @@ from sqlalchemy.types import JSON
 class DynamicTableRow(db.Model):
     """动态表格行数据存储表"""
     __tablename__ = 'dynamic_table_row'
+    __table_args__ = (
+        # 与按项目、表单加载并排序行数据的查询一致
+        db.Index('ix_dynamic_table_row_project_sheet_order', 'project_id', 'sheet_id', 'display_order'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -20,6 +24,9 @@ class DynamicTableRow(db.Model):
     # 行的显示顺序
     display_order = db.Column(db.Integer, nullable=False, default=0)
 
+    # 该行最后一次被写入时的项目修订号
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     # 关系定义 (可选，但有助于查询)
     sheet_definition = db.relationship('SheetDefinition')
     project = db.relationship('Project')
\ No newline at end of file
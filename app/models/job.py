@@ -0,0 +1,36 @@
+from app import db
+
+
+class Job(db.Model):
+    """后台任务表（如Excel/Word导出），由本地工作进程池执行"""
+    __tablename__ = 'job'
+    __table_args__ = (
+        # 用于查找相同参数、相同数据修订号的在途或已完成任务，避免重复生成
+        db.Index('ix_job_dedupe', 'job_type', 'project_id', 'section_name', 'data_revision'),
+        # 相同参数、相同数据修订号和模板产物的在途任务最多一个，防止并发提交时重复生成（为空时视为相同）
+        db.Index('uq_job_active', 'job_type', 'project_id', db.text("coalesce(section_name, '')"), 'data_revision',
+                 db.text("coalesce(template_etag, '')"),
+                 unique=True,
+                 sqlite_where=db.text("status IN ('queued', 'running')"),
+                 postgresql_where=db.text("status IN ('queued', 'running')")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # 任务类型: 'excel' 或 'word'
+    job_type = db.Column(db.String(20), nullable=False)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
+    # 导出的分区名称；为空表示整个项目
+    section_name = db.Column(db.String(100))
+    # 提交任务时项目的数据修订号
+    data_revision = db.Column(db.Integer, nullable=False, default=0)
+    # 提交任务时项目所用模板产物的摘要（CompiledFormsConfig.export_etag），模板重新发布或切换版本后不再复用
+    template_etag = db.Column(db.String(40))
+    # 状态: 'queued', 'running', 'done', 'failed'
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    result_path = db.Column(db.String(500))
+    # 下载时使用的文件名
+    result_name = db.Column(db.String(300))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
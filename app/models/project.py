@@ -4,17 +4,44 @@ from app import db
 
 class Project(db.Model):
     """项目表"""
+    __table_args__ = (
+        # 项目列表按 (created_at, id) 倒序游标分页，可按采购方式筛选
+        db.Index('ix_project_created_at_id', 'created_at', 'id'),
+        db.Index('ix_project_method_created_at_id', 'procurement_method', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     number = db.Column(db.String(100), nullable=False)
     procurement_method = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
+    # 项目数据的单调递增修订号，任意表单写入都会使其加一
+    data_revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
 
 class FixedFormData(db.Model):
     """固定表单数据存储表"""
+    __table_args__ = (
+        # 每个项目、表单中一个字段只有一行，支持按此键直接 upsert；
+        # 其前缀 (project_id, sheet_name) 同时服务于按表单加载数据的查询
+        db.UniqueConstraint('project_id', 'sheet_name', 'field_name', name='uq_fixed_form_data_field'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
     sheet_name = db.Column(db.String(100), nullable=False)
     field_name = db.Column(db.String(100), nullable=False)
     field_value = db.Column(db.Text)
+    # 该值最后一次被写入时的项目修订号
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+class SheetRevision(db.Model):
+    """表单修订号表，用于增量保存时的乐观并发控制"""
+    __table_args__ = (db.UniqueConstraint('project_id', 'sheet_name', name='uq_sheet_revision_project_sheet'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
+    sheet_name = db.Column(db.String(100), nullable=False)
+    # 该表单最后一次被写入时的项目修订号
+    revision = db.Column(db.Integer, nullable=False, default=0)
@@ -7,6 +7,9 @@ from sqlalchemy.types import JSON
 class Template(db.Model):
     """模板表，代表一种采购方式"""
     __tablename__ = 'template'
+    # 与按采购方式查找已发布最新版本的查询一致
+    __table_args__ = (db.Index('ix_template_name_status_latest', 'name', 'status', 'is_latest'),)
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     version = db.Column(db.Integer, nullable=False, default=1)
@@ -20,12 +23,15 @@ class Template(db.Model):
     sections = relationship("Section", back_populates="template", cascade="all, delete-orphan",
                             order_by="Section.display_order")
     parent = relationship("Template", remote_side=[id])
+    # 发布时编译的表单配置（见 services/template_artifacts.py），随模板版本一起删除
+    compiled = relationship("CompiledTemplate", back_populates="template", uselist=False,
+                            cascade="all, delete-orphan")
 
 
 class Section(db.Model):
     """分区表，模板内的逻辑分组"""
     id = db.Column(db.Integer, primary_key=True)
-    template_id = db.Column(db.Integer, db.ForeignKey('template.id', ondelete='CASCADE'), nullable=False)
+    template_id = db.Column(db.Integer, db.ForeignKey('template.id', ondelete='CASCADE'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     display_order = db.Column(db.Integer, nullable=False, default=0)
 
@@ -42,9 +48,10 @@ class WordTemplateChapter(db.Model):
     """章节Word模板表，存储每个章节的.docx文件信息"""
     __tablename__ = 'word_template_chapter'
     id = db.Column(db.Integer, primary_key=True)
-    section_id = db.Column(db.Integer, db.ForeignKey('section.id', ondelete='CASCADE'), nullable=False)
+    section_id = db.Column(db.Integer, db.ForeignKey('section.id', ondelete='CASCADE'), nullable=False, index=True)
     filename = db.Column(db.String(255), nullable=False)
-    filepath = db.Column(db.String(512), nullable=False)
+    # 文件内容的 SHA-256，文件保存在内容寻址存储中（见 services/blob_store.py），多个章节可共用一个文件
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
     display_order = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
@@ -52,12 +59,31 @@ class WordTemplateChapter(db.Model):
     section = relationship("Section", back_populates="chapters")
     # 关系定义: 一个章节模板可以被一个Sheet关联 (一对一)
     sheet_definition = relationship("SheetDefinition", back_populates="word_template_chapter", uselist=False)
+    # 上传时从文档中提取的占位符
+    placeholders = relationship("ChapterPlaceholder", back_populates="chapter", cascade="all, delete-orphan",
+                                order_by="ChapterPlaceholder.field_name")
+
+    @property
+    def filepath(self):
+        """章节文档在存储中的路径；没有文件时为空字符串"""
+        from app.services.blob_store import blob_path
+        return blob_path(self.content_hash) if self.content_hash else ''
+
+
+class ChapterPlaceholder(db.Model):
+    """章节文档中使用的占位符 {{field_name}}，上传时提取一次；按字段名索引，用于查找依赖某字段的章节"""
+    __tablename__ = 'chapter_placeholder'
+    chapter_id = db.Column(db.Integer, db.ForeignKey('word_template_chapter.id', ondelete='CASCADE'),
+                           primary_key=True)
+    field_name = db.Column(db.String(100), primary_key=True, index=True)
+
+    chapter = relationship("WordTemplateChapter", back_populates="placeholders")
 
 
 class SheetDefinition(db.Model):
     """Sheet 定义表，代表一个具体的表单或表格"""
     id = db.Column(db.Integer, primary_key=True)
-    section_id = db.Column(db.Integer, db.ForeignKey('section.id', ondelete='CASCADE'), nullable=False)
+    section_id = db.Column(db.Integer, db.ForeignKey('section.id', ondelete='CASCADE'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     sheet_type = db.Column(db.String(50), nullable=False)  # 'fixed_form' 或 'dynamic_table'
     display_order = db.Column(db.Integer, nullable=False, default=0)
@@ -93,6 +119,8 @@ class FieldDefinition(db.Model):
     # True 表示导出选项的 'label'，False 表示导出 'value'
     export_word_as_label = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
     export_excel_as_label = db.Column(db.Boolean, nullable=False, default=True, server_default='1')
+    # 动态表格列：是否为该列建立表达式索引，用于在数据库中按列筛选、排序和汇总（见 services/dynamic_query.py）
+    is_indexed = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
 
     sheet = relationship("SheetDefinition", back_populates="fields")
     validation_rules = relationship("ValidationRule", back_populates="field", cascade="all, delete-orphan")
@@ -101,7 +129,7 @@ class FieldDefinition(db.Model):
 class ValidationRule(db.Model):
     """基础校验规则表"""
     id = db.Column(db.Integer, primary_key=True)
-    field_id = db.Column(db.Integer, db.ForeignKey('field_definition.id', ondelete='CASCADE'), nullable=False)
+    field_id = db.Column(db.Integer, db.ForeignKey('field_definition.id', ondelete='CASCADE'), nullable=False, index=True)
     rule_type = db.Column(db.String(50), nullable=False)
     rule_value = db.Column(db.String(255))
     message = db.Column(db.String(255))
@@ -112,9 +140,36 @@ class ValidationRule(db.Model):
 class ConditionalRule(db.Model):
     """联动规则表，存储字段间的复杂逻辑"""
     id = db.Column(db.Integer, primary_key=True)
-    sheet_id = db.Column(db.Integer, db.ForeignKey('sheet_definition.id', ondelete='CASCADE'), nullable=False)
+    sheet_id = db.Column(db.Integer, db.ForeignKey('sheet_definition.id', ondelete='CASCADE'), nullable=False, index=True)
     name = db.Column(db.String(255), nullable=False)
     # 使用 JSON 类型来存储复杂的规则定义对象
     definition = db.Column(JSON, nullable=False)
 
     sheet = relationship("SheetDefinition", back_populates="conditional_rules")
+
+
+class CompiledTemplate(db.Model):
+    """
+    模板版本发布时编译生成的不可变产物：前端表单配置（含校验规则与联动规则依赖图）、
+    导出所需的分区/表单/章节结构及章节占位符表。项目页面和导出只读取这一行，不再遍历定义表。
+    每次编译整体替换，不做局部修改。
+    """
+    __tablename__ = 'compiled_template'
+    # 按采购方式查找当前生效的产物
+    __table_args__ = (db.Index('ix_compiled_template_name_active', 'name', 'is_active'),)
+
+    template_id = db.Column(db.Integer, db.ForeignKey('template.id', ondelete='CASCADE'), primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    # 已发布且为最新版本时为 True，每个模板名称最多一行
+    is_active = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
+    # /api/forms-config 的响应正文（JSON 文本）及其 ETag
+    config = db.Column(db.Text, nullable=False)
+    etag = db.Column(db.String(40), nullable=False)
+    # 导出与预览所需的结构: [{"name", "sheets": [...], "chapters": [...]}]
+    sections = db.Column(JSON, nullable=False)
+    # 章节ID -> 章节文档中的占位符名称列表
+    placeholders = db.Column(JSON, nullable=False)
+    compiled_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    template = relationship("Template", back_populates="compiled")
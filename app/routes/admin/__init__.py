@@ -1 +1,80 @@
 # This file makes the 'admin' directory a Python package.
+from flask import g, request
+from app import db
+from app.models import Section, SheetDefinition, FieldDefinition, ConditionalRule, WordTemplateChapter
+from app.services.signals import notify_template_changed
+
+# 视图参数 -> 查询其所属模板ID
+_TEMPLATE_LOOKUPS = {
+    'section_id': lambda v: db.session.query(Section.template_id).filter(Section.id == v),
+    'sheet_id': lambda v: db.session.query(Section.template_id).join(SheetDefinition)
+        .filter(SheetDefinition.id == v),
+    'field_id': lambda v: db.session.query(Section.template_id).join(SheetDefinition).join(FieldDefinition)
+        .filter(FieldDefinition.id == v),
+    'rule_id': lambda v: db.session.query(Section.template_id).join(SheetDefinition).join(ConditionalRule)
+        .filter(ConditionalRule.id == v),
+    'chapter_id': lambda v: db.session.query(Section.template_id).join(WordTemplateChapter)
+        .filter(WordTemplateChapter.id == v),
+}
+# 只在请求体的 order 列表中给出记录ID的排序接口: 端点 -> 记录ID的类型
+_REORDER_ENDPOINTS = {
+    'admin_sections_sheets.reorder_sections': 'section_id',
+    'admin_word_templates.reorder_chapters': 'chapter_id',
+}
+
+
+def _lookup_template_id(arg, value):
+    if arg == 'template_id':
+        return value
+    try:
+        return _TEMPLATE_LOOKUPS[arg](int(value)).scalar()
+    except (TypeError, ValueError):
+        return None
+
+
+def _resolve_changed_template():
+    """
+    写操作执行前确定受影响的模板：依次使用视图参数、请求体中的 template_id/section_id/sheet_id、
+    排序列表中的第一条记录。删除操作在执行前查询，记录仍然存在。
+    """
+    for arg, value in (request.view_args or {}).items():
+        if arg == 'template_id' or arg in _TEMPLATE_LOOKUPS:
+            return _lookup_template_id(arg, value)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None
+    for arg in ('template_id', 'section_id', 'sheet_id'):
+        if data.get(arg) is not None:
+            return _lookup_template_id(arg, data[arg])
+    arg = _REORDER_ENDPOINTS.get(request.endpoint)
+    order = data.get('order')
+    if arg and isinstance(order, list) and order:
+        return _lookup_template_id(arg, order[0])
+    return None
+
+
+def _is_write():
+    return request.method not in ('GET', 'HEAD', 'OPTIONS')
+
+
+def remember_changed_template():
+    """蓝图级 before_request 钩子：记录写操作将要修改的模板"""
+    if _is_write():
+        g.changed_template_id = _resolve_changed_template()
+
+
+def notify_template_changed_on_write(response):
+    """
+    蓝图级 after_request 钩子：成功的写操作（非GET请求）修改了模板定义，
+    通知该模板的缓存和编译产物更新；无法确定模板时通知全部。
+    """
+    template_id = g.pop('changed_template_id', None)
+    if _is_write() and response.status_code < 400:
+        notify_template_changed(template_id)
+    return response
+
+
+def track_template_changes(blueprint):
+    """为修改模板定义的蓝图注册以上两个钩子"""
+    blueprint.before_request(remember_changed_template)
+    blueprint.after_request(notify_template_changed_on_write)
@@ -3,9 +3,13 @@
 from flask import Blueprint, jsonify, request, render_template
 from sqlalchemy.orm import joinedload
 from app import db
+from app.routes.admin import track_template_changes
 from app.models import SheetDefinition, FieldDefinition, ValidationRule, Section
+from app.services.dynamic_query import refresh_field_indexes
+from app.services.reorder import apply_display_order, ReorderError
 
 admin_fields_bp = Blueprint('admin_fields', __name__, url_prefix='/admin')
+track_template_changes(admin_fields_bp)
 
 # 字段类型中，哪些需要提供选项列表
 FIELD_TYPES_REQUIRING_OPTIONS = ['select', 'select-multiple', 'radio', 'checkbox-group']
@@ -35,6 +39,7 @@ def admin_sheet_fields(sheet_id):
             "display_order": field.display_order,
             "export_word_as_label": field.export_word_as_label,
             "export_excel_as_label": field.export_excel_as_label,
+            "is_indexed": field.is_indexed,
             "validation_rules": [{"rule_type": rule.rule_type, "rule_value": rule.rule_value} for rule in field.validation_rules]
         }
         fields_json.append(field_dict)
@@ -81,7 +86,8 @@ def create_field(sheet_id):
             options=options_data, default_value=data.get('default_value'),
             help_tip=data.get('help_tip'), display_order=new_order,
             export_word_as_label=data.get('export_word_as_label', False),
-            export_excel_as_label=data.get('export_excel_as_label', True)
+            export_excel_as_label=data.get('export_excel_as_label', True),
+            is_indexed=bool(data.get('is_indexed', False))
         )
         db.session.add(new_field)
         db.session.flush()
@@ -92,6 +98,8 @@ def create_field(sheet_id):
                 db.session.add(ValidationRule(field_id=new_field.id, rule_type=rule_type, rule_value=str(rule_value)))
 
         db.session.commit()
+        if new_field.is_indexed:
+            refresh_field_indexes()
         return jsonify({"message": "新字段创建成功", "id": new_field.id}), 201
     except Exception as e:
         db.session.rollback()
@@ -103,8 +111,11 @@ def delete_field(field_id):
     """删除一个字段"""
     try:
         field = FieldDefinition.query.get_or_404(field_id)
+        was_indexed = field.is_indexed
         db.session.delete(field)
         db.session.commit()
+        if was_indexed:
+            refresh_field_indexes()
         return jsonify({"message": "字段已成功删除"})
     except Exception as e:
         db.session.rollback()
@@ -116,6 +127,8 @@ def update_field(field_id):
     """更新一个字段的属性"""
     try:
         field = FieldDefinition.query.get_or_404(field_id)
+        # 表达式索引按 (列名, 类型) 建立
+        index_key = (field.is_indexed, field.field_type)
         data = request.json
         field_type = data.get('field_type', field.field_type)
         options_data = field.options
@@ -139,6 +152,8 @@ def update_field(field_id):
             field.export_word_as_label = data.get('export_word_as_label')
         if 'export_excel_as_label' in data:
             field.export_excel_as_label = data.get('export_excel_as_label')
+        if 'is_indexed' in data:
+            field.is_indexed = bool(data.get('is_indexed'))
 
         ValidationRule.query.filter_by(field_id=field_id).delete()
         validation_data = data.get('validation', {})
@@ -147,6 +162,8 @@ def update_field(field_id):
                 db.session.add(ValidationRule(field_id=field_id, rule_type=rule_type, rule_value=str(rule_value)))
 
         db.session.commit()
+        if index_key != (field.is_indexed, field.field_type) and (field.is_indexed or index_key[0]):
+            refresh_field_indexes()
         return jsonify({"message": f"字段 '{field.label}' 更新成功"})
     except Exception as e:
         db.session.rollback()
@@ -158,13 +175,13 @@ def reorder_fields(sheet_id):
     """更新字段在表单内的显示顺序"""
     try:
         data = request.json
-        field_ids = data.get('order', [])
-        for index, field_id in enumerate(field_ids):
-            field = FieldDefinition.query.get(field_id)
-            if field and field.sheet_id == int(sheet_id):
-                field.display_order = index
+        apply_display_order(FieldDefinition, data.get('order', []),
+                            owner_column=FieldDefinition.sheet_id, owner_id=sheet_id)
         db.session.commit()
         return jsonify({"message": "字段顺序更新成功"})
+    except ReorderError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
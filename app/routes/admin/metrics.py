@@ -0,0 +1,34 @@
+# app/routes/admin/metrics.py
+
+from flask import Blueprint, current_app, jsonify
+
+admin_metrics_bp = Blueprint('admin_metrics', __name__, url_prefix='/admin/api')
+
+# ==============================================================================
+# 性能统计 API
+# ==============================================================================
+
+def _registry():
+    return current_app.extensions.get('metrics')
+
+
+@admin_metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    当前进程自启动（或上次清空）以来各端点的统计直方图：总耗时、数据库耗时（毫秒）、
+    查询次数、响应大小（字节），按总耗时之和降序排列；以及最近的慢查询及其查询计划。
+    """
+    registry = _registry()
+    if registry is None:
+        return jsonify({"error": "性能统计未启用（METRICS_ENABLED）"}), 404
+    return jsonify(registry.snapshot())
+
+
+@admin_metrics_bp.route('/metrics', methods=['DELETE'])
+def reset_metrics():
+    """清空统计，用于对比优化前后的数据"""
+    registry = _registry()
+    if registry is None:
+        return jsonify({"error": "性能统计未启用（METRICS_ENABLED）"}), 404
+    registry.reset()
+    return jsonify({"message": "性能统计已清空"})
@@ -12,5 +12,5 @@ def route_admin_templates_list():
     渲染后台模板管理的主页面。
     这个页面会列出所有可用的模板。
     """
-    templates = Template.query.order_by(Template.id.asc()).all()
+    templates = Template.query.order_by(Template.display_order.asc(), Template.id.asc()).all()
     return render_template('admin/admin_templates.html', templates=templates)
@@ -2,35 +2,29 @@
 
 from flask import Blueprint, jsonify, request
 from app import db
+from app.routes.admin import track_template_changes
 from app.models import ConditionalRule
+from app.services.conditional_rules import RuleCycleError, compile_rule_graph
 
 admin_rules_bp = Blueprint('admin_rules', __name__, url_prefix='/admin/api')
+track_template_changes(admin_rules_bp)
 
 # ==============================================================================
 # 联动规则 (Conditional Rules) 管理 API
 # ==============================================================================
 
-def is_rule_self_referential(definition):
+def check_sheet_rule_cycles(sheet_id, definition, rule_id=None):
     """
-    检查联动规则的触发字段是否也是其目标字段之一，以防止死循环。
+    将待保存的规则与同一表单的其他规则一起编译为依赖图，
+    检查单条规则的自引用以及多条规则之间的循环依赖（如 A→B、B→A）。
+
+    Raises:
+        RuleCycleError: 存在循环依赖。
     """
-    if not isinstance(definition, dict):
-        return False
-    if_clause = definition.get('if')
-    if not isinstance(if_clause, dict):
-        return False
-    trigger_field = if_clause.get('field')
-    if not trigger_field:
-        return False
-    then_clauses = definition.get('then', [])
-    if not isinstance(then_clauses, list):
-        return False
-    for action in then_clauses:
-        if isinstance(action, dict):
-            targets = action.get('targets', [])
-            if isinstance(targets, list) and trigger_field in targets:
-                return True
-    return False
+    query = ConditionalRule.query.with_entities(ConditionalRule.definition).filter_by(sheet_id=sheet_id)
+    if rule_id is not None:
+        query = query.filter(ConditionalRule.id != rule_id)
+    compile_rule_graph([d for (d,) in query.order_by(ConditionalRule.id)] + [definition])
 
 
 @admin_rules_bp.route('/sheets/<int:sheet_id>/conditional_rules', methods=['GET'])
@@ -52,8 +46,10 @@ def create_conditional_rule(sheet_id):
         if not data or not data.get('name') or not data.get('definition'):
             return jsonify({"error": "规则名称和定义为必填项"}), 400
 
-        if is_rule_self_referential(data.get('definition')):
-            return jsonify({"error": "联动规则配置错误：触发条件的字段不能作为目标字段，这会造成死循环。"}), 400
+        try:
+            check_sheet_rule_cycles(sheet_id, data['definition'])
+        except RuleCycleError as e:
+            return jsonify({"error": str(e), "cycle": e.cycle}), 400
 
         new_rule = ConditionalRule(
             sheet_id=sheet_id,
@@ -77,8 +73,10 @@ def update_conditional_rule(rule_id):
         if not data or not data.get('name') or not data.get('definition'):
             return jsonify({"error": "规则名称和定义为必填项"}), 400
 
-        if is_rule_self_referential(data.get('definition')):
-            return jsonify({"error": "联动规则配置错误：触发条件的字段不能作为目标字段，这会造成死循环。"}), 400
+        try:
+            check_sheet_rule_cycles(rule.sheet_id, data['definition'], rule.id)
+        except RuleCycleError as e:
+            return jsonify({"error": str(e), "cycle": e.cycle}), 400
 
         rule.name = data['name']
         rule.definition = data['definition']
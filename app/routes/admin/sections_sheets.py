@@ -2,9 +2,13 @@
 
 from flask import Blueprint, jsonify, request
 from app import db
+from app.routes.admin import track_template_changes
 from app.models import Section, SheetDefinition
+from app.services.dynamic_query import has_indexed_fields, refresh_field_indexes
+from app.services.reorder import apply_display_order, ReorderError
 
 admin_sections_sheets_bp = Blueprint('admin_sections_sheets', __name__, url_prefix='/admin/api')
+track_template_changes(admin_sections_sheets_bp)
 
 
 # ==============================================================================
@@ -16,13 +20,12 @@ def reorder_sections():
     """更新分区在模板内的显示顺序"""
     try:
         data = request.json
-        section_ids = data.get('order', [])
-        for index, section_id in enumerate(section_ids):
-            section = Section.query.get(section_id)
-            if section:
-                section.display_order = index
+        apply_display_order(Section, data.get('order', []), owner_column=Section.template_id)
         db.session.commit()
         return jsonify({"message": "分区顺序更新成功"})
+    except ReorderError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -69,8 +72,11 @@ def delete_section(section_id):
     """删除一个分区及其下的所有内容"""
     try:
         section = Section.query.get_or_404(section_id)
+        indexed = has_indexed_fields(SheetDefinition.section_id == section.id)
         db.session.delete(section)
         db.session.commit()
+        if indexed:
+            refresh_field_indexes()
         return jsonify({"message": "分区已成功删除"})
     except Exception as e:
         db.session.rollback()
@@ -91,12 +97,12 @@ def reorder_sheets():
         if not section_id:
             return jsonify({"error": "缺少section_id"}), 400
 
-        for index, sheet_id in enumerate(sheet_ids):
-            sheet = SheetDefinition.query.get(sheet_id)
-            if sheet and sheet.section_id == int(section_id):
-                sheet.display_order = index
+        apply_display_order(SheetDefinition, sheet_ids, owner_column=SheetDefinition.section_id, owner_id=section_id)
         db.session.commit()
         return jsonify({"message": "Sheet顺序更新成功"})
+    except ReorderError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -134,8 +140,11 @@ def delete_sheet(sheet_id):
     """删除一个表单及其下的所有内容"""
     try:
         sheet = SheetDefinition.query.get_or_404(sheet_id)
+        indexed = has_indexed_fields(SheetDefinition.id == sheet.id)
         db.session.delete(sheet)
         db.session.commit()
+        if indexed:
+            refresh_field_indexes()
         return jsonify({"message": "Sheet已成功删除"})
     except Exception as e:
         db.session.rollback()
@@ -1,8 +1,19 @@
 # app/routes/admin/templates.py
 
-from flask import Blueprint, jsonify, request
+import tempfile
+
+from flask import Blueprint, jsonify, request, send_file
 from app import db
-from app.models import Template
+from app.models import Template, Section, SheetDefinition, WordTemplateChapter, DynamicTableRow
+from app.services.signals import notify_template_changed
+from app.services.blob_store import release_blobs, collect_garbage
+from app.services.dynamic_query import has_indexed_fields, refresh_field_indexes
+from app.services.template_clone import clone_template, delete_template
+from app.services.reorder import apply_display_order, ReorderError
+from app.services.template_archive import write_template_archive, import_template_archive, ArchiveError
+from app.services.template_artifacts import (
+    publish_template, unpublish_template, activate_template, refresh_template_artifacts
+)
 
 # 这个蓝图专门用于管理模板的增删改查 API
 admin_templates_bp = Blueprint('admin_templates', __name__, url_prefix='/admin/api')
@@ -35,3 +46,180 @@ def create_template():
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
+
+
+@admin_templates_bp.route('/templates/<int:template_id>/status', methods=['PUT'])
+def update_template_status(template_id):
+    """
+    切换模板版本的发布状态 (draft / published)。
+
+    发布时编译表单配置产物并与状态变更一同提交；请求体中 activate 为 true 时同时设为最新版本。
+    """
+    try:
+        template = Template.query.get_or_404(template_id)
+        data = request.json or {}
+        status = data.get('status')
+        if status not in ('draft', 'published'):
+            return jsonify({"error": "无效的状态值"}), 400
+
+        if status == 'published':
+            publish_template(template, activate=bool(data.get('activate')))
+        else:
+            unpublish_template(template)
+        db.session.commit()
+        notify_template_changed(template.id)
+        return jsonify({"message": f"模板 V{template.version} 状态已更新为 '{status}'"})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@admin_templates_bp.route('/templates/<int:template_id>/set-active', methods=['POST'])
+def set_template_active(template_id):
+    """将指定版本设为该模板名称下的最新版本，已发布时其配置产物随之生效"""
+    try:
+        template = Template.query.get_or_404(template_id)
+        activate_template(template)
+        db.session.commit()
+        notify_template_changed(template.id)
+        return jsonify({"message": f"V{template.version} 已设为 '{template.name}' 的最新版本"})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@admin_templates_bp.route('/templates/<int:template_id>/clone', methods=['POST'])
+def clone_template_version(template_id):
+    """将指定版本深度复制为同名模板的一个新草稿版本"""
+    source = Template.query.get_or_404(template_id)
+    try:
+        new_template = clone_template(source)
+        db.session.commit()
+        return jsonify({
+            "message": f"已从 V{source.version} 克隆出新版本 V{new_template.version}",
+            "id": new_template.id,
+            "name": new_template.name,
+            "status": new_template.status,
+            "version": new_template.version
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@admin_templates_bp.route('/templates/<int:template_id>/version', methods=['DELETE'])
+def delete_template_version(template_id):
+    """
+    删除模板的一个版本。存在其他版本时，不能删除当前的最新版本。
+
+    动态表格行按写入时的表单保存，此版本表单下的行移到最新版本的同名动态表格，
+    最新版本中没有同名动态表格时不能删除。
+    """
+    template = Template.query.get_or_404(template_id)
+    try:
+        if template.is_latest and Template.query.filter(
+                Template.name == template.name, Template.id != template.id).first():
+            return jsonify({"error": "不能删除当前的最新版本，请先将其他版本设为最新"}), 400
+
+        used_sheets = db.session.query(SheetDefinition.id, SheetDefinition.name).join(Section) \
+            .filter(Section.template_id == template.id,
+                    SheetDefinition.id.in_(db.session.query(DynamicTableRow.sheet_id))).all()
+        if used_sheets:
+            latest = Template.query.filter_by(name=template.name, is_latest=True).first()
+            if not latest or latest.id == template.id:
+                return jsonify({"error": "此版本的动态表格中仍有项目数据，无法删除"}), 400
+            targets = dict(db.session.query(SheetDefinition.name, SheetDefinition.id).join(Section)
+                           .filter(Section.template_id == latest.id, SheetDefinition.sheet_type == 'dynamic_table'))
+            missing = sorted(name for _, name in used_sheets if name not in targets)
+            if missing:
+                return jsonify({"error": f"此版本的动态表格中仍有项目数据，且最新版本中没有同名表格，"
+                                         f"无法删除: {', '.join(missing)}"}), 400
+            for sheet_id, name in used_sheets:
+                DynamicTableRow.query.filter_by(sheet_id=sheet_id) \
+                    .update({"sheet_id": targets[name]}, synchronize_session=False)
+
+        version, name = template.version, template.name
+        content_hashes = {h for (h,) in db.session.query(WordTemplateChapter.content_hash)
+                          .join(Section).filter(Section.template_id == template.id)}
+        indexed = has_indexed_fields(SheetDefinition.section_id.in_(
+            db.session.query(Section.id).filter(Section.template_id == template.id)))
+        delete_template(template)
+        db.session.commit()
+        release_blobs(content_hashes)
+        if indexed:
+            refresh_field_indexes()
+        notify_template_changed(template_id)
+        # 其他版本产物中的 row_sheet_ids 仍包含已删除的表单
+        refresh_template_artifacts(name=name)
+        return jsonify({"message": f"V{version} 已删除"})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@admin_templates_bp.route('/templates/<int:template_id>/export', methods=['GET'])
+def export_template_archive(template_id):
+    """将模板导出为 zip 归档（结构清单 + 按内容哈希去重的章节文档）"""
+    template = Template.query.get_or_404(template_id)
+    try:
+        output = tempfile.TemporaryFile()
+        write_template_archive(template, output)
+        output.seek(0)
+    except ArchiveError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return send_file(output, mimetype='application/zip', as_attachment=True,
+                     download_name=f"{template.name}_V{template.version}.zip")
+
+
+@admin_templates_bp.route('/templates/<int:template_id>/import', methods=['POST'])
+def import_template(template_id):
+    """从模板归档导入分区、章节文档、表单、字段和规则，追加到当前模板中"""
+    template = Template.query.get_or_404(template_id)
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({"error": "没有选择文件"}), 400
+
+    try:
+        counts = import_template_archive(template, file.stream)
+        db.session.commit()
+        if counts['indexed_fields']:
+            refresh_field_indexes()
+        notify_template_changed(template.id)
+        return jsonify({
+            "message": f"导入成功：{counts['sections']} 个分区、{counts['sheets']} 个表单、"
+                       f"{counts['fields']} 个字段、{counts['chapters']} 个章节文档",
+            "counts": counts
+        }), 201
+    except ArchiveError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@admin_templates_bp.route('/templates/reorder', methods=['POST'])
+def reorder_templates():
+    """更新模板列表的显示顺序"""
+    try:
+        apply_display_order(Template, (request.json or {}).get('order', []))
+        db.session.commit()
+        return jsonify({"message": "模板顺序更新成功"})
+    except ReorderError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@admin_templates_bp.route('/chapter-files/gc', methods=['POST'])
+def collect_chapter_files():
+    """清理不再被任何章节引用的章节文档文件（删除操作会即时清理，这里处理遗留的文件）"""
+    try:
+        return jsonify(collect_garbage())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
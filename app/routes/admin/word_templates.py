@@ -1,17 +1,22 @@
 # app/routes/admin/word_templates.py
 
-import os
 from flask import Blueprint, jsonify, request
 from app import db
-from app.models import Section, SheetDefinition, WordTemplateChapter
+from app.routes.admin import track_template_changes
+from app.models import Template, Section, SheetDefinition, WordTemplateChapter
+from app.services.blob_store import store_stream, release_blobs
+from app.services.chapter_placeholders import index_chapter_placeholders, chapters_using_field, placeholder_report
+from app.services.preview_generator import warm_preview_cache
+from app.services.reorder import apply_display_order, ReorderError
 
 admin_word_templates_bp = Blueprint('admin_word_templates', __name__, url_prefix='/admin/api')
+# 章节及其与表单的关联是模板编译产物的一部分（导出结构与占位符表）
+track_template_changes(admin_word_templates_bp)
 
 # ==============================================================================
 # 章节Word模板管理 API
 # ==============================================================================
 
-CHAPTER_UPLOAD_FOLDER = 'uploads/word_template_chapters'
 ALLOWED_EXTENSIONS = {'docx'}
 
 def allowed_file(filename):
@@ -30,20 +35,21 @@ def upload_chapter_template(section_id):
     section = Section.query.get_or_404(section_id)
     filename = file.filename
 
-    upload_path = os.path.join(os.getcwd(), CHAPTER_UPLOAD_FOLDER, str(section.id))
-    os.makedirs(upload_path, exist_ok=True)
-    filepath = os.path.join(upload_path, filename)
+    # 文件按内容哈希保存，重复上传相同内容不会占用额外空间
+    content_hash = store_stream(file.stream)
 
     # 检查数据库中是否已存在同名文件记录
-    existing_chapter = WordTemplateChapter.query.filter_by(section_id=section_id, filename=filename).first()
-
-    file.save(filepath)
+    existing_chapter = WordTemplateChapter.query.filter_by(section_id=section.id, filename=filename).first()
 
     if existing_chapter:
-        # 文件已存在，仅覆盖文件，不创建新记录
-        # 更新文件路径以防万一
-        existing_chapter.filepath = filepath
+        # 文件已存在，仅替换文件内容，不创建新记录；旧内容不再被引用时删除
+        old_hash = existing_chapter.content_hash
+        existing_chapter.content_hash = content_hash
+        index_chapter_placeholders(existing_chapter)
         db.session.commit()
+        if old_hash != content_hash:
+            release_blobs({old_hash})
+        warm_preview_cache(existing_chapter.filepath, content_hash)
         return jsonify({
             "message": "章节模板已成功覆盖",
             "chapter": {
@@ -59,11 +65,13 @@ def upload_chapter_template(section_id):
         new_chapter = WordTemplateChapter(
             section_id=section_id,
             filename=filename,
-            filepath=filepath,
+            content_hash=content_hash,
             display_order=max_order + 1
         )
+        index_chapter_placeholders(new_chapter)
         db.session.add(new_chapter)
         db.session.commit()
+        warm_preview_cache(new_chapter.filepath, content_hash)
 
         return jsonify({
             "message": "章节模板上传成功",
@@ -79,10 +87,11 @@ def upload_chapter_template(section_id):
 def delete_chapter_template(chapter_id):
     """删除一个Word章节模板"""
     chapter = WordTemplateChapter.query.get_or_404(chapter_id)
-    if os.path.exists(chapter.filepath):
-        os.remove(chapter.filepath)
+    content_hash = chapter.content_hash
     db.session.delete(chapter)
     db.session.commit()
+    # 克隆出的模板版本与原版本共用同一个文件，只有最后一个引用被删除时才删除文件
+    release_blobs({content_hash})
     return jsonify({"message": "章节模板已删除"})
 
 @admin_word_templates_bp.route('/sections/<int:section_id>/chapters', methods=['GET'])
@@ -108,11 +117,11 @@ def get_chapter_templates(section_id):
 def reorder_chapters():
     """更新Word章节模板的显示顺序"""
     data = request.json
-    chapter_ids = data.get('order', [])
-    for index, chapter_id in enumerate(chapter_ids):
-        chapter = WordTemplateChapter.query.get(chapter_id)
-        if chapter:
-            chapter.display_order = index
+    try:
+        apply_display_order(WordTemplateChapter, data.get('order', []), owner_column=WordTemplateChapter.section_id)
+    except ReorderError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
     db.session.commit()
     return jsonify({"message": "章节模板顺序更新成功"})
 
@@ -139,3 +148,25 @@ def link_sheet_to_chapter(sheet_id):
     sheet.word_template_chapter_id = chapter_id
     db.session.commit()
     return jsonify({"message": "文档关联成功", "chapter_id": chapter_id})
+
+@admin_word_templates_bp.route('/templates/<int:template_id>/placeholders', methods=['GET'])
+def get_template_placeholders(template_id):
+    """检查模板各章节的占位符：关联表单中没有对应字段的，以及在整个模板中都找不到来源的"""
+    Template.query.get_or_404(template_id)
+    report = placeholder_report(template_id)
+    if request.args.get('unresolved_only') in ('1', 'true'):
+        report = [item for item in report if item['unresolved']]
+    return jsonify({
+        "chapters": report,
+        "missing_count": sum(len(item['missing']) for item in report)
+    })
+
+@admin_word_templates_bp.route('/templates/<int:template_id>/placeholders/<field_name>/chapters', methods=['GET'])
+def get_field_chapters(template_id, field_name):
+    """查找模板中使用某个字段占位符的章节"""
+    Template.query.get_or_404(template_id)
+    return jsonify([{
+        "id": chapter.id,
+        "filename": chapter.filename,
+        "section_id": chapter.section_id
+    } for chapter in chapters_using_field(template_id, field_name)])
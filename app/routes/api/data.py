@@ -1,11 +1,18 @@
 # app/routes/api/data.py
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from app import db
-from app.models import (
-    Project, Template, Section, SheetDefinition, FieldDefinition, ConditionalRule,
-    FixedFormData, DynamicTableRow
+from app.models import Project, Template, FixedFormData, DynamicTableRow
+from app.services.forms_config import get_compiled_forms_config
+from app.services.sheet_resolver import resolve_sheet
+from app.services.sheet_data import (
+    RevisionConflict, get_sheet_revision, next_revision, load_dynamic_rows_page, count_dynamic_rows,
+    apply_fixed_form_changes, apply_dynamic_table_changes,
+    replace_fixed_form_values
 )
+from app.services.dynamic_query import DynamicQueryError, query_dynamic_rows
+from app.services.sheet_import import iter_upload_rows, import_dynamic_rows
+from app.services.validation import RecordValidationError, validate_record, validate_records
 
 api_data_bp = Blueprint('api_data', __name__, url_prefix='/api')
 
@@ -14,72 +21,87 @@ api_data_bp = Blueprint('api_data', __name__, url_prefix='/api')
 # 辅助函数
 # ==============================================================================
 
-def get_config_from_db(procurement_method):
-    """根据采购方式（模板名称）从数据库动态生成前端所需的配置JSON"""
-    template = Template.query.filter_by(name=procurement_method, status='published', is_latest=True).first()
-    if not template:
-        return None
-
-    config = {"sections": {}}
-    sections_query = Section.query.filter_by(template_id=template.id).order_by(Section.display_order).all()
-
-    for section in sections_query:
-        section_config = {"order": [], "forms": {}}
-        sheets_query = SheetDefinition.query.filter_by(section_id=section.id).order_by(
-            SheetDefinition.display_order).all()
-
-        for sheet in sheets_query:
-            section_config["order"].append(sheet.name)
-            sheet_config = {
-                "id": sheet.id,
-                "type": sheet.sheet_type,
-                "model_identifier": sheet.model_identifier
-            }
-            fields_query = FieldDefinition.query.filter_by(sheet_id=sheet.id).order_by(
-                FieldDefinition.display_order).all()
-
-            fields_list = []
-            for f in fields_query:
-                fields_list.append({
-                    "name": f.name, "label": f.label, "field_type": f.field_type,
-                    "default_value": f.default_value, "options": f.options,
-                    "validation_rules": [{"rule_type": r.rule_type, "rule_value": r.rule_value} for r in f.validation_rules]
-                })
-
-            if sheet.sheet_type == 'fixed_form':
-                sheet_config['fields'] = fields_list
-                rules = ConditionalRule.query.filter_by(sheet_id=sheet.id).order_by(ConditionalRule.id).all()
-                sheet_config['conditional_rules'] = [{"id": r.id, "name": r.name, "definition": r.definition} for r in rules]
-            else:
-                sheet_config['columns'] = fields_list
-
-            section_config["forms"][sheet.name] = sheet_config
-        config["sections"][section.name] = section_config
-    return config
-
-
-def find_sheet_config_from_db(procurement_method, sheet_name):
-    """根据采购方式和Sheet名称，查找单个Sheet的配置"""
-    template = Template.query.filter_by(name=procurement_method, is_latest=True).first()
-    if not template:
-        return None
-
-    sheet_def = SheetDefinition.query.join(Section).filter(
-        Section.template_id == template.id,
-        SheetDefinition.name == sheet_name
-    ).first()
-    if not sheet_def:
-        return None
-
-    config = {"type": sheet_def.sheet_type, "model_identifier": sheet_def.model_identifier}
-    fields_query = FieldDefinition.query.filter_by(sheet_id=sheet_def.id).order_by(FieldDefinition.display_order).all()
-    fields_list = [{"name": f.name, "label": f.label, "field_type": f.field_type, "default_value": f.default_value} for f in fields_query]
-
-    if sheet_def.sheet_type == 'fixed_form':
-        config['fields'] = fields_list
-    else:
-        config['columns'] = fields_list
-    return config
+def validation_error_response(error):
+    """校验失败时的 400 响应，附带字段（或行）级别的错误明细"""
+    return jsonify({"error": str(error), "errors": error.errors}), 400
+
+
+def validate_dynamic_rows(validators, rows):
+    """校验动态表格的多行数据，失败时抛出 RecordValidationError，errors 为 [{"row": 行索引, "errors": {...}}]"""
+    failed = validate_records(validators, rows, enforce_required=False)
+    if failed:
+        raise RecordValidationError([{"row": index, "errors": failed[index]} for index in sorted(failed)],
+                                    f"共有 {len(failed)} 行数据未通过校验")
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def check_sheet_patch_format(sheet, data):
+    """检查增量保存请求体的结构（字段映射、行对象、行ID为整数），不正确时抛出 ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("保存数据格式不正确")
+    if sheet.sheet_type == 'fixed_form':
+        if not isinstance(data.get('fields') or {}, dict):
+            raise ValueError("fields 必须是 字段名 -> 值 的映射")
+    elif sheet.sheet_type == 'dynamic_table':
+        upserts, deletes = data.get('upserts') or [], data.get('deletes') or []
+        if not isinstance(upserts, list) or not isinstance(deletes, list):
+            raise ValueError("upserts 和 deletes 必须是列表")
+        for upsert in upserts:
+            if not isinstance(upsert, dict):
+                raise ValueError("upserts 中的每一项必须是对象")
+            if upsert.get('id') is not None and not _is_int(upsert['id']):
+                raise ValueError(f"无效的行ID: {upsert['id']!r}")
+            if 'data' in upsert and not isinstance(upsert['data'], dict):
+                raise ValueError("行数据必须是对象")
+            if 'display_order' in upsert and not _is_int(upsert['display_order']):
+                raise ValueError(f"无效的行顺序: {upsert['display_order']!r}")
+        invalid = [row_id for row_id in deletes if not _is_int(row_id)]
+        if invalid:
+            raise ValueError(f"无效的行ID: {invalid}")
+
+
+def validate_sheet_patch(sheet, data):
+    """
+    校验一次增量保存（PATCH 请求体）提交的字段或行。
+
+    Raises:
+        ValueError: 请求体结构不正确（见 check_sheet_patch_format）。
+        RecordValidationError: 字段或行数据未通过校验。
+    """
+    check_sheet_patch_format(sheet, data)
+    validators = sheet.validators()
+    if sheet.sheet_type == 'fixed_form':
+        changes = data.get('fields') or {}
+        errors = validate_record(validators, changes, enforce_required=False, fields=changes)
+        if errors:
+            raise RecordValidationError(errors)
+    elif sheet.sheet_type == 'dynamic_table':
+        upserts = data.get('upserts') or []
+        validate_dynamic_rows(validators, [u['data'] for u in upserts if 'data' in u])
+
+
+def apply_sheet_patch(project_id, sheet, data):
+    """
+    写入一次增量保存（不提交事务）。
+
+    Returns:
+        tuple: (新修订号, 新增行的 client_id -> 行ID)
+
+    Raises:
+        RevisionConflict: base_revision 与表单当前修订号不一致。
+    """
+    revision = next_revision(project_id, sheet.name, data.get('base_revision'))
+    created = {}
+    if sheet.sheet_type == 'fixed_form':
+        apply_fixed_form_changes(project_id, sheet.name, data.get('fields') or {}, revision)
+    elif sheet.sheet_type == 'dynamic_table':
+        created = apply_dynamic_table_changes(
+            project_id, sheet.id, data.get('upserts') or [], data.get('deletes') or [], revision,
+            sheet.row_sheet_ids)
+    return revision, created
 
 
 # ==============================================================================
@@ -88,11 +110,17 @@ def find_sheet_config_from_db(procurement_method, sheet_name):
 
 @api_data_bp.route('/forms-config/<string:method>')
 def get_forms_config_api(method):
-    """获取指定采购方式（模板）的完整表单配置"""
-    config = get_config_from_db(method)
-    if config:
-        return jsonify(config)
-    return jsonify({"error": "未知的或未发布的采购方式"}), 404
+    """获取指定采购方式（模板）的完整表单配置，支持 ETag / If-None-Match 协商缓存"""
+    compiled = get_compiled_forms_config(method)
+    if not compiled:
+        return jsonify({"error": "未知的或未发布的采购方式"}), 404
+
+    response = current_app.response_class(compiled.body, mimetype='application/json')
+    response.set_etag(compiled.etag)
+    # 模板可能被重新发布，因此要求客户端每次都向服务器验证，未变化时返回 304
+    response.cache_control.no_cache = True
+    response.cache_control.private = True
+    return response.make_conditional(request)
 
 
 @api_data_bp.route('/published-templates')
@@ -104,23 +132,54 @@ def get_published_templates():
 
 @api_data_bp.route('/projects/<int:project_id>/sheets/<string:sheet_name>', methods=['GET'])
 def get_sheet_data(project_id, sheet_name):
-    """获取指定项目、指定表单的已存数据"""
+    """
+    获取指定项目、指定表单的已存数据，当前修订号通过 X-Sheet-Revision 响应头返回。
+
+    动态表格可分页读取：提供 limit 时返回 {"rows", "offset", "next_cursor"}，
+    offset 按位置跳转，cursor 为上一页的 next_cursor；不提供 limit 时返回全部行的数组。
+    """
     project = Project.query.get_or_404(project_id)
-    config = find_sheet_config_from_db(project.procurement_method, sheet_name)
-    if not config:
+    sheet = resolve_sheet(project.procurement_method, sheet_name)
+    if not sheet:
         return jsonify({"error": "Sheet名称不存在"}), 404
 
-    sheet_def = SheetDefinition.query.filter_by(name=sheet_name).first_or_404()
-
-    if config['type'] == 'fixed_form':
-        return jsonify({entry.field_name: entry.field_value for entry in
-                        FixedFormData.query.filter_by(project_id=project_id, sheet_name=sheet_name).all()})
-    elif config['type'] == 'dynamic_table':
-        rows = DynamicTableRow.query.filter_by(
-            project_id=project_id,
-            sheet_id=sheet_def.id
+    if sheet.sheet_type == 'fixed_form':
+        response = jsonify({entry.field_name: entry.field_value for entry in
+                            FixedFormData.query.filter_by(project_id=project_id, sheet_name=sheet_name).all()})
+    elif sheet.sheet_type == 'dynamic_table' and request.args.get('limit'):
+        limit = max(1, min(request.args.get('limit', type=int) or 1, current_app.config['SHEET_PAGE_SIZE_MAX']))
+        offset = max(0, request.args.get('offset', 0, type=int))
+        try:
+            rows, next_cursor = load_dynamic_rows_page(project_id, sheet.row_sheet_ids, limit, offset,
+                                                       request.args.get('cursor') or None)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        response = jsonify({"rows": [dict(row.data, _row_id=row.id) for row in rows],
+                            "offset": offset, "next_cursor": next_cursor})
+    elif sheet.sheet_type == 'dynamic_table':
+        rows = DynamicTableRow.query.filter(
+            DynamicTableRow.project_id == project_id,
+            DynamicTableRow.sheet_id.in_(sheet.row_sheet_ids)
         ).order_by(DynamicTableRow.display_order).all()
-        return jsonify([row.data for row in rows])
+        # _row_id 为行的稳定ID，供增量保存 (PATCH) 时定位行
+        response = jsonify([dict(row.data, _row_id=row.id) for row in rows])
+    response.headers['X-Sheet-Revision'] = str(get_sheet_revision(project_id, sheet_name))
+    return response
+
+
+@api_data_bp.route('/projects/<int:project_id>/sheets/<string:sheet_name>/count', methods=['GET'])
+def count_sheet_rows(project_id, sheet_name):
+    """动态表格的行数、当前最大的 display_order（新增行从其后排序）及修订号"""
+    project = Project.query.get_or_404(project_id)
+    sheet = resolve_sheet(project.procurement_method, sheet_name)
+    if not sheet:
+        return jsonify({"error": "Sheet名称不存在"}), 404
+    if sheet.sheet_type != 'dynamic_table':
+        return jsonify({"error": "只有动态表格支持行数统计"}), 400
+
+    count, max_order = count_dynamic_rows(project_id, sheet.row_sheet_ids)
+    return jsonify({"count": count, "max_display_order": max_order,
+                    "revision": get_sheet_revision(project_id, sheet_name)})
 
 
 @api_data_bp.route('/projects/<int:project_id>/sheets/<string:sheet_name>', methods=['POST'])
@@ -128,34 +187,216 @@ def save_sheet_data(project_id, sheet_name):
     """保存指定项目、指定表单的数据"""
     try:
         project = Project.query.get_or_404(project_id)
-        config = find_sheet_config_from_db(project.procurement_method, sheet_name)
-        if not config:
+        sheet = resolve_sheet(project.procurement_method, sheet_name)
+        if not sheet:
             return jsonify({"error": "Sheet配置不存在"}), 404
 
         data = request.json
-        sheet_def = SheetDefinition.query.filter_by(name=sheet_name).first_or_404()
-
-        if config['type'] == 'fixed_form':
-            FixedFormData.query.filter_by(project_id=project_id, sheet_name=sheet_name).delete()
-            for field_name, field_value in data.items():
-                if field_value is not None:
-                    entry = FixedFormData(
-                        project_id=project_id, sheet_name=sheet_name,
-                        field_name=field_name, field_value=str(field_value)
-                    )
-                    db.session.add(entry)
-        elif config['type'] == 'dynamic_table':
-            DynamicTableRow.query.filter_by(project_id=project_id, sheet_id=sheet_def.id).delete()
+
+        # 保存草稿时不强制必填项，只校验已填写的值
+        validators = sheet.validators()
+        if sheet.sheet_type == 'fixed_form':
+            # 被联动规则隐藏或禁用的字段不参与校验（与前端表现一致）
+            rule_graph = sheet.rule_graph()
+            inactive = rule_graph.inactive_fields(data) if rule_graph else set()
+            errors = validate_record(validators, data, enforce_required=False,
+                                     fields=[name for name in validators if name not in inactive])
+            if errors:
+                raise RecordValidationError(errors)
+        elif sheet.sheet_type == 'dynamic_table':
+            validate_dynamic_rows(validators, data)
+
+        revision = next_revision(project_id, sheet_name)
+
+        if sheet.sheet_type == 'fixed_form':
+            replace_fixed_form_values(project_id, sheet_name, data, revision)
+        elif sheet.sheet_type == 'dynamic_table':
+            DynamicTableRow.query.filter(DynamicTableRow.project_id == project_id,
+                                         DynamicTableRow.sheet_id.in_(sheet.row_sheet_ids)) \
+                .delete(synchronize_session=False)
             for index, row_data in enumerate(data):
+                row_data.pop('_row_id', None)
                 if any(val for val in row_data.values()):
                     entry = DynamicTableRow(
-                        project_id=project_id, sheet_id=sheet_def.id,
-                        data=row_data, display_order=index
+                        project_id=project_id, sheet_id=sheet.id,
+                        data=row_data, display_order=index, revision=revision
                     )
                     db.session.add(entry)
 
         db.session.commit()
-        return jsonify({"message": f"表单 '{sheet_name}' 数据已成功保存"})
+        return jsonify({"message": f"表单 '{sheet_name}' 数据已成功保存", "revision": revision})
+    except RecordValidationError as e:
+        db.session.rollback()
+        return validation_error_response(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"保存数据时发生错误: {str(e)}"}), 500
+
+
+@api_data_bp.route('/projects/<int:project_id>/sheets/<string:sheet_name>', methods=['PATCH'])
+def patch_sheet_data(project_id, sheet_name):
+    """
+    增量保存指定项目、指定表单的数据，只写入发生变化的字段或行。
+
+    请求体:
+        固定表单: {"base_revision": 3, "fields": {"field_name": "value", ...}}
+        动态表格: {"base_revision": 3,
+                   "upserts": [{"id": 12, "data": {...}, "display_order": 0},
+                               {"client_id": "new-1", "data": {...}, "display_order": 1}],
+                   "deletes": [15, 16]}
+    base_revision 与服务器当前修订号不一致时返回 409 及当前修订号。
+    """
+    project = Project.query.get_or_404(project_id)
+    sheet = resolve_sheet(project.procurement_method, sheet_name)
+    if not sheet:
+        return jsonify({"error": "Sheet配置不存在"}), 404
+
+    try:
+        data = request.json or {}
+        validate_sheet_patch(sheet, data)
+        revision, created = apply_sheet_patch(project_id, sheet, data)
+        db.session.commit()
+        return jsonify({"message": f"表单 '{sheet_name}' 数据已成功保存", "revision": revision, "created": created})
+    except RevisionConflict as e:
+        db.session.rollback()
+        return jsonify({"error": "表单数据已在其他地方被修改，请刷新后重试", "revision": e.current_revision}), 409
+    except RecordValidationError as e:
+        db.session.rollback()
+        return validation_error_response(e)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": f"保存数据时发生错误: {str(e)}"}), 500
+
+
+@api_data_bp.route('/projects/<int:project_id>/sheets:batch', methods=['POST'])
+def batch_save_sheets(project_id):
+    """
+    在一个事务中增量保存多个表单，只提交一次。
+
+    请求体: {"表单名称": PATCH 请求体, ...}，各表单的格式见 patch_sheet_data。
+    全部表单先校验再写入；任一表单校验失败或修订号冲突时整体回滚，不写入任何表单。
+    校验失败返回 400，errors 为 {表单名称: 错误明细}；冲突返回 409 及冲突的表单和其当前修订号。
+    成功时返回 {"revisions": {表单名称: 修订号}, "created": {表单名称: {client_id: 行ID}}}。
+    """
+    project = Project.query.get_or_404(project_id)
+    payloads = request.get_json(silent=True)
+    if not isinstance(payloads, dict) or not payloads:
+        return jsonify({"error": "请求体必须是 表单名称 -> 保存数据 的映射"}), 400
+
+    sheets = {}
+    for sheet_name, data in payloads.items():
+        sheet = resolve_sheet(project.procurement_method, sheet_name)
+        if not sheet:
+            return jsonify({"error": f"Sheet '{sheet_name}' 配置不存在", "sheet": sheet_name}), 404
+        if not isinstance(data, dict):
+            return jsonify({"error": f"表单 '{sheet_name}' 的保存数据格式不正确", "sheet": sheet_name}), 400
+        sheets[sheet_name] = sheet
+
+    sheet_name = None
+    try:
+        errors = {}
+        for sheet_name, data in payloads.items():
+            try:
+                validate_sheet_patch(sheets[sheet_name], data)
+            except RecordValidationError as e:
+                errors[sheet_name] = e.errors
+        if errors:
+            return jsonify({"error": f"共有 {len(errors)} 个表单的数据未通过校验", "errors": errors}), 400
+
+        revisions, created = {}, {}
+        for sheet_name, data in payloads.items():
+            revisions[sheet_name], created[sheet_name] = apply_sheet_patch(project_id, sheets[sheet_name], data)
+
+        db.session.commit()
+        return jsonify({"message": f"已保存 {len(revisions)} 个表单", "revisions": revisions, "created": created})
+    except RevisionConflict as e:
+        db.session.rollback()
+        return jsonify({"error": f"表单 '{sheet_name}' 的数据已在其他地方被修改，请刷新后重试",
+                        "sheet": sheet_name, "revision": e.current_revision}), 409
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e), "sheet": sheet_name}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": f"保存数据时发生错误: {str(e)}"}), 500
+
+
+@api_data_bp.route('/projects/<int:project_id>/sheets/<string:sheet_name>/import', methods=['POST'])
+def import_sheet_rows(project_id, sheet_name):
+    """
+    从 CSV 或 XLSX 文件流式导入动态表格行。
+
+    表头可使用字段的显示名称或内部名称。表单参数 mode=append（默认）追加到已有行之后，
+    mode=replace 替换已有数据；encoding 指定CSV编码（默认 utf-8-sig）。
+    任意一行未通过校验时整个导入回滚，并返回逐行错误明细。
+    """
+    project = Project.query.get_or_404(project_id)
+    sheet = resolve_sheet(project.procurement_method, sheet_name)
+    if not sheet:
+        return jsonify({"error": "Sheet配置不存在"}), 404
+    if sheet.sheet_type != 'dynamic_table':
+        return jsonify({"error": "只有动态表格支持文件导入"}), 400
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({"error": "没有选择文件"}), 400
+
+    file = request.files['file']
+    mode = request.form.get('mode', 'append')
+    if mode not in ('append', 'replace'):
+        return jsonify({"error": "无效的导入模式"}), 400
+
+    try:
+        sheet_id, row_sheet_ids = sheet.id, sheet.row_sheet_ids
+        validators = sheet.validators()
+        rows = iter_upload_rows(file, request.form.get('encoding', 'utf-8-sig'))
+        revision = next_revision(project_id, sheet_name)
+
+        if mode == 'replace':
+            DynamicTableRow.query.filter(DynamicTableRow.project_id == project_id,
+                                         DynamicTableRow.sheet_id.in_(row_sheet_ids)) \
+                .delete(synchronize_session=False)
+            start_order = 0
+        else:
+            max_order = db.session.query(db.func.max(DynamicTableRow.display_order)).filter(
+                DynamicTableRow.project_id == project_id, DynamicTableRow.sheet_id.in_(row_sheet_ids)).scalar()
+            start_order = 0 if max_order is None else max_order + 1
+
+        result = import_dynamic_rows(project_id, sheet_id, validators, rows, revision, start_order)
+        if result['error_count']:
+            db.session.rollback()
+            return jsonify(dict(result, imported=0,
+                                error=f"导入失败：共有 {result['error_count']} 行数据未通过校验")), 400
+
+        db.session.commit()
+        return jsonify(dict(result, revision=revision, message=f"成功导入 {result['imported']} 行数据"))
+    except (ValueError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        return jsonify({"error": f"文件解析失败: {str(e)}"}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": f"导入数据时发生错误: {str(e)}"}), 500
+
+
+@api_data_bp.route('/projects/<int:project_id>/sheets/<string:sheet_name>/query', methods=['POST'])
+def query_sheet_rows(project_id, sheet_name):
+    """
+    在数据库中对动态表格执行筛选、排序、汇总（可分组）和分页，参数见 query_dynamic_rows。
+    适用于大数据量表格的合计行、按列筛选等，无需把全部行加载到浏览器。
+    """
+    project = Project.query.get_or_404(project_id)
+    sheet = resolve_sheet(project.procurement_method, sheet_name)
+    if not sheet:
+        return jsonify({"error": "Sheet配置不存在"}), 404
+    if sheet.sheet_type != 'dynamic_table':
+        return jsonify({"error": "只有动态表格支持查询"}), 400
+
+    try:
+        spec = request.get_json(silent=True) or {}
+        result = query_dynamic_rows(project_id, sheet.row_sheet_ids, sheet.fields, spec)
+        return jsonify(dict(result, revision=get_sheet_revision(project_id, sheet_name)))
+    except DynamicQueryError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"查询数据时发生错误: {str(e)}"}), 500
@@ -1,11 +1,21 @@
 # app/routes/api/exports.py
 
-from flask import Blueprint, jsonify
-from app.models import SheetDefinition, WordTemplateChapter
-from app.services.preview_generator import generate_preview_html
+import tempfile
+
+from flask import Blueprint, jsonify, request, send_file
+from app.models import Project, SheetDefinition, WordTemplateChapter
+from app.services.preview_generator import get_preview_html, preview_asset_path
+from app.services.project_preview import collect_preview_chapters, render_full_preview, compute_preview_delta
+from app.services.project_exports import (
+    find_project_template, export_section_excel, export_project_word, export_download_name,
+    ExportNotFound, XLSX_MIMETYPE, DOCX_MIMETYPE
+)
 
 api_exports_bp = Blueprint('api_exports', __name__, url_prefix='/api')
 
+# 预览图片的缓存时长（一年）
+PREVIEW_ASSET_MAX_AGE = 365 * 24 * 3600
+
 
 # ==============================================================================
 # 预览与导出 API
@@ -13,14 +23,42 @@ api_exports_bp = Blueprint('api_exports', __name__, url_prefix='/api')
 
 @api_exports_bp.route('/projects/<int:project_id>/export/<string:section_name>')
 def export_project_excel(project_id, section_name):
-    """导出指定项目、指定分区的Excel文件"""
-    return jsonify({"message": "Not implemented"}), 501
+    """导出指定项目、指定分区的Excel文件，每个表单一个工作表"""
+    project = Project.query.get_or_404(project_id)
+    try:
+        # 先写入磁盘临时文件，再分块流式发送，避免整个工作簿驻留内存
+        output = tempfile.TemporaryFile()
+        export_section_excel(project, section_name, output)
+        output.seek(0)
+    except ExportNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": f"导出Excel时发生错误: {str(e)}"}), 500
+
+    return send_file(output, mimetype=XLSX_MIMETYPE, as_attachment=True,
+                     download_name=export_download_name(project, section_name, 'xlsx'))
 
 
 @api_exports_bp.route('/projects/<int:project_id>/preview', methods=['GET'])
 def get_word_preview(project_id):
-    """获取整个项目的Word预览"""
-    return jsonify({"error": "此功能尚未实现"}), 501
+    """
+    获取整个项目的预览：按分区、章节顺序拼接各章节的缓存HTML，并在服务器端用已保存的数据填充占位符。
+    带 ?since=修订号 时为增量模式，只返回此后值发生变化的占位符: {"revision": n, "chapters": {章节ID: {字段: HTML}}}
+    """
+    project = Project.query.get_or_404(project_id)
+    template = find_project_template(project)
+    if not template:
+        return jsonify({"error": "项目所用的模板不存在或未发布"}), 404
+
+    try:
+        revision = project.data_revision
+        since = request.args.get('since', type=int)
+        if since is not None and since <= revision:
+            return jsonify({"revision": revision, "chapters": compute_preview_delta(project, template, since)})
+        chapters = collect_preview_chapters(template)
+        return jsonify({"revision": revision, "html": render_full_preview(project, template, chapters)})
+    except Exception as e:
+        return jsonify({"error": f"生成项目预览时发生错误: {str(e)}"}), 500
 
 
 @api_exports_bp.route('/sheets/<int:sheet_id>/preview', methods=['GET'])
@@ -32,10 +70,10 @@ def get_sheet_preview(sheet_id):
         return jsonify({"error": "此表单没有关联任何章节文档。"}), 404
 
     chapter = WordTemplateChapter.query.get(sheet.word_template_chapter_id)
-    if not chapter or not chapter.filepath:
+    if not chapter or not chapter.content_hash:
         return jsonify({"error": "关联的章节文档文件不存在或已丢失。"}), 404
 
-    html_content = generate_preview_html(chapter.filepath)
+    html_content = get_preview_html(chapter.filepath, chapter.content_hash)
 
     if html_content is None:
         return jsonify({"error": "转换Word文档为HTML时发生错误。"}), 500
@@ -43,7 +81,37 @@ def get_sheet_preview(sheet_id):
     return jsonify({"html": html_content})
 
 
+@api_exports_bp.route('/preview-assets/<name>', methods=['GET'])
+def get_preview_asset(name):
+    """章节预览中的图片。文件名即内容哈希，同一URL的内容永远不变，浏览器可以长期缓存"""
+    path = preview_asset_path(name)
+    if path is None:
+        return jsonify({"error": "资源不存在"}), 404
+    response = send_file(path, max_age=PREVIEW_ASSET_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    # 图片可能是 SVG，禁止其作为页面执行脚本
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    response.headers['Content-Security-Policy'] = "default-src 'none'; style-src 'unsafe-inline'"
+    return response
+
+
 @api_exports_bp.route('/projects/<int:project_id>/export_word', methods=['GET'])
 def export_word_document(project_id):
-    """导出最终的Word文档"""
-    return jsonify({"message": "Not implemented"}), 501
+    """
+    导出最终的Word文档：按分区、章节的显示顺序拼接所有章节模板，并用项目数据填充占位符。
+    可通过 ?section=分区名称 只导出单个分区。
+    """
+    project = Project.query.get_or_404(project_id)
+    section_name = request.args.get('section')
+    try:
+        output = tempfile.TemporaryFile()
+        export_project_word(project, output, section_name)
+        output.seek(0)
+    except ExportNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": f"导出Word文档时发生错误: {str(e)}"}), 500
+
+    return send_file(output, mimetype=DOCX_MIMETYPE, as_attachment=True,
+                     download_name=export_download_name(project, section_name, 'docx'))
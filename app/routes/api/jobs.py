@@ -0,0 +1,52 @@
+# app/routes/api/jobs.py
+
+import os
+
+from flask import Blueprint, jsonify, request, send_file
+from app import db
+from app.models import Project, Job
+from app.services.jobs import submit_job, job_to_dict, JOB_TYPES
+
+api_jobs_bp = Blueprint('api_jobs', __name__, url_prefix='/api')
+
+
+# ==============================================================================
+# 后台任务 API
+# ==============================================================================
+
+@api_jobs_bp.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    提交导出任务: {"type": "excel" | "word", "project_id": 1, "section": "分区名称"}
+    相同参数且项目数据未变化时返回已有任务（200），否则新建任务（202）。
+    """
+    data = request.json or {}
+    project = Project.query.get_or_404(data.get('project_id'))
+    try:
+        job, created = submit_job(data.get('type'), project, data.get('section'))
+        return jsonify(job_to_dict(job)), 202 if created else 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@api_jobs_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询任务状态"""
+    job = Job.query.get_or_404(job_id)
+    return jsonify(job_to_dict(job))
+
+
+@api_jobs_bp.route('/jobs/<int:job_id>/download', methods=['GET'])
+def download_job_result(job_id):
+    """下载已完成任务的结果文件"""
+    job = Job.query.get_or_404(job_id)
+    if job.status != 'done':
+        return jsonify({"error": "任务尚未完成", "status": job.status}), 409
+    if not job.result_path or not os.path.exists(job.result_path):
+        return jsonify({"error": "任务结果文件已过期，请重新导出"}), 410
+
+    return send_file(job.result_path, mimetype=JOB_TYPES[job.job_type].mimetype,
+                     as_attachment=True, download_name=job.result_name)
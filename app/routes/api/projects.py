@@ -1,9 +1,12 @@
 # app/routes/api/projects.py
 
-from flask import Blueprint, jsonify, request
-from datetime import timezone, timedelta
+from flask import Blueprint, jsonify, request, current_app
 from app import db
-from app.models import Project, FixedFormData, DynamicTableRow
+from app.models import Project, FixedFormData, DynamicTableRow, SheetRevision
+from app.services.jobs import delete_project_jobs, remove_job_results
+from app.services.project_search import (
+    InvalidCursor, filtered_project_query, list_projects_page, estimate_project_count, project_to_dict
+)
 
 api_projects_bp = Blueprint('api_projects', __name__, url_prefix='/api')
 
@@ -12,32 +15,39 @@ api_projects_bp = Blueprint('api_projects', __name__, url_prefix='/api')
 # 项目 (Project) 管理 API
 # ==============================================================================
 
+def _project_filters():
+    return {key: request.args.get(arg, '').strip() for key, arg in
+            (('name', 'name'), ('number', 'number'), ('method', 'method'))}
+
+
 @api_projects_bp.route('/projects', methods=['GET'])
 def get_projects():
-    """获取项目列表，支持按名称、编号和采购方式进行筛选"""
+    """
+    获取项目列表，支持按名称、编号和采购方式进行筛选。
+    按创建时间倒序游标分页：limit 为每页数量，cursor 为上一页返回的 next_cursor。
+    """
+    try:
+        default_limit = current_app.config['PROJECT_PAGE_SIZE']
+        limit = request.args.get('limit', default_limit, type=int) or default_limit
+        limit = max(1, min(limit, current_app.config['PROJECT_PAGE_SIZE_MAX']))
+
+        query = filtered_project_query(**_project_filters())
+        projects, next_cursor = list_projects_page(query, limit, request.args.get('cursor') or None)
+        return jsonify({"projects": [project_to_dict(p) for p in projects], "next_cursor": next_cursor})
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api_projects_bp.route('/projects/count', methods=['GET'])
+def count_projects():
+    """获取满足筛选条件的项目数量（数量较大时为估计值）"""
     try:
-        query = Project.query
-        name_query = request.args.get('name', '').strip()
-        number_query = request.args.get('number', '').strip()
-        method_query = request.args.get('method', '').strip()
-
-        if name_query:
-            query = query.filter(Project.name.like(f"%{name_query}%"))
-        if number_query:
-            query = query.filter(Project.number.like(f"%{number_query}%"))
-        if method_query:
-            query = query.filter(Project.procurement_method == method_query)
-
-        projects = query.order_by(Project.created_at.desc()).all()
-        china_tz = timezone(timedelta(hours=8))
-
-        return jsonify([{
-            "id": p.id,
-            "name": p.name,
-            "number": p.number,
-            "procurement_method": p.procurement_method,
-            "created_at": p.created_at.replace(tzinfo=timezone.utc).astimezone(china_tz).strftime('%Y-%m-%d %H:%M')
-        } for p in projects])
+        filters = _project_filters()
+        query = filtered_project_query(**filters)
+        return jsonify(estimate_project_count(query, any(filters.values()),
+                                              current_app.config['PROJECT_COUNT_EXACT_LIMIT']))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -66,8 +76,12 @@ def delete_project(project_id):
         project = Project.query.get_or_404(project_id)
         FixedFormData.query.filter_by(project_id=project_id).delete()
         DynamicTableRow.query.filter_by(project_id=project_id).delete()
+        SheetRevision.query.filter_by(project_id=project_id).delete()
+        # 项目ID可能被新项目复用（SQLite 会复用最大的已删除ID），不能留下旧项目的导出任务和结果文件
+        result_paths = delete_project_jobs(project_id)
         db.session.delete(project)
         db.session.commit()
+        remove_job_results(result_paths)
         return jsonify({"message": "项目已成功删除"})
     except Exception as e:
         db.session.rollback()
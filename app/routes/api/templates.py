@@ -1,11 +1,16 @@
 # app/routes/api/templates.py
-import os
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request
 from werkzeug.utils import secure_filename
 from app import db
 from app.models import Section, SheetDefinition, WordTemplateChapter
+from app.routes.admin import track_template_changes
+from app.services.blob_store import store_stream, release_blobs
+from app.services.chapter_placeholders import index_chapter_placeholders
+from app.services.preview_generator import warm_preview_cache
 
 api_templates_bp = Blueprint('api_templates', __name__, url_prefix='/api')
+# 上传章节、关联表单都会修改模板定义
+track_template_changes(api_templates_bp)
 
 ALLOWED_EXTENSIONS = {'docx'}
 
@@ -29,12 +34,8 @@ def upload_word_template_to_section(section_id):
         # 使用原始文件名，以便支持中文等字符
         filename = file.filename
 
-        # 创建上传目录
-        upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'])
-        os.makedirs(upload_folder, exist_ok=True)
-
-        filepath = os.path.join(upload_folder, filename)
-        file.save(filepath)
+        # 文件按内容哈希保存，重复上传相同内容不会占用额外空间
+        content_hash = store_stream(file.stream)
 
         # 检查是否已存在同名文件记录
         existing_chapter = WordTemplateChapter.query.filter_by(
@@ -42,9 +43,12 @@ def upload_word_template_to_section(section_id):
             filename=filename
         ).first()
 
+        old_hash = None
         if existing_chapter:
-            # 如果存在，则更新路径（覆盖文件）
-            existing_chapter.filepath = filepath
+            # 如果存在，则替换文件内容
+            old_hash = existing_chapter.content_hash
+            existing_chapter.content_hash = content_hash
+            index_chapter_placeholders(existing_chapter)
             db.session.commit()
             chapter = existing_chapter
         else:
@@ -55,12 +59,16 @@ def upload_word_template_to_section(section_id):
             chapter = WordTemplateChapter(
                 section_id=section_id,
                 filename=filename,
-                filepath=filepath,
+                content_hash=content_hash,
                 display_order=max_order + 1
             )
+            index_chapter_placeholders(chapter)
             db.session.add(chapter)
             db.session.commit()
 
+        if old_hash != content_hash:
+            release_blobs({old_hash})
+        warm_preview_cache(chapter.filepath, content_hash)
         return jsonify({
             "id": chapter.id,
             "filename": chapter.filename,
@@ -0,0 +1,168 @@
+# app/services/blob_store.py
+
+import hashlib
+import os
+import re
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import func
+
+from app import db
+from app.models import WordTemplateChapter
+from app.services.preview_generator import invalidate_preview_cache
+
+# 存储布局: <BLOB_STORE_FOLDER>/<哈希前两位>/<SHA-256>；写入中的临时文件位于 tmp/ 下
+COPY_CHUNK_SIZE = 1024 * 1024
+# 最近写入（或重复写入）的文件在此时长内不会被回收，其引用可能尚未提交（秒）
+RECENT_WRITE_SECONDS = 600
+_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class BlobHashMismatch(ValueError):
+    """写入内容的哈希与预期不一致"""
+
+
+def is_content_hash(value):
+    return isinstance(value, str) and bool(_HASH_PATTERN.match(value))
+
+
+def blob_path(content_hash):
+    """内容哈希对应的文件路径（文件不一定存在）"""
+    return os.path.join(current_app.config['BLOB_STORE_FOLDER'], content_hash[:2], content_hash)
+
+
+def blob_exists(content_hash):
+    return bool(content_hash) and os.path.exists(blob_path(content_hash))
+
+
+def _tmp_folder():
+    folder = os.path.join(current_app.config['BLOB_STORE_FOLDER'], 'tmp')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def store_stream(stream, expected_hash=None):
+    """
+    将文件流写入存储：边写临时文件边计算 SHA-256，fsync 后以 rename 原子地放到哈希对应的位置。
+    相同内容已存在时丢弃临时文件，不重复占用空间。
+
+    Args:
+        stream: 可读的二进制文件对象（如上传的 FileStorage.stream）。
+        expected_hash (str): 不为空时校验内容哈希，不一致时抛出 BlobHashMismatch。
+
+    Returns:
+        str: 内容的 SHA-256。
+    """
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(_tmp_folder(), f"{os.getpid()}.{threading.get_ident()}.{time.monotonic_ns()}")
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(COPY_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        content_hash = digest.hexdigest()
+        if expected_hash is not None and content_hash != expected_hash:
+            raise BlobHashMismatch("文件内容与预期的哈希不一致")
+
+        path = blob_path(content_hash)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            # 更新修改时间，使回收时把它视为最近写入的文件
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return content_hash
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# ==============================================================================
+# 引用计数与回收
+#
+# 引用者为 WordTemplateChapter.content_hash：克隆的模板版本、同一文件多次上传都只增加引用，
+# 不复制文件。引用数降为 0 的文件由 release_blobs（删除引用并提交后立即调用）
+# 或 collect_garbage（全量清扫，覆盖事务回滚、进程中断等遗留的文件）删除。
+# ==============================================================================
+
+def reference_counts(content_hashes=None):
+    """内容哈希 -> 引用数；content_hashes 为 None 时统计全部"""
+    query = db.session.query(WordTemplateChapter.content_hash, func.count()) \
+        .filter(WordTemplateChapter.content_hash.isnot(None)).group_by(WordTemplateChapter.content_hash)
+    if content_hashes is not None:
+        query = query.filter(WordTemplateChapter.content_hash.in_(list(content_hashes)))
+    return dict(query.all())
+
+
+def _remove_blob(content_hash):
+    # 派生缓存以内容哈希为键，随文件一起删除
+    invalidate_preview_cache(content_hash)
+    path = blob_path(content_hash)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def release_blobs(content_hashes):
+    """
+    删除已没有任何引用的文件，返回删除的数量。应在删除引用的事务提交之后调用。
+    最近写入的文件可能正被另一次尚未提交的上传引用，留给 collect_garbage 处理。
+    """
+    content_hashes = {h for h in content_hashes or () if h}
+    if not content_hashes:
+        return 0
+    referenced = reference_counts(content_hashes)
+    cutoff = time.time() - RECENT_WRITE_SECONDS
+    removed = 0
+    for content_hash in content_hashes - set(referenced):
+        try:
+            if os.stat(blob_path(content_hash)).st_mtime > cutoff:
+                continue
+        except FileNotFoundError:
+            pass
+        _remove_blob(content_hash)
+        removed += 1
+    return removed
+
+
+def collect_garbage(min_age_seconds=RECENT_WRITE_SECONDS):
+    """
+    清扫存储目录，删除引用数为 0 的文件和遗留的临时文件。
+
+    只处理修改时间早于 min_age_seconds 的文件，避免删除已写入但引用尚未提交的上传。
+
+    Returns:
+        dict: {"removed": 删除的文件数, "kept": 仍被引用的文件数, "freed_bytes": 释放的字节数}
+    """
+    root = current_app.config['BLOB_STORE_FOLDER']
+    result = {"removed": 0, "kept": 0, "freed_bytes": 0}
+    if not os.path.isdir(root):
+        return result
+
+    cutoff = time.time() - min_age_seconds
+    referenced = reference_counts()
+    for dirpath, _, filenames in os.walk(root):
+        in_tmp = os.path.basename(dirpath) == 'tmp'
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if not in_tmp and name in referenced:
+                result["kept"] += 1
+                continue
+            if stat.st_mtime > cutoff or not (in_tmp or is_content_hash(name)):
+                continue
+            if in_tmp:
+                os.remove(path)
+            else:
+                _remove_blob(name)
+            result["removed"] += 1
+            result["freed_bytes"] += stat.st_size
+    return result
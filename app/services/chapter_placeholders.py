@@ -0,0 +1,160 @@
+# app/services/chapter_placeholders.py
+
+import zipfile
+
+from flask import current_app
+from lxml import etree
+
+from app import db
+from app.models import ChapterPlaceholder, WordTemplateChapter, Section, SheetDefinition, FieldDefinition
+from app.services.blob_store import blob_path
+from app.services.preview_generator import PLACEHOLDER_PATTERN
+from app.services.word_export import SEQUENCE_FIELD, W_P, W_T
+
+DOCUMENT_PART = 'word/document.xml'
+# 与 FieldDefinition.name 的长度一致，更长的名称不可能对应任何字段
+MAX_FIELD_NAME_LENGTH = 100
+_XML_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=False)
+
+
+# ==============================================================================
+# 提取
+# ==============================================================================
+
+def extract_placeholders(path):
+    """
+    从 .docx 的 document.xml 中提取占位符名称，不转换整个文档。
+
+    Word 经常把 {{field_name}} 拆分到多个 run 中，因此按段落拼接全部 <w:t> 文本后再匹配，
+    与导出时合并拆分占位符的方式（word_export._merge_split_placeholders）一致。
+
+    Returns:
+        frozenset: 占位符名称。
+    """
+    with zipfile.ZipFile(path) as archive:
+        root = etree.fromstring(archive.read(DOCUMENT_PART), _XML_PARSER)
+    names = set()
+    for paragraph in root.iter(W_P):
+        text = ''.join(t.text or '' for t in paragraph.iter(W_T))
+        if '{{' in text:
+            names.update(PLACEHOLDER_PATTERN.findall(text))
+    return frozenset(names)
+
+
+def _safe_extract(path):
+    """文件无法解析时记录警告并视为没有占位符（导出时再报告错误）"""
+    try:
+        return extract_placeholders(path)
+    except Exception:
+        current_app.logger.warning("提取章节文档 %s 的占位符失败", path, exc_info=True)
+        return frozenset()
+
+
+def index_chapter_placeholders(chapter):
+    """提取章节文档的占位符并替换其索引行。只修改会话，由调用方提交"""
+    names = _safe_extract(chapter.filepath) if chapter.content_hash else frozenset()
+    chapter.placeholders = [ChapterPlaceholder(field_name=name) for name in sorted(names)
+                            if len(name) <= MAX_FIELD_NAME_LENGTH]
+
+
+def placeholder_rows(chapter_ids_by_hash):
+    """
+    批量导入时使用：每个文件内容只提取一次。
+
+    Args:
+        chapter_ids_by_hash (dict): {内容哈希: [章节ID]}
+
+    Returns:
+        list: chapter_placeholder 表的行字典。
+    """
+    rows = []
+    for content_hash, chapter_ids in chapter_ids_by_hash.items():
+        names = sorted(n for n in _safe_extract(blob_path(content_hash)) if len(n) <= MAX_FIELD_NAME_LENGTH)
+        rows.extend({"chapter_id": chapter_id, "field_name": name} for chapter_id in chapter_ids for name in names)
+    return rows
+
+
+# ==============================================================================
+# 查询
+# ==============================================================================
+
+def chapters_using_field(template_id, field_name):
+    """模板中使用占位符 {{field_name}} 的章节（按字段名索引查询）"""
+    return WordTemplateChapter.query.join(ChapterPlaceholder).join(Section).filter(
+        Section.template_id == template_id, ChapterPlaceholder.field_name == field_name
+    ).order_by(Section.display_order, WordTemplateChapter.display_order).all()
+
+
+def placeholder_report(template_id):
+    """
+    检查模板中各章节的占位符能否解析。
+
+    导出时占位符优先取章节关联表单的字段，其次是模板中任意固定表单的同名字段，
+    表格行中的占位符还可以来自同一分区的动态表格（见 project_exports.export_project_word）。
+
+    Returns:
+        list: 每个章节一项:
+            placeholders: 章节中的全部占位符；
+            unresolved: 关联表单中没有对应字段的占位符（未关联表单时为全部占位符）；
+            resolved_by: {占位符: 表单名称}，unresolved 中导出时可以从其他表单取值的；
+            missing: unresolved 中在模板里找不到任何来源的占位符，导出时为空。
+    """
+    sections = Section.query.filter_by(template_id=template_id).order_by(Section.display_order).all()
+    section_ids = [s.id for s in sections]
+
+    sheets = SheetDefinition.query.filter(SheetDefinition.section_id.in_(section_ids)) \
+        .order_by(SheetDefinition.display_order).all()
+    fields = {}
+    for sheet_id, name in db.session.query(FieldDefinition.sheet_id, FieldDefinition.name) \
+            .filter(FieldDefinition.sheet_id.in_([sh.id for sh in sheets])):
+        fields.setdefault(sheet_id, set()).add(name)
+    for sheet in sheets:
+        if sheet.sheet_type == 'dynamic_table':
+            fields.setdefault(sheet.id, set()).add(SEQUENCE_FIELD)
+
+    global_sources = {}
+    for section in sections:
+        for sheet in sheets:
+            if sheet.section_id == section.id and sheet.sheet_type == 'fixed_form':
+                for name in sorted(fields.get(sheet.id, ())):
+                    global_sources.setdefault(name, sheet.name)
+
+    placeholders = {}
+    chapters = WordTemplateChapter.query.filter(WordTemplateChapter.section_id.in_(section_ids)).all()
+    for chapter_id, name in db.session.query(ChapterPlaceholder.chapter_id, ChapterPlaceholder.field_name) \
+            .filter(ChapterPlaceholder.chapter_id.in_([c.id for c in chapters])) \
+            .order_by(ChapterPlaceholder.field_name):
+        placeholders.setdefault(chapter_id, []).append(name)
+
+    order = {s.id: s.display_order for s in sections}
+    section_names = {s.id: s.name for s in sections}
+    linked = {sh.word_template_chapter_id: sh for sh in sheets if sh.word_template_chapter_id}
+    report = []
+    for chapter in sorted(chapters, key=lambda c: (order[c.section_id], c.display_order)):
+        sheet = linked.get(chapter.id)
+        names = placeholders.get(chapter.id, [])
+        local = fields.get(sheet.id, set()) if sheet else set()
+        unresolved = [name for name in names if name not in local]
+
+        resolved_by = {}
+        for name in unresolved:
+            if name in global_sources:
+                resolved_by[name] = global_sources[name]
+                continue
+            for other in sheets:
+                if other.section_id == chapter.section_id and other.sheet_type == 'dynamic_table' \
+                        and name in fields.get(other.id, ()):
+                    resolved_by[name] = other.name
+                    break
+
+        report.append({
+            "chapter_id": chapter.id,
+            "filename": chapter.filename,
+            "section": section_names[chapter.section_id],
+            "linked_sheet": sheet.name if sheet else None,
+            "placeholders": names,
+            "unresolved": unresolved,
+            "resolved_by": resolved_by,
+            "missing": [name for name in unresolved if name not in resolved_by]
+        })
+    return report
@@ -0,0 +1,230 @@
+# app/services/conditional_rules.py
+
+
+class RuleCycleError(ValueError):
+    """联动规则之间存在循环依赖"""
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+        if len(cycle) <= 2:
+            message = "联动规则配置错误：触发条件的字段不能作为目标字段，这会造成死循环。"
+        else:
+            message = f"联动规则配置错误：字段之间存在循环依赖（{' → '.join(cycle)}），这会造成死循环。"
+        super().__init__(message)
+
+
+def rule_trigger_fields(definition):
+    """规则条件（if）读取的字段"""
+    if_clause = definition.get('if') if isinstance(definition, dict) else None
+    if isinstance(if_clause, dict) and if_clause.get('field'):
+        return [if_clause['field']]
+    return []
+
+
+def rule_target_fields(definition):
+    """规则动作（then）作用的字段"""
+    then_clauses = definition.get('then') if isinstance(definition, dict) else None
+    if not isinstance(then_clauses, list):
+        return []
+    targets = []
+    for action in then_clauses:
+        if isinstance(action, dict) and isinstance(action.get('targets'), list):
+            targets.extend(t for t in action['targets'] if t not in targets)
+    return targets
+
+
+# ==============================================================================
+# 条件判断（与前端 ConditionalLogicEngine._checkCondition 保持一致）
+# ==============================================================================
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _normalize_value(value):
+    if isinstance(value, bool):
+        return '是' if value else '否'
+    if value == 'True':
+        return '是'
+    if value == 'False':
+        return '否'
+    return value
+
+
+def check_condition(condition, values):
+    """按字段当前值判断规则条件是否成立"""
+    value = _normalize_value(values.get(condition.get('field')))
+    expected = condition.get('value')
+    operator = condition.get('operator')
+    if operator == 'equals':
+        return str(value if value is not None else '') == str(expected if expected is not None else '')
+    if operator == 'not_equals':
+        return str(value if value is not None else '') != str(expected if expected is not None else '')
+    if operator == 'contains':
+        return str(expected) in str(value)
+    if operator == 'not_contains':
+        return str(expected) not in str(value)
+    if operator == 'is_empty':
+        return value is None or value == ''
+    if operator == 'is_not_empty':
+        return value is not None and value != ''
+    comparisons = {
+        'greater_than': float.__gt__, 'less_than': float.__lt__,
+        'greater_than_or_equals': float.__ge__, 'less_than_or_equals': float.__le__,
+    }
+    if operator in comparisons:
+        return comparisons[operator](_to_number(value), _to_number(expected))
+    return False
+
+
+# ==============================================================================
+# 依赖图
+# ==============================================================================
+
+class CompiledRuleGraph:
+    """
+    一个表单的联动规则编译后的依赖图。
+
+    - order: 全部规则（在规则列表中的下标）的拓扑顺序，前面规则的目标字段先于以其为触发字段的规则求值；
+    - dependents: 字段 -> 该字段变化后需要重新求值的规则（包含间接受影响的规则），按拓扑顺序排列。
+    """
+
+    __slots__ = ('definitions', 'order', 'dependents')
+
+    def __init__(self, definitions, order, dependents):
+        self.definitions = definitions
+        self.order = order
+        self.dependents = dependents
+
+    def affected_rules(self, changed_fields=None):
+        """变化的字段影响到的规则下标（拓扑顺序）；changed_fields 为 None 时返回全部规则"""
+        if changed_fields is None:
+            return list(self.order)
+        affected = set()
+        for field in changed_fields:
+            affected.update(self.dependents.get(field, ()))
+        position = {index: i for i, index in enumerate(self.order)}
+        return sorted(affected, key=position.__getitem__)
+
+    def evaluate(self, values, changed_fields=None):
+        """
+        增量求值：只重新计算受变化字段影响的规则。
+
+        Returns:
+            dict: 目标字段 -> {"hidden": bool, "disabled": bool}，只包含被求值规则作用的状态。
+        """
+        states = {}
+        for index in self.affected_rules(changed_fields):
+            definition = self.definitions[index]
+            condition_met = check_condition(definition['if'], values)
+            for action in definition.get('then') or []:
+                action_type = action.get('action') or action.get('type')
+                for target in action.get('targets') or []:
+                    state = states.setdefault(target, {})
+                    if action_type == 'show':
+                        state['hidden'] = not condition_met
+                    elif action_type == 'hide':
+                        state['hidden'] = condition_met
+                    elif action_type == 'enable':
+                        state['disabled'] = not condition_met
+                    elif action_type == 'disable':
+                        state['disabled'] = condition_met
+        return states
+
+    def inactive_fields(self, values):
+        """按当前值被规则隐藏或禁用的字段"""
+        return {field for field, state in self.evaluate(values).items()
+                if state.get('hidden') or state.get('disabled')}
+
+    def to_dict(self):
+        """供前端使用的依赖图（forms-config 中的 rule_graph）"""
+        return {"order": self.order, "dependents": self.dependents}
+
+
+def _find_cycle(edges):
+    """在 字段 -> 目标字段 的有向图中查找一个环，返回环上的字段路径（首尾相同），无环时返回 None"""
+    visiting, done = set(), set()
+    path = []
+
+    def visit(field):
+        visiting.add(field)
+        path.append(field)
+        for target in edges.get(field, ()):
+            if target in visiting:
+                return path[path.index(target):] + [target]
+            if target not in done:
+                cycle = visit(target)
+                if cycle:
+                    return cycle
+        visiting.discard(field)
+        done.add(field)
+        path.pop()
+        return None
+
+    for field in list(edges):
+        if field not in done:
+            cycle = visit(field)
+            if cycle:
+                return cycle
+    return None
+
+
+def compile_rule_graph(definitions):
+    """
+    将一个表单的联动规则定义编译为依赖图。
+
+    Args:
+        definitions (list): 规则定义（ConditionalRule.definition），下标即规则在图中的编号。
+            条件或动作不完整的规则不参与求值。
+
+    Raises:
+        RuleCycleError: 规则之间（包括单条规则自身）存在循环依赖。
+    """
+    definitions = list(definitions)
+    valid = [i for i, d in enumerate(definitions)
+             if rule_trigger_fields(d) and rule_target_fields(d)]
+
+    edges, triggered_by = {}, {}
+    for index in valid:
+        for trigger in rule_trigger_fields(definitions[index]):
+            triggered_by.setdefault(trigger, []).append(index)
+            targets = edges.setdefault(trigger, [])
+            targets.extend(t for t in rule_target_fields(definitions[index]) if t not in targets)
+
+    cycle = _find_cycle(edges)
+    if cycle:
+        raise RuleCycleError(cycle)
+
+    # 规则之间的依赖：A 的目标字段是 B 的触发字段时，A 先于 B 求值（Kahn 拓扑排序，同层保持原顺序）
+    downstream = {index: sorted({b for t in rule_target_fields(definitions[index]) for b in triggered_by.get(t, ())})
+                  for index in valid}
+    indegree = {index: 0 for index in valid}
+    for index in valid:
+        for b in downstream[index]:
+            indegree[b] += 1
+    ready = [index for index in valid if indegree[index] == 0]
+    order = []
+    while ready:
+        index = ready.pop(0)
+        order.append(index)
+        for b in downstream[index]:
+            indegree[b] -= 1
+            if indegree[b] == 0:
+                ready.append(b)
+        ready.sort()
+
+    position = {index: i for i, index in enumerate(order)}
+    dependents = {}
+    for field, rules in triggered_by.items():
+        affected, pending = set(), list(rules)
+        while pending:
+            index = pending.pop()
+            if index not in affected:
+                affected.add(index)
+                pending.extend(downstream[index])
+        dependents[field] = sorted(affected, key=position.__getitem__)
+    return CompiledRuleGraph(definitions, order, dependents)
+
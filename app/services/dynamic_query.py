@@ -0,0 +1,248 @@
+# app/services/dynamic_query.py
+
+import hashlib
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import func, literal_column, text
+
+from app import db
+from app.models import DynamicTableRow, FieldDefinition, SheetDefinition
+
+# 为标记了 is_indexed 的列创建的表达式索引名前缀（按列名和类型命名，所有表单共用）
+INDEX_PREFIX = 'ix_dtr_field_'
+MAX_QUERY_LIMIT = 1000
+AGGREGATE_FUNCS = ('sum', 'avg', 'min', 'max', 'count')
+FILTER_OPS = ('eq', 'ne', 'gt', 'gte', 'lt', 'lte', 'contains', 'in', 'is_empty', 'is_not_empty')
+
+
+class DynamicQueryError(ValueError):
+    """动态表格查询参数不正确"""
+
+
+# ==============================================================================
+# JSON 列表达式
+#
+# 查询条件和索引使用逐字相同的表达式（JSON 路径以字面量写入），数据库才能用索引求值。
+# 文本列：SQLite 为 json_extract，PostgreSQL 为 ->>；
+# 数值列在此基础上转换为数字，空字符串（以及 PostgreSQL 中无法解析的文本）视为 NULL。
+# ==============================================================================
+
+def _sql_string(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _column_sql(dialect, field_name, numeric):
+    if dialect == 'sqlite':
+        path = '$."' + field_name.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        value = f"json_extract(data, {_sql_string(path)})"
+        return f"CAST(NULLIF({value}, '') AS REAL)" if numeric else value
+    if dialect == 'postgresql':
+        value = f"(data ->> {_sql_string(field_name)})"
+        if numeric:
+            return (f"CASE WHEN {value} ~ '^\\s*[-+]?[0-9]+(\\.[0-9]+)?\\s*$' "
+                    f"THEN CAST({value} AS NUMERIC) END")
+        return value
+    raise DynamicQueryError(f"当前数据库 ({dialect}) 不支持动态表格查询")
+
+
+class DynamicColumns:
+    """一个动态表格可查询的列：列名 -> 是否为数值列"""
+
+    def __init__(self, columns):
+        self.dialect = db.engine.dialect.name
+        self.numeric = {c['name']: c.get('field_type') == 'number' for c in columns}
+
+    def expression(self, field_name, numeric=None):
+        if field_name not in self.numeric:
+            raise DynamicQueryError(f"未知的列: {field_name}")
+        if numeric is None:
+            numeric = self.numeric[field_name]
+        return literal_column(_column_sql(self.dialect, field_name, numeric))
+
+
+# ==============================================================================
+# 查询
+# ==============================================================================
+
+def _number(value, field_name):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise DynamicQueryError(f"列 '{field_name}' 的比较值必须是数字")
+
+
+def _filter_clause(columns, spec):
+    if not isinstance(spec, dict):
+        raise DynamicQueryError("筛选条件格式不正确")
+    field_name, op, value = spec.get('field'), spec.get('op', 'eq'), spec.get('value')
+    if op not in FILTER_OPS:
+        raise DynamicQueryError(f"不支持的筛选操作: {op}")
+    column = columns.expression(field_name)
+    numeric = columns.numeric[field_name]
+
+    if op == 'is_empty':
+        raw = columns.expression(field_name, numeric=False)
+        return raw.is_(None) | (raw == '')
+    if op == 'is_not_empty':
+        raw = columns.expression(field_name, numeric=False)
+        return raw.is_not(None) & (raw != '')
+    if op == 'contains':
+        return columns.expression(field_name, numeric=False).contains(str(value), autoescape=True)
+    if op == 'in':
+        if not isinstance(value, list):
+            raise DynamicQueryError("in 操作的值必须是数组")
+        return column.in_([_number(v, field_name) if numeric else str(v) for v in value])
+
+    value = _number(value, field_name) if numeric else str(value)
+    return {
+        'eq': column.__eq__, 'ne': column.__ne__, 'gt': column.__gt__,
+        'gte': column.__ge__, 'lt': column.__lt__, 'lte': column.__le__,
+    }[op](value)
+
+
+def _aggregate_expressions(columns, specs):
+    expressions = []
+    for spec in specs:
+        if not isinstance(spec, dict) or spec.get('func') not in AGGREGATE_FUNCS:
+            raise DynamicQueryError(f"不支持的汇总方式: {spec}")
+        fn, field_name = spec['func'], spec.get('field')
+        if fn == 'count' and not field_name:
+            expressions.append(func.count().label('count'))
+            continue
+        if fn == 'count':
+            expressions.append(func.count(columns.expression(field_name, numeric=False)).label(f'count_{field_name}'))
+        else:
+            # sum/avg 总是按数值计算；min/max 遵循列本身的类型
+            numeric = True if fn in ('sum', 'avg') else None
+            expressions.append(getattr(func, fn)(columns.expression(field_name, numeric)).label(f'{fn}_{field_name}'))
+    return expressions
+
+
+def _json_value(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def query_dynamic_rows(project_id, sheet_ids, columns, spec):
+    """
+    在数据库中对动态表格的行执行筛选、排序、汇总和分页。
+
+    Args:
+        sheet_ids (list): 行数据所在的表单ID（ResolvedSheet.row_sheet_ids）。
+        columns (list): 表格列配置（forms-config 中的列字典，包含 name、field_type）。
+        spec (dict): 查询参数:
+            filters: [{"field", "op", "value"}]，多个条件为"且"的关系；
+            sort: [{"field", "direction": "asc"|"desc"}]，缺省按行顺序；
+            aggregates: [{"func": "sum"|"avg"|"min"|"max"|"count", "field"}]；
+            group_by: 分组汇总的列名；
+            limit / offset: 分页，limit 为 0 时不返回行。
+
+    Returns:
+        dict: {"total", "rows", "aggregates", "groups"(仅 group_by 时)}
+
+    Raises:
+        DynamicQueryError: 查询参数不正确。
+    """
+    columns = DynamicColumns(columns)
+    base = db.session.query(DynamicTableRow).filter(
+        DynamicTableRow.project_id == project_id, DynamicTableRow.sheet_id.in_(sheet_ids))
+    for filter_spec in spec.get('filters') or []:
+        base = base.filter(_filter_clause(columns, filter_spec))
+
+    aggregates = _aggregate_expressions(columns, spec.get('aggregates') or [])
+    totals = base.with_entities(func.count().label('total'), *aggregates).one()
+    result = {
+        "total": totals.total,
+        "aggregates": {expr.name: _json_value(totals._mapping[expr.name]) for expr in aggregates}
+    }
+
+    group_by = spec.get('group_by')
+    if group_by:
+        key = columns.expression(group_by)
+        groups = base.with_entities(key.label('key'), func.count().label('count'), *aggregates) \
+            .group_by(key).order_by(key).all()
+        result["groups"] = [dict({"key": _json_value(g.key), "count": g.count},
+                                 **{expr.name: _json_value(g._mapping[expr.name]) for expr in aggregates})
+                            for g in groups]
+
+    try:
+        limit = int(spec.get('limit', 100))
+        offset = int(spec.get('offset', 0))
+    except (TypeError, ValueError):
+        raise DynamicQueryError("limit 和 offset 必须是整数")
+    limit, offset = max(0, min(limit, MAX_QUERY_LIMIT)), max(0, offset)
+
+    rows = []
+    if limit:
+        order_by = []
+        for sort_spec in spec.get('sort') or []:
+            expression = columns.expression(sort_spec.get('field'))
+            order_by.append(expression.desc() if sort_spec.get('direction') == 'desc' else expression.asc())
+        order_by.extend([DynamicTableRow.display_order, DynamicTableRow.id])
+        rows = [{"id": r.id, "display_order": r.display_order, "data": r.data}
+                for r in base.order_by(*order_by).offset(offset).limit(limit)]
+    result["rows"] = rows
+    return result
+
+
+# ==============================================================================
+# 表达式索引
+# ==============================================================================
+
+def _index_name(dialect, field_name, numeric):
+    digest = hashlib.sha1(_column_sql(dialect, field_name, numeric).encode('utf-8')).hexdigest()[:16]
+    return f"{INDEX_PREFIX}{digest}"
+
+
+def _existing_indexes(dialect):
+    if dialect == 'sqlite':
+        sql = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'dynamic_table_row'"
+    else:
+        sql = "SELECT indexname FROM pg_indexes WHERE tablename = 'dynamic_table_row'"
+    return {name for (name,) in db.session.execute(text(sql)) if name.startswith(INDEX_PREFIX)}
+
+
+def sync_field_indexes():
+    """
+    使 dynamic_table_row 上的表达式索引与字段的 is_indexed 标记一致。
+
+    索引按 (project_id, sheet_id, 列表达式) 建立，同名同类型的列在所有表单间共用一个索引，
+    因此克隆模板不需要新建索引；不再被任何字段需要的索引会被删除。
+    """
+    dialect = db.engine.dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        return
+    wanted = {}
+    indexed = db.session.query(FieldDefinition.name, FieldDefinition.field_type).join(SheetDefinition) \
+        .filter(FieldDefinition.is_indexed.is_(True), SheetDefinition.sheet_type == 'dynamic_table').distinct()
+    for name, field_type in indexed:
+        numeric = field_type == 'number'
+        wanted[_index_name(dialect, name, numeric)] = _column_sql(dialect, name, numeric)
+
+    existing = _existing_indexes(dialect)
+    for index_name in existing - set(wanted):
+        db.session.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+    for index_name in set(wanted) - existing:
+        db.session.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {index_name} ON dynamic_table_row "
+            f"(project_id, sheet_id, ({wanted[index_name]}))"))
+    db.session.commit()
+
+
+def has_indexed_fields(*criteria):
+    """满足条件的表单中是否有标记了 is_indexed 的动态表格列（删除表单、分区、模板前判断是否需要同步索引）"""
+    return db.session.query(FieldDefinition.id).join(SheetDefinition).filter(
+        FieldDefinition.is_indexed.is_(True), SheetDefinition.sheet_type == 'dynamic_table', *criteria
+    ).first() is not None
+
+
+def refresh_field_indexes():
+    """
+    在 is_indexed 标记（或已索引列的类型）发生变化的修改提交后调用。
+    索引维护失败不影响已经提交的模板修改。
+    """
+    try:
+        sync_field_indexes()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("同步动态表格列索引失败")
@@ -0,0 +1,113 @@
+# app/services/excel_export.py
+
+import re
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from app.models import FixedFormData, DynamicTableRow
+from app.services.field_format import build_label_map, format_field_value
+
+# 每次从数据库游标中读取的行数
+EXPORT_FETCH_SIZE = 1000
+# Excel 工作表名称的限制：最长31个字符，不能包含 []:*?/\
+_INVALID_TITLE_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+def _worksheet_title(name, used):
+    """生成合法且不重复的工作表名称"""
+    base = _INVALID_TITLE_CHARS.sub('_', name).strip("'")[:31] or 'Sheet'
+    title, suffix = base, 1
+    while title.lower() in used:
+        suffix += 1
+        tail = f"_{suffix}"
+        title = base[:31 - len(tail)] + tail
+    used.add(title.lower())
+    return title
+
+
+class _ColumnFormatter:
+    """预先计算单个字段导出所需的信息，避免逐单元格重复查找"""
+
+    __slots__ = ('name', 'label', 'field_type', 'label_map', 'as_label')
+
+    def __init__(self, field):
+        self.name = field.name
+        self.label = field.label
+        self.field_type = field.field_type
+        self.label_map = build_label_map(field)
+        self.as_label = field.export_excel_as_label
+
+    def cell_value(self, value):
+        text = format_field_value(self.field_type, self.label_map, value, self.as_label)
+        if self.field_type == 'number' and text:
+            try:
+                number = float(text)
+                return int(number) if number.is_integer() else number
+            except ValueError:
+                pass
+        return text
+
+
+def _header_row(worksheet, titles):
+    bold = Font(bold=True)
+    cells = []
+    for title in titles:
+        cell = WriteOnlyCell(worksheet, value=title)
+        cell.font = bold
+        cells.append(cell)
+    return cells
+
+
+def _write_fixed_form(worksheet, project_id, sheet):
+    columns = [_ColumnFormatter(f) for f in sheet.fields]
+    worksheet.append(_header_row(worksheet, ['字段', '内容']))
+
+    values = {}
+    query = FixedFormData.query.with_entities(FixedFormData.field_name, FixedFormData.field_value) \
+        .filter_by(project_id=project_id, sheet_name=sheet.name)
+    for field_name, field_value in query:
+        values[field_name] = field_value
+
+    for column in columns:
+        worksheet.append([column.label, column.cell_value(values.get(column.name))])
+
+
+def _write_dynamic_table(worksheet, project_id, sheet):
+    columns = [_ColumnFormatter(f) for f in sheet.fields if f.name != 'sequence']
+    worksheet.append(_header_row(worksheet, ['序号'] + [c.label for c in columns]))
+
+    query = DynamicTableRow.query.with_entities(DynamicTableRow.data) \
+        .filter(DynamicTableRow.project_id == project_id, DynamicTableRow.sheet_id.in_(sheet.row_sheet_ids)) \
+        .order_by(DynamicTableRow.display_order, DynamicTableRow.id) \
+        .execution_options(stream_results=True) \
+        .yield_per(EXPORT_FETCH_SIZE)
+    for index, (data,) in enumerate(query, start=1):
+        data = data or {}
+        worksheet.append([index] + [c.cell_value(data.get(c.name)) for c in columns])
+
+
+def write_section_workbook(project_id, section, fileobj):
+    """
+    将项目在指定分区下的所有表单数据写入一个Excel文件，每个 SheetDefinition 对应一个工作表。
+
+    使用 openpyxl 的 write-only 模式，行数据写入临时文件而不驻留内存；
+    数据库读取使用服务端游标分批获取，因此内存占用与行数无关。
+
+    Args:
+        project_id (int): 项目ID。
+        section (ArtifactSection): 模板编译产物中的分区（含 sheets 及 fields）。
+        fileobj: 可写的二进制文件对象。
+    """
+    workbook = Workbook(write_only=True)
+    used_titles = set()
+    for sheet in section.sheets:
+        worksheet = workbook.create_sheet(title=_worksheet_title(sheet.name, used_titles))
+        if sheet.sheet_type == 'fixed_form':
+            _write_fixed_form(worksheet, project_id, sheet)
+        else:
+            _write_dynamic_table(worksheet, project_id, sheet)
+    if not used_titles:
+        workbook.create_sheet(title='Sheet')
+    workbook.save(fileobj)
@@ -0,0 +1,34 @@
+# app/services/field_format.py
+
+# 字段类型中，哪些带有选项列表（与 admin/fields.py 保持一致）
+OPTION_FIELD_TYPES = ('select', 'select-multiple', 'radio', 'checkbox-group')
+# 多选字段在数据库中以逗号分隔存储
+MULTI_VALUE_FIELD_TYPES = ('select-multiple', 'checkbox-group')
+
+
+def build_label_map(field):
+    """为带选项的字段构建 value -> label 映射；无选项时返回 None"""
+    if field.field_type not in OPTION_FIELD_TYPES or not isinstance(field.options, list):
+        return None
+    return {str(opt.get('value')): opt.get('label') for opt in field.options if isinstance(opt, dict)}
+
+
+def format_field_value(field_type, label_map, value, as_label, separator=', '):
+    """
+    将字段的存储值格式化为导出内容。
+
+    Args:
+        field_type (str): 字段类型。
+        label_map (dict): build_label_map 的结果，可为 None。
+        value: 存储值。
+        as_label (bool): 为 True 时把选项值转换为选项标签。
+        separator (str): 多选值转换为标签后的连接符。
+    """
+    if value is None:
+        return ''
+    text = str(value)
+    if not as_label or not label_map:
+        return text
+    if field_type in MULTI_VALUE_FIELD_TYPES:
+        return separator.join(label_map.get(v.strip(), v.strip()) for v in text.split(',') if v.strip())
+    return label_map.get(text, text)
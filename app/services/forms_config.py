@@ -0,0 +1,165 @@
+# app/services/forms_config.py
+
+import hashlib
+import json
+import threading
+import time
+
+from flask import current_app
+
+from app import db
+from app.models import CompiledTemplate
+from app.services.signals import template_changed
+from app.services.template_artifacts import build_rule_graph, load_sections
+from app.services.validation import compile_config_validators
+
+# 已加载的模板产物缓存: (template_id, etag) -> CompiledFormsConfig
+_cache = {}
+# 采购方式（模板名称）-> ((template_id, etag) 或 None, 查询时刻)
+_published = {}
+_cache_lock = threading.Lock()
+
+
+class CompiledFormsConfig:
+    """
+    一个模板版本的编译产物（CompiledTemplate）在进程内的表示：配置字典、序列化后的JSON及其ETag，
+    按需编译的校验器和联动规则依赖图，以及导出与预览使用的分区结构（sections）。
+    """
+
+    __slots__ = ('template_id', 'version', 'config', 'body', 'etag', '_sheets', '_validators', '_rule_graphs',
+                 '_section_data', '_placeholders', '_sections', '_field_chapters', '_export_etag')
+
+    def __init__(self, artifact):
+        self.template_id = artifact.template_id
+        self.version = artifact.version
+        self.body = artifact.config.encode('utf-8')
+        self.config = json.loads(artifact.config)
+        self.etag = artifact.etag
+        # 表单名称 -> 表单配置（名称重复时以先出现的分区为准）
+        self._sheets = {}
+        for section in self.config['sections'].values():
+            for sheet_name, sheet in section['forms'].items():
+                self._sheets.setdefault(sheet_name, sheet)
+        self._validators = {}
+        self._rule_graphs = {}
+        self._section_data = artifact.sections
+        self._placeholders = artifact.placeholders
+        self._sections = None
+        self._field_chapters = None
+        self._export_etag = None
+
+    @property
+    def sections(self):
+        """按显示顺序排列的分区（ArtifactSection），含表单、字段的导出设置及章节"""
+        if self._sections is None:
+            self._sections = load_sections(self._section_data, self._placeholders)
+        return self._sections
+
+    @property
+    def export_etag(self):
+        """
+        产物全部内容的摘要。etag 只覆盖前端表单配置，导出还依赖分区结构、章节文档和占位符，
+        任一变化（如重新上传章节）都会改变该值，用于判断已生成的导出结果是否仍然有效。
+        """
+        if self._export_etag is None:
+            digest = hashlib.sha1(self.etag.encode('utf-8'))
+            digest.update(json.dumps([self._section_data, self._placeholders], sort_keys=True).encode('utf-8'))
+            self._export_etag = digest.hexdigest()
+        return self._export_etag
+
+    @property
+    def field_chapters(self):
+        """字段名 -> 使用该占位符的章节ID列表（来自上传时建立的占位符索引），用于只更新受影响的章节"""
+        if self._field_chapters is None:
+            index = {}
+            for chapter_id, names in (self._placeholders or {}).items():
+                for name in names:
+                    index.setdefault(name, []).append(int(chapter_id))
+            self._field_chapters = index
+        return self._field_chapters
+
+    def find_sheet(self, sheet_name):
+        """返回指定表单的配置，不存在时为 None"""
+        return self._sheets.get(sheet_name)
+
+    def sheet_validators(self, sheet_name):
+        """
+        获取表单编译后的字段校验器 {字段名: FieldValidator}。
+        首次使用时编译并随本配置一起缓存，模板变更后随配置一同失效。
+        """
+        validators = self._validators.get(sheet_name)
+        if validators is None:
+            sheet = self.find_sheet(sheet_name)
+            if sheet is None:
+                return None
+            validators = compile_config_validators(sheet.get('fields') or sheet.get('columns') or [])
+            self._validators[sheet_name] = validators
+        return validators
+
+    def sheet_rule_graph(self, sheet_name):
+        """获取表单联动规则编译后的依赖图（CompiledRuleGraph），与校验器一样随本配置缓存"""
+        if sheet_name not in self._rule_graphs:
+            sheet = self.find_sheet(sheet_name)
+            self._rule_graphs[sheet_name] = build_rule_graph(
+                [r['definition'] for r in (sheet or {}).get('conditional_rules') or []])
+        return self._rule_graphs[sheet_name]
+
+
+def _published_template_key(procurement_method):
+    """
+    采购方式（模板名称）当前生效产物的 (template_id, etag)，没有已发布的最新版本时为 None。
+    只读取产物表；在引入产物之前发布、尚未编译的版本同样返回 None（见 flask compile-templates）。
+
+    结果缓存在进程内，随模板变更信号失效；另设 FORMS_CONFIG_RESOLVE_TTL 秒的有效期，
+    使多进程部署中其他进程的发布操作最迟在该时长后生效。
+    """
+    now = time.monotonic()
+    entry = _published.get(procurement_method)
+    if entry is not None and now - entry[1] < current_app.config['FORMS_CONFIG_RESOLVE_TTL']:
+        return entry[0]
+
+    row = CompiledTemplate.query.with_entities(CompiledTemplate.template_id, CompiledTemplate.etag) \
+        .filter_by(name=procurement_method, is_active=True).first()
+    key = (row.template_id, row.etag) if row else None
+    with _cache_lock:
+        _published[procurement_method] = (key, now)
+    return key
+
+
+def get_compiled_forms_config(procurement_method):
+    """
+    获取指定采购方式（模板名称）当前已发布最新版本的编译产物。
+
+    产物在发布时编译并存入 compiled_template 表（见 services/template_artifacts.py），
+    此处只读取这一行；名称到产物的映射和加载结果均有缓存，命中时不产生任何查询。
+    """
+    key = _published_template_key(procurement_method)
+    if key is None:
+        return None
+
+    compiled = _cache.get(key)
+    if compiled is None:
+        artifact = db.session.get(CompiledTemplate, key[0])
+        if artifact is None:
+            return None
+        compiled = CompiledFormsConfig(artifact)
+        with _cache_lock:
+            _cache[(compiled.template_id, compiled.etag)] = compiled
+    return compiled
+
+
+def invalidate_forms_config(template_id=None):
+    """使指定模板（或全部模板）的编译配置缓存失效"""
+    with _cache_lock:
+        # 发布、设为最新版本会改变名称到版本的映射，且无法从 template_id 反查名称，因此总是全部清空
+        _published.clear()
+        if template_id is None:
+            _cache.clear()
+        else:
+            for key in [k for k in _cache if k[0] == template_id]:
+                del _cache[key]
+
+
+@template_changed.connect
+def _on_template_changed(sender, template_id=None, **extra):
+    invalidate_forms_config(template_id)
@@ -0,0 +1,273 @@
+# app/services/jobs.py
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Job, Project
+from app.services.forms_config import get_compiled_forms_config
+from app.services.project_exports import (
+    export_section_excel, export_project_word, export_download_name, ExportNotFound,
+    XLSX_MIMETYPE, DOCX_MIMETYPE
+)
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class JobType:
+    """一种后台任务：执行函数及其结果文件的扩展名、MIME类型"""
+
+    def __init__(self, run, extension, mimetype, requires_section):
+        self.run = run
+        self.extension = extension
+        self.mimetype = mimetype
+        self.requires_section = requires_section
+
+
+JOB_TYPES = {
+    'excel': JobType(lambda project, section_name, f: export_section_excel(project, section_name, f),
+                     'xlsx', XLSX_MIMETYPE, requires_section=True),
+    'word': JobType(lambda project, section_name, f: export_project_word(project, f, section_name),
+                    'docx', DOCX_MIMETYPE, requires_section=False),
+}
+
+
+# ==============================================================================
+# 工作进程池
+# ==============================================================================
+
+_executor = None
+_executor_lock = threading.Lock()
+# 工作进程中使用的应用实例
+_worker_app = None
+
+
+def _init_worker(config):
+    """工作进程初始化：按主进程的配置创建独立的应用实例（及数据库连接）"""
+    global _worker_app
+    from app import create_app
+    _worker_app = create_app(config)
+
+
+def _run_in_worker(job_id):
+    with _worker_app.app_context():
+        run_job(job_id)
+
+
+def _worker_config(app):
+    keys = ('SQLALCHEMY_DATABASE_URI', 'SQLALCHEMY_ENGINE_OPTIONS', 'UPLOAD_FOLDER', 'BLOB_STORE_FOLDER',
+            'PREVIEW_CACHE_FOLDER', 'PREVIEW_ASSET_FOLDER', 'JOB_RESULT_FOLDER')
+    config = {key: app.config[key] for key in keys}
+    config.update({key: value for key, value in app.config.items() if key.startswith(('DB_', 'SQLITE_'))})
+    # 工作进程只执行任务，不再嵌套创建进程池
+    config['JOB_WORKERS'] = 0
+    return config
+
+
+def _get_executor(app):
+    """懒加载进程池。导出的文档生成是CPU密集型的，使用独立进程避免占用Web进程的GIL"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=app.config['JOB_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(_worker_config(app),)
+            )
+        return _executor
+
+
+def shutdown_executor():
+    """关闭进程池（等待正在执行的任务完成）"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def _on_future_done(app, job_id):
+    def callback(future):
+        # 工作进程异常退出时（如被系统杀死），任务无法自行标记失败
+        error = future.exception()
+        if error is None:
+            return
+        with app.app_context():
+            job = db.session.get(Job, job_id)
+            if job is not None and job.status in ACTIVE_STATUSES:
+                job.status = 'failed'
+                job.error = f"工作进程异常退出: {error}"
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+    return callback
+
+
+# ==============================================================================
+# 任务执行
+# ==============================================================================
+
+def run_job(job_id):
+    """执行一个排队中的任务，结果先写入临时文件再原子替换，最后记录任务状态"""
+    job = db.session.get(Job, job_id)
+    if job is None or job.status != 'queued':
+        return
+    job.status = 'running'
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+
+    job_type = JOB_TYPES[job.job_type]
+    folder = current_app.config['JOB_RESULT_FOLDER']
+    path = os.path.join(folder, f"{job.id}.{job_type.extension}")
+    tmp_path = f"{path}.tmp"
+    try:
+        project = db.session.get(Project, job.project_id)
+        if project is None:
+            raise ExportNotFound("项目不存在")
+        os.makedirs(folder, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            job_type.run(project, job.section_name, f)
+        os.replace(tmp_path, path)
+        job.status = 'done'
+        job.result_path = path
+    except Exception as e:
+        db.session.rollback()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        job = db.session.get(Job, job_id)
+        job.status = 'failed'
+        job.error = str(e)
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def _job_key(job_type, project, section_name):
+    """任务的去重键：参数、项目数据修订号，以及项目所用模板产物的摘要"""
+    compiled = get_compiled_forms_config(project.procurement_method)
+    return {"job_type": job_type, "project_id": project.id, "section_name": section_name,
+            "data_revision": project.data_revision,
+            "template_etag": compiled.export_etag if compiled is not None else None}
+
+
+def _find_reusable_job(key):
+    """查找去重键相同、仍在执行或已成功完成的任务"""
+    stale_before = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_STALE_SECONDS'])
+    candidates = Job.query.filter_by(**key) \
+        .filter(Job.status.in_(ACTIVE_STATUSES + ('done',))).order_by(Job.id.desc())
+    for job in candidates:
+        if job.status == 'done':
+            if job.result_path and os.path.exists(job.result_path):
+                return job
+        elif job.created_at is None or job.created_at >= stale_before:
+            return job
+    return None
+
+
+def _fail_stale_jobs(key):
+    """
+    将长时间未完成的同参数在途任务标记为失败（如所在进程已退出），
+    使唯一索引 uq_job_active 允许重新提交。只修改会话，由调用方提交。
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_STALE_SECONDS'])
+    Job.query.filter_by(**key).filter(
+        Job.status.in_(ACTIVE_STATUSES), Job.created_at < stale_before
+    ).update({Job.status: 'failed', Job.error: "任务超时未完成", Job.finished_at: datetime.utcnow()},
+             synchronize_session=False)
+
+
+def delete_project_jobs(project_id):
+    """
+    删除项目的全部任务。只修改会话，返回结果文件路径，由调用方在提交后通过 remove_job_results 删除。
+    """
+    paths = [path for (path,) in db.session.query(Job.result_path).filter(
+        Job.project_id == project_id, Job.result_path.isnot(None))]
+    Job.query.filter_by(project_id=project_id).delete(synchronize_session=False)
+    return paths
+
+
+def remove_job_results(paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def purge_expired_jobs():
+    """删除超过保留时长的已结束任务及其结果文件"""
+    expire_before = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_RESULT_TTL'])
+    expired = Job.query.filter(Job.status.in_(('done', 'failed')), Job.finished_at < expire_before).all()
+    for job in expired:
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+        db.session.delete(job)
+    if expired:
+        db.session.commit()
+
+
+def submit_job(job_type, project, section_name=None):
+    """
+    提交一个后台任务。相同类型、项目、分区且项目数据和所用模板产物都未变化的任务只生成一次。
+
+    Args:
+        job_type (str): JOB_TYPES 中的任务类型。
+        project (Project): 目标项目。
+        section_name (str): 分区名称；Word导出时为空表示整个项目。
+
+    Returns:
+        tuple: (Job, 是否新建)
+
+    Raises:
+        ValueError: 任务类型未知或缺少必需的分区名称。
+    """
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"未知的任务类型: {job_type}")
+    if JOB_TYPES[job_type].requires_section and not section_name:
+        raise ValueError("导出Excel时必须指定分区")
+    section_name = section_name or None
+
+    purge_expired_jobs()
+    key = _job_key(job_type, project, section_name)
+    existing = _find_reusable_job(key)
+    if existing is not None:
+        return existing, False
+
+    _fail_stale_jobs(key)
+    job = Job(status='queued', result_name=export_download_name(project, section_name, JOB_TYPES[job_type].extension),
+              **key)
+    db.session.add(job)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # 并发的相同请求已经先插入了在途任务（唯一索引 uq_job_active），返回该任务
+        db.session.rollback()
+        existing = _find_reusable_job(key)
+        if existing is None:
+            raise
+        return existing, False
+
+    app = current_app._get_current_object()
+    if app.config['JOB_WORKERS'] > 0:
+        future = _get_executor(app).submit(_run_in_worker, job.id)
+        future.add_done_callback(_on_future_done(app, job.id))
+    else:
+        run_job(job.id)
+    return job, True
+
+
+def job_to_dict(job):
+    """任务状态的JSON表示"""
+    return {
+        "id": job.id,
+        "type": job.job_type,
+        "project_id": job.project_id,
+        "section": job.section_name,
+        "data_revision": job.data_revision,
+        "status": job.status,
+        "error": job.error,
+        "download_url": f"/api/jobs/{job.id}/download" if job.status == 'done' else None
+    }
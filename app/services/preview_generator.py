@@ -1,12 +1,83 @@
 # app/services/preview_generator.py
 
+import hashlib
 import mammoth
 import re
 import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+from app.instrumentation import stage
+
+# 使用正则表达式将 {{field_name}} 替换为 <span data-placeholder-for="field_name">**********</span>
+# 正则表达式解释:
+# \{\{      - 匹配两个左大括号
+# \s*       - 匹配零个或多个空白字符
+# ([\w\d_]+) - 捕获组1: 匹配一个或多个单词字符、数字或下划线 (即字段名)
+# \s*       - 匹配零个或多个空白字符
+# \}\}      - 匹配两个右大括号
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([\w\d_]+)\s*\}\}")
+
+# 进程内 LRU 缓存的最大条目数（按文件内容哈希）
+PREVIEW_MEMORY_CACHE_SIZE = 128
+# 文件 (路径, 修改时间, 大小) -> 内容哈希 缓存的最大条目数
+PREVIEW_HASH_CACHE_SIZE = 1024
+# 磁盘缓存的HTML格式版本，生成方式改变时递增，旧版本的缓存不再被读取
+PREVIEW_CACHE_VERSION = 2
+# 预览图片的URL前缀，与 api/exports.py 中的 get_preview_asset 路由一致
+PREVIEW_ASSET_URL = '/api/preview-assets/'
+_ASSET_NAME_PATTERN = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+# 图片类型 -> 文件扩展名，其他类型（浏览器通常也无法显示）使用 .bin
+_IMAGE_EXTENSIONS = {
+    'image/png': 'png', 'image/jpeg': 'jpg', 'image/gif': 'gif', 'image/bmp': 'bmp', 'image/tiff': 'tiff',
+    'image/webp': 'webp', 'image/svg+xml': 'svg', 'image/x-emf': 'emf', 'image/x-wmf': 'wmf',
+}
+
+
+def _replace_with_span(match):
+    field_name = match.group(1)
+    # 初始显示内容设为星号，稍后由JS填充
+    return f'<span data-placeholder-for="{field_name}">**********</span>'
+
+
+# ==============================================================================
+# 预览图片
+#
+# mammoth 默认把图片以 base64 data URI 内嵌到HTML中，含有印章、组织结构图的章节会使
+# 预览响应达到数MB。这里把每张图片按内容哈希写入资源目录一次，HTML 只引用其URL，
+# 浏览器按 immutable 缓存后不再重复下载。
+# ==============================================================================
+
+def preview_asset_path(name):
+    """资源文件名对应的路径；文件名不合法或文件不存在时为 None"""
+    if not _ASSET_NAME_PATTERN.match(name):
+        return None
+    path = os.path.join(current_app.config['PREVIEW_ASSET_FOLDER'], name[:2], name)
+    return path if os.path.exists(path) else None
+
+
+def _store_image(image):
+    with image.open() as stream:
+        data = stream.read()
+    name = f"{hashlib.sha256(data).hexdigest()}.{_IMAGE_EXTENSIONS.get(image.content_type, 'bin')}"
+    path = os.path.join(current_app.config['PREVIEW_ASSET_FOLDER'], name[:2], name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return {"src": PREVIEW_ASSET_URL + name, "loading": "lazy"}
+
+
+_convert_image = mammoth.images.img_element(_store_image)
+
 
 def generate_preview_html(docx_path):
     """
-    将指定的 .docx 文件转换为 HTML，并处理其中的占位符。
+    将指定的 .docx 文件转换为 HTML，并处理其中的占位符。图片写入预览资源目录，以URL引用。
 
     Args:
         docx_path (str): .docx 文件的路径。
@@ -19,29 +90,119 @@ def generate_preview_html(docx_path):
         return None
 
     try:
-        with open(docx_path, "rb") as docx_file:
-            result = mammoth.convert_to_html(docx_file)
-            html = result.value
-
-            # 使用正则表达式将 {{field_name}} 替换为 <span data-placeholder-for="field_name">**********</span>
-            # 正则表达式解释:
-            # \{\{      - 匹配两个左大括号
-            # \s*       - 匹配零个或多个空白字符
-            # ([\w\d_]+) - 捕获组1: 匹配一个或多个单词字符、数字或下划线 (即字段名)
-            # \s*       - 匹配零个或多个空白字符
-            # \}\}      - 匹配两个右大括号
-            placeholder_pattern = re.compile(r"\{\{\s*([\w\d_]+)\s*\}\}")
-
-            # 使用一个函数作为替换参数，这样可以从匹配对象中提取字段名
-            def replace_with_span(match):
-                field_name = match.group(1)
-                # 初始显示内容设为星号，稍后由JS填充
-                return f'<span data-placeholder-for="{field_name}">**********</span>'
-
-            processed_html = placeholder_pattern.sub(replace_with_span, html)
-
-            return processed_html
-
-    except Exception as e:
-        print(f"Error converting docx to html: {e}")
+        with open(docx_path, "rb") as docx_file, stage('docx2html'):
+            result = mammoth.convert_to_html(docx_file, convert_image=_convert_image)
+            return PLACEHOLDER_PATTERN.sub(_replace_with_span, result.value)
+
+    except Exception:
+        current_app.logger.exception("章节文档转换为HTML失败: %s", docx_path)
+        return None
+
+
+# ==============================================================================
+# 基于内容哈希的预览缓存
+# ==============================================================================
+
+_memory_cache = OrderedDict()
+# (路径, 修改时间, 大小) -> 内容哈希，避免每次请求都重新读取并哈希整个文件
+# 文件每次修改都会产生新的键，因此与 _memory_cache 一样按 LRU 限制条目数
+_hash_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def file_sha256(path):
+    """以流式方式计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _content_hash(path):
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        content_hash = _hash_cache.get(key)
+        if content_hash is not None:
+            _hash_cache.move_to_end(key)
+            return content_hash
+    content_hash = file_sha256(path)
+    with _cache_lock:
+        _hash_cache[key] = content_hash
+        while len(_hash_cache) > PREVIEW_HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+    return content_hash
+
+
+def _disk_path(content_hash):
+    return os.path.join(current_app.config['PREVIEW_CACHE_FOLDER'], f"v{PREVIEW_CACHE_VERSION}",
+                        content_hash[:2], f"{content_hash}.html")
+
+
+def _remember(content_hash, html):
+    with _cache_lock:
+        _memory_cache[content_hash] = html
+        _memory_cache.move_to_end(content_hash)
+        while len(_memory_cache) > PREVIEW_MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def get_preview_html(docx_path, content_hash=None):
+    """
+    获取章节文档的HTML预览。
+
+    以文件内容的 SHA-256 为键：先查进程内 LRU，再查 uploads 下的磁盘缓存，
+    都未命中时才调用 mammoth 转换，并写回两级缓存。
+
+    Args:
+        content_hash (str): 文件的内容哈希（内容寻址存储中的文件已知哈希），为空时读取文件计算。
+
+    Returns:
+        str: HTML 字符串；文件不存在或转换失败时为 None。
+    """
+    if not os.path.exists(docx_path):
+        return None
+
+    content_hash = content_hash or _content_hash(docx_path)
+    with _cache_lock:
+        html = _memory_cache.get(content_hash)
+        if html is not None:
+            _memory_cache.move_to_end(content_hash)
+            return html
+
+    cache_path = _disk_path(content_hash)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        _remember(content_hash, html)
+        return html
+
+    html = generate_preview_html(docx_path)
+    if html is None:
         return None
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(html)
+    os.replace(tmp_path, cache_path)
+    _remember(content_hash, html)
+    return html
+
+
+def warm_preview_cache(docx_path, content_hash=None):
+    """在章节上传后预先生成预览缓存；转换失败不影响上传流程"""
+    try:
+        get_preview_html(docx_path, content_hash)
+    except Exception:
+        current_app.logger.exception("预先生成章节预览缓存失败: %s", docx_path)
+
+
+def invalidate_preview_cache(content_hash):
+    """章节文件从存储中删除时，移除其内容对应的预览缓存"""
+    with _cache_lock:
+        _memory_cache.pop(content_hash, None)
+    cache_path = _disk_path(content_hash)
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
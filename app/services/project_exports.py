@@ -0,0 +1,109 @@
+# app/services/project_exports.py
+
+import os
+
+from app.instrumentation import stage
+from app.models import FixedFormData, DynamicTableRow
+from app.services.forms_config import get_compiled_forms_config
+from app.services.excel_export import write_section_workbook, EXPORT_FETCH_SIZE
+from app.services.word_export import (
+    get_compiled_chapter, assemble_document, build_value_maps, format_dynamic_row,
+    ChapterContext, DynamicSheetInfo
+)
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+DOCX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+class ExportNotFound(LookupError):
+    """导出所需的模板、分区或章节文件不存在"""
+
+
+def find_project_template(project):
+    """
+    项目所用模板（已发布的最新版本）的编译产物，未发布时为 None。
+    其 sections 为含表单、字段和章节的分区列表，属性与对应模型一致。
+    """
+    return get_compiled_forms_config(project.procurement_method)
+
+
+def find_project_section(project, section_name):
+    """查找项目所用模板中的指定分区（含表单和字段）"""
+    template = find_project_template(project)
+    if not template:
+        return None
+    return next((s for s in template.sections if s.name == section_name), None)
+
+
+def export_download_name(project, section_name, extension):
+    """导出文件的下载名称"""
+    if section_name:
+        return f"{project.name}_{section_name}.{extension}"
+    return f"{project.name}.{extension}"
+
+
+def export_section_excel(project, section_name, fileobj):
+    """
+    导出指定项目、指定分区的Excel文件，每个表单一个工作表。
+
+    Raises:
+        ExportNotFound: 分区不存在。
+    """
+    section = find_project_section(project, section_name)
+    if not section:
+        raise ExportNotFound(f"分区 '{section_name}' 不存在")
+    with stage('xlsx'):
+        write_section_workbook(project.id, section, fileobj)
+
+
+def export_project_word(project, fileobj, section_name=None):
+    """
+    导出最终的Word文档：按分区、章节的显示顺序拼接所有章节模板，并用项目数据填充占位符。
+
+    Args:
+        section_name (str): 不为空时只导出该分区。
+
+    Raises:
+        ExportNotFound: 模板未发布、章节文件丢失或没有可导出的章节。
+    """
+    template = find_project_template(project)
+    if not template:
+        raise ExportNotFound("项目所用的模板不存在或未发布")
+
+    sections = [s for s in template.sections if not section_name or s.name == section_name]
+
+    fixed_sheets = [sh for s in template.sections for sh in s.sheets if sh.sheet_type == 'fixed_form']
+    entries = FixedFormData.query.with_entities(
+        FixedFormData.sheet_name, FixedFormData.field_name, FixedFormData.field_value
+    ).filter_by(project_id=project.id)
+    per_sheet, global_values = build_value_maps(fixed_sheets, entries)
+
+    def load_rows(info):
+        query = DynamicTableRow.query.with_entities(DynamicTableRow.data) \
+            .filter(DynamicTableRow.project_id == project.id, DynamicTableRow.sheet_id.in_(info.row_sheet_ids)) \
+            .order_by(DynamicTableRow.display_order, DynamicTableRow.id) \
+            .execution_options(stream_results=True) \
+            .yield_per(EXPORT_FETCH_SIZE)
+        return (format_dynamic_row(info, index, data or {}) for index, (data,) in enumerate(query, start=1))
+
+    chapters = []
+    for section in sections:
+        linked_sheets = {sh.word_template_chapter_id: sh for sh in section.sheets if sh.word_template_chapter_id}
+        for chapter in section.chapters:
+            if not os.path.exists(chapter.filepath):
+                raise ExportNotFound(f"章节文档 '{chapter.filename}' 的文件不存在或已丢失")
+
+            linked = linked_sheets.get(chapter.id)
+            local_values = per_sheet.get(linked.name, {}) if linked and linked.sheet_type == 'fixed_form' else {}
+            # 表格行优先匹配章节关联的动态表格，其次是同一分区内的其他动态表格
+            dynamic_sheets = sorted(
+                (sh for sh in section.sheets if sh.sheet_type == 'dynamic_table'),
+                key=lambda sh: sh is not linked)
+            context = ChapterContext(local_values, global_values,
+                                     [DynamicSheetInfo(sh) for sh in dynamic_sheets], load_rows)
+            chapters.append((get_compiled_chapter(chapter.filepath), context))
+
+    if not chapters:
+        raise ExportNotFound("没有可导出的章节文档")
+    with stage('docx'):
+        assemble_document(chapters, fileobj)
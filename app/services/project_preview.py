@@ -0,0 +1,132 @@
+# app/services/project_preview.py
+
+import html as html_lib
+import re
+
+from app.models import FixedFormData, SheetRevision
+from app.services.preview_generator import get_preview_html
+from app.services.word_export import build_value_maps, format_sheet_values
+
+# 与 generate_preview_html 生成的占位符元素一致
+PLACEHOLDER_SPAN_PATTERN = re.compile(r'<span data-placeholder-for="([^"]+)">\*{10}</span>')
+EMPTY_PLACEHOLDER = '**********'
+
+
+def format_preview_value(value):
+    """转义HTML并把换行转换为 <br>，与 live_preview.js 中的显示方式一致"""
+    if not value:
+        return EMPTY_PLACEHOLDER
+    return html_lib.escape(str(value), quote=False).replace('\n', '<br>')
+
+
+class PreviewChapter:
+    """预览中的一个章节"""
+
+    __slots__ = ('id', 'html', 'linked_sheet')
+
+    def __init__(self, chapter, html, linked_sheet):
+        self.id = chapter.id
+        self.html = html
+        self.linked_sheet = linked_sheet
+
+
+def _linked_fixed_sheets(template):
+    """章节ID -> 关联的固定表单"""
+    return {sh.word_template_chapter_id: sh for section in template.sections for sh in section.sheets
+            if sh.word_template_chapter_id and sh.sheet_type == 'fixed_form'}
+
+
+def _source_sheet(linked_sheet, field_name, global_sources):
+    """占位符取值来源：章节关联的固定表单中有该字段时取之，否则取模板中第一个定义它的固定表单"""
+    if linked_sheet is not None and any(f.name == field_name for f in linked_sheet.fields):
+        return linked_sheet.name
+    return global_sources.get(field_name)
+
+
+def collect_preview_chapters(template):
+    """
+    按分区、章节的显示顺序收集模板中所有章节的缓存HTML。
+
+    Args:
+        template (CompiledFormsConfig): 模板编译产物，见 project_exports.find_project_template。
+    """
+    chapters = []
+    linked = _linked_fixed_sheets(template)
+    for section in template.sections:
+        for chapter in section.chapters:
+            html = get_preview_html(chapter.filepath, chapter.content_hash)
+            if html is None:
+                continue
+            chapters.append(PreviewChapter(chapter, html, linked.get(chapter.id)))
+    return chapters
+
+
+def _fixed_sheets(template):
+    return [sh for s in template.sections for sh in s.sheets if sh.sheet_type == 'fixed_form']
+
+
+def render_full_preview(project, template, chapters):
+    """渲染整个项目的预览HTML，占位符在服务器端直接填充为已保存的数据"""
+    fixed_sheets = _fixed_sheets(template)
+    entries = FixedFormData.query.with_entities(
+        FixedFormData.sheet_name, FixedFormData.field_name, FixedFormData.field_value
+    ).filter_by(project_id=project.id)
+    per_sheet, global_values = build_value_maps(fixed_sheets, entries, as_label=True)
+
+    parts = []
+    for chapter in chapters:
+        local = per_sheet.get(chapter.linked_sheet.name, {}) if chapter.linked_sheet else {}
+
+        def fill(match, local=local):
+            name = match.group(1)
+            value = local[name] if name in local else global_values.get(name, '')
+            return f'<span data-placeholder-for="{name}">{format_preview_value(value)}</span>'
+
+        parts.append(f'<div class="preview-chapter" data-chapter-id="{chapter.id}">'
+                     f'{PLACEHOLDER_SPAN_PATTERN.sub(fill, chapter.html)}</div>')
+    return ''.join(parts)
+
+
+def compute_preview_delta(project, template, since):
+    """
+    计算自修订号 since 以来值发生变化的占位符。
+
+    受影响的章节由模板产物中的占位符索引（字段名 -> 章节）直接查出，不需要读取章节的HTML。
+
+    Returns:
+        dict: {章节ID: {字段名: 显示HTML}}，只包含有变化的章节。
+    """
+    changed_sheets = {name for (name,) in SheetRevision.query.with_entities(SheetRevision.sheet_name).filter(
+        SheetRevision.project_id == project.id, SheetRevision.revision > since)}
+    if not changed_sheets:
+        return {}
+
+    fixed_sheets = {sh.name: sh for sh in _fixed_sheets(template) if sh.name in changed_sheets}
+    global_sources = {}
+    for sheet in _fixed_sheets(template):
+        for f in sheet.fields:
+            global_sources.setdefault(f.name, sheet.name)
+
+    stored, revisions = {}, {}
+    rows = FixedFormData.query.with_entities(
+        FixedFormData.sheet_name, FixedFormData.field_name, FixedFormData.field_value, FixedFormData.revision
+    ).filter(FixedFormData.project_id == project.id, FixedFormData.sheet_name.in_(list(fixed_sheets)))
+    for sheet_name, field_name, field_value, revision in rows:
+        stored.setdefault(sheet_name, {})[field_name] = field_value
+        revisions[(sheet_name, field_name)] = revision
+
+    # 变化的字段：修订号大于 since 的，或在变化的表单中已无数据行（被清除）的
+    changed = {}
+    for sheet_name, sheet in fixed_sheets.items():
+        values = format_sheet_values(sheet, stored.get(sheet_name, {}), as_label=True)
+        changed[sheet_name] = {name: value for name, value in values.items()
+                               if revisions.get((sheet_name, name), since + 1) > since}
+
+    linked = _linked_fixed_sheets(template)
+    delta = {}
+    for sheet_name, values in changed.items():
+        for name, value in values.items():
+            for chapter_id in template.field_chapters.get(name, ()):
+                if _source_sheet(linked.get(chapter_id), name, global_sources) == sheet_name:
+                    delta.setdefault(chapter_id, {})[name] = format_preview_value(value)
+    return delta
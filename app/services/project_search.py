@@ -0,0 +1,150 @@
+# app/services/project_search.py
+
+import base64
+import json
+from datetime import datetime, timezone, timedelta
+
+from sqlalchemy import String, func, inspect, select, table, column, text, tuple_, type_coerce
+
+from app import db
+from app.models import Project
+
+CHINA_TZ = timezone(timedelta(hours=8))
+
+# SQLite 全文索引虚拟表（FTS5 trigram 分词，见迁移 c3d9a1f07b52），rowid 即 project.id
+_search_table = table('project_search', column('rowid'))
+# trigram 索引只能匹配不少于 3 个字符的关键词，更短的关键词退回 LIKE
+_MIN_INDEXED_TERM = 3
+# engine.url -> SQLite 中全文索引表是否存在
+_fts_available = {}
+
+
+class InvalidCursor(ValueError):
+    """分页游标无法解析"""
+
+
+# ==============================================================================
+# 游标 (created_at, id)
+# ==============================================================================
+
+def encode_cursor(project):
+    """以列表中最后一个项目的 (created_at, id) 生成下一页的游标"""
+    created_at = project.created_at.isoformat() if project.created_at else None
+    raw = json.dumps([created_at, project.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, project_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return (datetime.fromisoformat(created_at) if created_at else None), int(project_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("无效的分页游标") from e
+
+
+def _created_at_bound(value):
+    """
+    游标中的时间作为比较值。SQLite 以文本存储时间，server_default 写入的值不含微秒，
+    而 SQLAlchemy 绑定的值总带微秒，需按存储格式比较，否则同一时刻的记录会被判为不等。
+    """
+    if db.engine.dialect.name == 'sqlite':
+        return type_coerce(value.strftime('%Y-%m-%d %H:%M:%S.%f' if value.microsecond else '%Y-%m-%d %H:%M:%S'),
+                           String)
+    return value
+
+
+# ==============================================================================
+# 关键词检索
+# ==============================================================================
+
+def _sqlite_fts_available():
+    key = str(db.engine.url)
+    if key not in _fts_available:
+        _fts_available[key] = inspect(db.engine).has_table('project_search')
+    return _fts_available[key]
+
+
+def _keyword_filter(column_name, term):
+    """
+    名称/编号的包含匹配。
+
+    SQLite 且已建立全文索引时通过 FTS5 trigram 索引定位项目，PostgreSQL 上的 LIKE
+    由 pg_trgm GIN 索引支持；其余情况为普通 LIKE。
+    """
+    model_column = getattr(Project, column_name)
+    if db.engine.dialect.name == 'sqlite' and len(term) >= _MIN_INDEXED_TERM and _sqlite_fts_available():
+        phrase = '"' + term.replace('"', '""') + '"'
+        matches = select(_search_table.c.rowid).where(text('project_search MATCH :q').bindparams(
+            q=f'{column_name} : {phrase}'))
+        return Project.id.in_(matches)
+    return model_column.like(f"%{term}%")
+
+
+def filtered_project_query(name=None, number=None, method=None):
+    """按名称、编号（包含匹配）和采购方式（精确匹配）筛选项目"""
+    query = Project.query
+    if name:
+        query = query.filter(_keyword_filter('name', name))
+    if number:
+        query = query.filter(_keyword_filter('number', number))
+    if method:
+        query = query.filter(Project.procurement_method == method)
+    return query
+
+
+# ==============================================================================
+# 分页与计数
+# ==============================================================================
+
+def list_projects_page(query, limit, cursor=None):
+    """
+    按 (created_at, id) 倒序做游标分页，每页只读取 limit + 1 行以判断是否还有下一页。
+
+    Returns:
+        tuple: (本页项目列表, 下一页游标或 None)
+    """
+    if cursor:
+        created_at, project_id = decode_cursor(cursor)
+        if created_at is None:
+            query = query.filter(Project.created_at.is_(None), Project.id < project_id)
+        else:
+            query = query.filter(tuple_(Project.created_at, Project.id) <
+                                 tuple_(_created_at_bound(created_at), project_id))
+    projects = query.order_by(Project.created_at.desc(), Project.id.desc()).limit(limit + 1).all()
+    if len(projects) > limit:
+        projects = projects[:limit]
+        return projects, encode_cursor(projects[-1])
+    return projects, None
+
+
+def estimate_project_count(query, filtered, exact_limit):
+    """
+    项目数量。无筛选条件时在 PostgreSQL 上直接读取表统计信息（reltuples）；
+    其余情况最多精确计数到 exact_limit，超过时只返回下限。
+
+    Returns:
+        dict: {"count": 数量, "estimated": 是否为估计值}
+    """
+    if not filtered and db.engine.dialect.name == 'postgresql':
+        estimate = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'project'::regclass")).scalar()
+        if estimate is not None and estimate >= 0:
+            return {"count": int(estimate), "estimated": True}
+
+    limited = query.with_entities(Project.id).limit(exact_limit + 1).subquery()
+    count = db.session.execute(select(func.count()).select_from(limited)).scalar()
+    if count > exact_limit:
+        return {"count": exact_limit, "estimated": True}
+    return {"count": count, "estimated": False}
+
+
+def project_to_dict(project):
+    """项目列表中一个项目的JSON表示（创建时间转换为北京时间）"""
+    return {
+        "id": project.id,
+        "name": project.name,
+        "number": project.number,
+        "procurement_method": project.procurement_method,
+        "created_at": project.created_at.replace(tzinfo=timezone.utc).astimezone(CHINA_TZ).strftime('%Y-%m-%d %H:%M')
+        if project.created_at else None
+    }
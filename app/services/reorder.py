@@ -0,0 +1,53 @@
+# app/services/reorder.py
+
+from sqlalchemy import case
+
+from app import db
+
+
+class ReorderError(ValueError):
+    """排序请求中的ID无效、重复或不属于同一个父对象"""
+
+
+def apply_display_order(model, ordered_ids, owner_column=None, owner_id=None):
+    """
+    按列表顺序为一组记录设置 display_order（从 0 开始）。
+
+    只执行两条语句：一条查询校验所有ID存在且属于同一个父对象，
+    一条 UPDATE ... SET display_order = CASE id WHEN ... END 写入全部新顺序。
+
+    Args:
+        model: 带 display_order 列的模型。
+        ordered_ids (list): 按新顺序排列的记录ID。
+        owner_column: 父对象外键列（如 Section.template_id）；为 None 时不校验归属。
+        owner_id (int): 期望的父对象ID；为 None 时只要求所有记录属于同一个父对象。
+
+    Returns:
+        int: 更新的记录数。
+
+    Raises:
+        ReorderError: ID无效、重复、不存在或归属不一致。
+    """
+    try:
+        ids = [int(i) for i in ordered_ids]
+        owner_id = int(owner_id) if owner_id is not None else None
+    except (TypeError, ValueError):
+        raise ReorderError("排序列表中包含无效的ID")
+    if len(set(ids)) != len(ids):
+        raise ReorderError("排序列表中包含重复的ID")
+    if not ids:
+        return 0
+
+    columns = [model.id] if owner_column is None else [model.id, owner_column]
+    rows = db.session.query(*columns).filter(model.id.in_(ids)).all()
+    missing = set(ids) - {row[0] for row in rows}
+    if missing:
+        raise ReorderError(f"以下ID不存在: {sorted(missing)}")
+    if owner_column is not None:
+        owners = {row[1] for row in rows}
+        if len(owners) > 1 or (owner_id is not None and owners != {owner_id}):
+            raise ReorderError("排序列表中包含不属于此父对象的记录")
+
+    return db.session.query(model).filter(model.id.in_(ids)).update(
+        {model.display_order: case({row_id: index for index, row_id in enumerate(ids)}, value=model.id)},
+        synchronize_session=False)
@@ -0,0 +1,234 @@
+# app/services/sheet_data.py
+
+from sqlalchemy import func, tuple_
+
+from app import db
+from app.models import Project, FixedFormData, DynamicTableRow, SheetRevision
+
+
+class RevisionConflict(Exception):
+    """客户端提交的基准修订号与服务器上表单的当前修订号不一致"""
+
+    def __init__(self, current_revision):
+        super().__init__(f"表单数据已被修改，当前修订号为 {current_revision}")
+        self.current_revision = current_revision
+
+
+def get_sheet_revision(project_id, sheet_name):
+    """获取指定项目、指定表单的当前修订号，从未保存过时为 0"""
+    revision = db.session.query(SheetRevision.revision).filter_by(
+        project_id=project_id, sheet_name=sheet_name).scalar()
+    return revision or 0
+
+
+def load_dynamic_rows_page(project_id, sheet_ids, limit, offset=0, after=None):
+    """
+    分页读取动态表格的行（按 display_order、id 排序）。
+
+    Args:
+        sheet_ids (list): 行数据所在的表单ID（ResolvedSheet.row_sheet_ids）。
+        limit (int): 每页行数。
+        offset (int): 跳过的行数，用于按位置随机访问（如滚动条跳转）。
+        after (str): 上一页返回的游标，按 (display_order, id) 继续读取；提供时忽略 offset。
+
+    Returns:
+        tuple: (行列表, 下一页游标或 None)
+
+    Raises:
+        ValueError: 游标格式不正确。
+    """
+    query = DynamicTableRow.query.filter(DynamicTableRow.project_id == project_id,
+                                         DynamicTableRow.sheet_id.in_(sheet_ids)) \
+        .order_by(DynamicTableRow.display_order, DynamicTableRow.id)
+    if after:
+        try:
+            display_order, row_id = (int(part) for part in after.split(':'))
+        except ValueError:
+            raise ValueError("无效的分页游标")
+        query = query.filter(tuple_(DynamicTableRow.display_order, DynamicTableRow.id) > (display_order, row_id))
+    elif offset:
+        query = query.offset(offset)
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, f"{rows[-1].display_order}:{rows[-1].id}"
+    return rows, None
+
+
+def count_dynamic_rows(project_id, sheet_ids):
+    """动态表格的行数及当前最大的 display_order（无数据时为 -1）"""
+    count, max_order = db.session.query(func.count(DynamicTableRow.id), func.max(DynamicTableRow.display_order)) \
+        .filter(DynamicTableRow.project_id == project_id, DynamicTableRow.sheet_id.in_(sheet_ids)).one()
+    return count, -1 if max_order is None else max_order
+
+
+def next_revision(project_id, sheet_name, base_revision=None):
+    """
+    为一次表单写入分配新的修订号（项目级单调递增），并记录为该表单的当前修订号。
+
+    当 base_revision 不为 None 时执行比较并交换：若表单当前修订号与之不符，
+    抛出 RevisionConflict，调用方应回滚事务。
+    """
+    db.session.query(Project).filter_by(id=project_id).update(
+        {Project.data_revision: Project.data_revision + 1}, synchronize_session=False)
+    new_revision = db.session.query(Project.data_revision).filter_by(id=project_id).scalar()
+
+    query = SheetRevision.query.filter_by(project_id=project_id, sheet_name=sheet_name)
+    if base_revision is not None:
+        query = query.filter(SheetRevision.revision == base_revision)
+    if not query.update({SheetRevision.revision: new_revision}, synchronize_session=False):
+        current = get_sheet_revision(project_id, sheet_name)
+        if base_revision is not None and current != base_revision:
+            raise RevisionConflict(current)
+        db.session.add(SheetRevision(project_id=project_id, sheet_name=sheet_name, revision=new_revision))
+    return new_revision
+
+
+def _dialect_insert():
+    """返回当前数据库方言支持 ON CONFLICT 的 insert 构造函数；不支持时返回 None"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
+
+def upsert_fixed_form_values(project_id, sheet_name, values, revision):
+    """
+    按 (project_id, sheet_name, field_name) 唯一键插入或更新固定表单字段值。
+    只有值实际发生变化的行才会更新并记录新的修订号。
+
+    Args:
+        values (dict): 字段名 -> 新值（不含 None）。
+    """
+    if not values:
+        return
+    rows = [{
+        "project_id": project_id, "sheet_name": sheet_name, "field_name": field_name,
+        "field_value": str(field_value), "revision": revision
+    } for field_name, field_value in values.items()]
+
+    insert = _dialect_insert()
+    if insert is None:
+        _upsert_fixed_form_rows_fallback(project_id, sheet_name, rows)
+        return
+
+    stmt = insert(FixedFormData)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['project_id', 'sheet_name', 'field_name'],
+        set_={'field_value': stmt.excluded.field_value, 'revision': stmt.excluded.revision},
+        where=FixedFormData.field_value.is_distinct_from(stmt.excluded.field_value)
+    )
+    db.session.execute(stmt, rows)
+
+
+def _upsert_fixed_form_rows_fallback(project_id, sheet_name, rows):
+    """不支持 ON CONFLICT 的数据库：先查出已有行，再分别批量更新和插入"""
+    existing = dict(db.session.query(FixedFormData.field_name, FixedFormData.id).filter(
+        FixedFormData.project_id == project_id,
+        FixedFormData.sheet_name == sheet_name,
+        FixedFormData.field_name.in_([row['field_name'] for row in rows])
+    ).all())
+    updates = [dict(row, id=existing[row['field_name']]) for row in rows if row['field_name'] in existing]
+    inserts = [row for row in rows if row['field_name'] not in existing]
+    if updates:
+        db.session.bulk_update_mappings(FixedFormData, updates)
+    if inserts:
+        db.session.bulk_insert_mappings(FixedFormData, inserts)
+
+
+def apply_fixed_form_changes(project_id, sheet_name, changes, revision):
+    """
+    只写入发生变化的固定表单字段。值为 None 表示清除该字段。
+
+    Args:
+        changes (dict): 字段名 -> 新值。
+    """
+    if not changes:
+        return
+    upsert_fixed_form_values(project_id, sheet_name,
+                             {name: value for name, value in changes.items() if value is not None},
+                             revision)
+    cleared = [name for name, value in changes.items() if value is None]
+    if cleared:
+        FixedFormData.query.filter(
+            FixedFormData.project_id == project_id,
+            FixedFormData.sheet_name == sheet_name,
+            FixedFormData.field_name.in_(cleared)
+        ).delete(synchronize_session=False)
+
+
+def replace_fixed_form_values(project_id, sheet_name, values, revision):
+    """
+    用完整的表单数据替换已保存的值：upsert 所有非空字段，删除其余字段。
+
+    Args:
+        values (dict): 字段名 -> 新值；值为 None 或未出现的字段会被清除。
+    """
+    kept = {name: value for name, value in values.items() if value is not None}
+    upsert_fixed_form_values(project_id, sheet_name, kept, revision)
+    FixedFormData.query.filter(
+        FixedFormData.project_id == project_id,
+        FixedFormData.sheet_name == sheet_name,
+        FixedFormData.field_name.notin_(list(kept))
+    ).delete(synchronize_session=False)
+
+
+def apply_dynamic_table_changes(project_id, sheet_id, upserts, deletes, revision, row_sheet_ids=None):
+    """
+    按稳定的行ID对动态表格进行行级更新、插入和删除。
+
+    Args:
+        sheet_id (int): 新行写入的表单ID。
+        row_sheet_ids (list): 已有行所在的表单ID（ResolvedSheet.row_sheet_ids），默认为 [sheet_id]。
+        upserts (list): 每项形如 {"id": 行ID, "data": {...}, "display_order": n}；
+                        新行不带 "id"，可带 "client_id" 以便客户端对应新分配的行ID。
+        deletes (list): 要删除的行ID列表。
+
+    Returns:
+        dict: client_id -> 新行ID。
+
+    Raises:
+        ValueError: 请求中包含不属于该项目/表单的行ID，或行数据格式不正确。
+    """
+    row_ids = [u['id'] for u in upserts if u.get('id')]
+    referenced = set(row_ids) | set(deletes)
+    if referenced:
+        owned = {row_id for (row_id,) in db.session.query(DynamicTableRow.id).filter(
+            DynamicTableRow.project_id == project_id,
+            DynamicTableRow.sheet_id.in_(row_sheet_ids or [sheet_id]),
+            DynamicTableRow.id.in_(referenced)
+        )}
+        unknown = referenced - owned
+        if unknown:
+            raise ValueError(f"行ID不存在或不属于此表单: {sorted(unknown)}")
+
+    updates, new_rows = [], []
+    for upsert in upserts:
+        if 'data' in upsert and not isinstance(upsert['data'], dict):
+            raise ValueError("行数据必须是对象")
+        if upsert.get('id'):
+            mapping = {"id": upsert['id'], "revision": revision}
+            if 'data' in upsert:
+                mapping['data'] = upsert['data']
+            if 'display_order' in upsert:
+                mapping['display_order'] = upsert['display_order']
+            updates.append(mapping)
+        else:
+            row = DynamicTableRow(
+                project_id=project_id, sheet_id=sheet_id, data=upsert.get('data') or {},
+                display_order=upsert.get('display_order', 0), revision=revision
+            )
+            new_rows.append((upsert.get('client_id'), row))
+
+    if updates:
+        db.session.bulk_update_mappings(DynamicTableRow, updates)
+    if deletes:
+        DynamicTableRow.query.filter(DynamicTableRow.id.in_(deletes)).delete(synchronize_session=False)
+    if new_rows:
+        db.session.add_all([row for _, row in new_rows])
+        db.session.flush()
+    return {client_id: row.id for client_id, row in new_rows if client_id is not None}
@@ -0,0 +1,143 @@
+# app/services/sheet_import.py
+
+import csv
+import io
+from datetime import date, datetime
+
+from openpyxl import load_workbook
+
+from app import db
+from app.models import DynamicTableRow
+from app.services.validation import validate_records
+
+# 每批写入数据库的行数
+IMPORT_BATCH_SIZE = 1000
+# 返回给客户端的错误明细上限，超出部分只计数
+MAX_REPORTED_ERRORS = 200
+
+
+def _cell_to_text(value):
+    """将 Excel 单元格的值转换为与前端录入一致的字符串"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def iter_csv_rows(stream, encoding='utf-8-sig'):
+    """逐行读取CSV文件流，不将整个文件读入内存"""
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    try:
+        for row in csv.reader(text):
+            yield [cell.strip() for cell in row]
+    finally:
+        text.detach()
+
+
+def iter_xlsx_rows(stream):
+    """以只读模式逐行读取XLSX文件的第一个工作表"""
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0]
+        for row in worksheet.iter_rows(values_only=True):
+            yield [_cell_to_text(v) for v in row]
+    finally:
+        workbook.close()
+
+
+def iter_upload_rows(file, encoding='utf-8-sig'):
+    """根据上传文件的扩展名选择对应的流式读取器"""
+    extension = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
+    if extension == 'csv':
+        return iter_csv_rows(file.stream, encoding)
+    if extension == 'xlsx':
+        return iter_xlsx_rows(file.stream)
+    raise ValueError("仅支持 .csv 或 .xlsx 文件")
+
+
+def map_header(header, fields):
+    """
+    将表头（字段标签或内部名称）映射为字段内部名称。
+    fields 为带 name、label 属性的对象（FieldDefinition 或 FieldValidator）。
+
+    Returns:
+        tuple: (列索引 -> 字段名, 未识别的表头列表)
+    """
+    by_label = {f.label: f.name for f in fields}
+    by_name = {f.name: f.name for f in fields}
+    columns, unknown = {}, []
+    for index, title in enumerate(header):
+        title = (title or '').strip()
+        if not title:
+            continue
+        name = by_label.get(title) or by_name.get(title)
+        if name:
+            columns[index] = name
+        else:
+            unknown.append(title)
+    return columns, unknown
+
+
+def import_dynamic_rows(project_id, sheet_id, validators, rows, revision, start_order=0):
+    """
+    流式校验并批量写入动态表格行。调用方负责事务的提交或回滚。
+
+    第一行为表头。数据按 IMPORT_BATCH_SIZE 行分批，每批按列一次性校验后写入。
+    遇到第一条错误后停止写入但继续校验，以便一次性报告所有错误；
+    调用方在 error_count > 0 时应回滚事务。
+
+    Args:
+        validators (dict): 表单编译后的校验器 {字段名: FieldValidator}。
+
+    Returns:
+        dict: {"imported": 写入行数, "error_count": 错误行数, "errors": [...], "unknown_columns": [...]}
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("文件为空")
+    columns, unknown = map_header(header, validators.values())
+    if not columns:
+        raise ValueError("表头中没有可识别的列，请使用字段名称或内部名称作为表头")
+
+    state = {"imported": 0, "error_count": 0, "errors": [], "display_order": start_order}
+
+    def flush(records, line_numbers):
+        failed = validate_records(validators, records)
+        if failed:
+            state["error_count"] += len(failed)
+            for index in sorted(failed):
+                if len(state["errors"]) >= MAX_REPORTED_ERRORS:
+                    break
+                state["errors"].append({"row": line_numbers[index], "errors": failed[index]})
+        if state["error_count"]:
+            return
+        order = state["display_order"]
+        db.session.bulk_insert_mappings(DynamicTableRow, [{
+            "project_id": project_id, "sheet_id": sheet_id, "data": record,
+            "display_order": order + offset, "revision": revision
+        } for offset, record in enumerate(records)])
+        state["display_order"] += len(records)
+        state["imported"] += len(records)
+
+    records, line_numbers = [], []
+    # 数据行号从2开始（第1行为表头）
+    for line_number, row in enumerate(rows, start=2):
+        record = {name: row[index] if index < len(row) else '' for index, name in columns.items()}
+        if not any(record.values()):
+            continue
+        records.append(record)
+        line_numbers.append(line_number)
+        if len(records) >= IMPORT_BATCH_SIZE:
+            flush(records, line_numbers)
+            records, line_numbers = [], []
+    if records:
+        flush(records, line_numbers)
+
+    return {"imported": state["imported"], "error_count": state["error_count"],
+            "errors": state["errors"], "unknown_columns": unknown}
@@ -0,0 +1,73 @@
+# app/services/sheet_resolver.py
+
+from app.services.forms_config import get_compiled_forms_config
+
+
+class ResolvedSheet:
+    """
+    (采购方式, 表单名称) 解析得到的已发布表单：表单ID、类型、字段配置，
+    以及编译后的校验器和联动规则依赖图。全部来自编译配置缓存，解析本身不产生查询。
+    """
+
+    __slots__ = ('name', 'config', '_compiled')
+
+    def __init__(self, compiled, name, config):
+        self._compiled = compiled
+        self.name = name
+        self.config = config
+
+    @property
+    def id(self):
+        return self.config['id']
+
+    @property
+    def row_sheet_ids(self):
+        """
+        动态表格行数据所在的表单ID：本版本的表单及同名模板其他版本中的同名表单。
+        读取、统计和查询行时按这些ID筛选，新行写入本版本的表单（id）。
+        """
+        return self.config.get('row_sheet_ids') or [self.id]
+
+    @property
+    def sheet_type(self):
+        return self.config['type']
+
+    @property
+    def template_id(self):
+        return self._compiled.template_id
+
+    @property
+    def template_version(self):
+        return self._compiled.version
+
+    @property
+    def fields(self):
+        """固定表单的字段或动态表格的列（forms-config 中的字段字典）"""
+        return self.config.get('fields') or self.config.get('columns') or []
+
+    def validators(self):
+        """编译后的字段校验器 {字段名: FieldValidator}"""
+        return self._compiled.sheet_validators(self.name)
+
+    def rule_graph(self):
+        """联动规则依赖图（CompiledRuleGraph），规则存在循环依赖时为 None"""
+        return self._compiled.sheet_rule_graph(self.name)
+
+
+def resolve_sheet(procurement_method, sheet_name):
+    """
+    将 (采购方式, 表单名称) 解析为项目所用模板（已发布的最新版本）中的表单。
+
+    模板名称到版本的映射及编译配置均缓存在进程内，并在模板变更信号（发布、设为最新版本、
+    表单或字段修改）时失效，因此数据读写只需查询数据本身。
+
+    Returns:
+        ResolvedSheet: 模板未发布或其中没有该表单时为 None。
+    """
+    compiled = get_compiled_forms_config(procurement_method)
+    if compiled is None:
+        return None
+    config = compiled.find_sheet(sheet_name)
+    if config is None:
+        return None
+    return ResolvedSheet(compiled, sheet_name, config)
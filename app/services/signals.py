@@ -0,0 +1,15 @@
+# app/services/signals.py
+
+from blinker import Namespace
+
+# 应用内部信号。各类缓存（表单配置、校验器等）订阅这些信号以便在模板变更时失效。
+_signals = Namespace()
+
+# 模板定义发生变化（发布、设为最新版本、或其分区/表单/字段/规则被修改）时发送。
+# 发送参数: template_id —— 受影响的模板ID；为 None 时表示无法确定，订阅者应清空全部缓存。
+template_changed = _signals.signal('template-changed')
+
+
+def notify_template_changed(template_id=None):
+    """发送模板变更信号"""
+    template_changed.send(None, template_id=template_id)
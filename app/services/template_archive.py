@@ -0,0 +1,306 @@
+# app/services/template_archive.py
+
+import json
+import os
+import zipfile
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.models import (
+    Template, Section, SheetDefinition, FieldDefinition, ValidationRule, ConditionalRule, WordTemplateChapter,
+    ChapterPlaceholder
+)
+from app.services.blob_store import BlobHashMismatch, blob_exists, blob_path, is_content_hash, store_stream
+from app.services.chapter_placeholders import placeholder_rows
+
+# 归档格式：
+#   manifest.json            模板结构（分区、章节、表单、字段、校验规则、联动规则）
+#   chapters/<sha256>.docx   章节文档，按内容哈希去重
+ARCHIVE_FORMAT = 'yoo-template-archive'
+ARCHIVE_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+MAX_MANIFEST_SIZE = 20 * 1024 * 1024
+SHEET_TYPES = ('fixed_form', 'dynamic_table')
+COPY_CHUNK_SIZE = 1024 * 1024
+
+FIELD_KEYS = ('name', 'label', 'field_type', 'options', 'default_value', 'help_tip', 'display_order',
+              'export_word_as_label', 'export_excel_as_label', 'is_indexed')
+
+
+class ArchiveError(ValueError):
+    """模板归档文件格式不正确或内容无效"""
+
+
+def _chapter_blob_name(content_hash):
+    return f"chapters/{content_hash}.docx"
+
+
+# ==============================================================================
+# 导出
+# ==============================================================================
+
+def build_manifest(template):
+    """
+    生成模板的清单及其引用的章节文件。
+
+    Returns:
+        tuple: (manifest dict, 引用的章节文档内容哈希集合)
+    """
+    template = Template.query.options(
+        selectinload(Template.sections).selectinload(Section.chapters),
+        selectinload(Template.sections).selectinload(Section.sheets)
+        .selectinload(SheetDefinition.fields).selectinload(FieldDefinition.validation_rules),
+        selectinload(Template.sections).selectinload(Section.sheets).selectinload(SheetDefinition.conditional_rules)
+    ).filter_by(id=template.id).one()
+
+    blobs = set()
+    sections = []
+    for section in template.sections:
+        chapters, chapter_index = [], {}
+        for chapter in section.chapters:
+            # 章节文件按内容哈希存储，清单直接使用已记录的哈希，无需重新读取文件
+            content_hash = chapter.content_hash
+            if not blob_exists(content_hash):
+                raise ArchiveError(f"章节文档 '{chapter.filename}' 的文件不存在或已丢失")
+            blobs.add(content_hash)
+            chapter_index[chapter.id] = len(chapters)
+            chapters.append({"filename": chapter.filename, "display_order": chapter.display_order,
+                             "sha256": content_hash})
+
+        sheets = [{
+            "name": sheet.name,
+            "sheet_type": sheet.sheet_type,
+            "display_order": sheet.display_order,
+            "model_identifier": sheet.model_identifier,
+            "chapter": chapter_index.get(sheet.word_template_chapter_id),
+            "fields": [dict(
+                {key: getattr(field, key) for key in FIELD_KEYS},
+                validation_rules=[{"rule_type": rule.rule_type, "rule_value": rule.rule_value,
+                                   "message": rule.message}
+                                  for rule in sorted(field.validation_rules, key=lambda r: r.id)]
+            ) for field in sheet.fields],
+            "conditional_rules": [{"name": rule.name, "definition": rule.definition}
+                                  for rule in sorted(sheet.conditional_rules, key=lambda r: r.id)]
+        } for sheet in section.sheets]
+
+        sections.append({"name": section.name, "display_order": section.display_order,
+                         "chapters": chapters, "sheets": sheets})
+
+    manifest = {
+        "format": ARCHIVE_FORMAT,
+        "format_version": ARCHIVE_VERSION,
+        "template": {"name": template.name, "version": template.version},
+        "sections": sections
+    }
+    return manifest, blobs
+
+
+def write_template_archive(template, fileobj):
+    """将模板写入 zip 归档。章节文档按内容哈希只存储一份，并分块写入"""
+    manifest, blobs = build_manifest(template)
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=1))
+        for content_hash in sorted(blobs):
+            with open(blob_path(content_hash), 'rb') as src, archive.open(_chapter_blob_name(content_hash), 'w') as dst:
+                for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b''):
+                    dst.write(chunk)
+
+
+# ==============================================================================
+# 导入
+# ==============================================================================
+
+def _require(condition, message):
+    if not condition:
+        raise ArchiveError(message)
+
+
+def _validate_manifest(manifest, blob_names, existing_sheet_names):
+    """校验清单结构；所有错误都在写入数据库之前发现"""
+    _require(isinstance(manifest, dict) and manifest.get('format') == ARCHIVE_FORMAT, "不是有效的模板归档文件")
+    _require(manifest.get('format_version') == ARCHIVE_VERSION,
+             f"不支持的归档版本: {manifest.get('format_version')}")
+    sections = manifest.get('sections')
+    _require(isinstance(sections, list), "清单中缺少分区列表")
+
+    sheet_names = set(existing_sheet_names)
+    for section in sections:
+        _require(isinstance(section, dict) and isinstance(section.get('name'), str) and section['name'].strip(),
+                 "分区名称不能为空")
+        chapters = section.get('chapters') or []
+        sheets = section.get('sheets') or []
+        _require(isinstance(chapters, list) and isinstance(sheets, list), f"分区 '{section['name']}' 的格式不正确")
+
+        filenames = set()
+        for chapter in chapters:
+            _require(isinstance(chapter, dict) and isinstance(chapter.get('filename'), str)
+                     and chapter['filename'].lower().endswith('.docx')
+                     and os.path.basename(chapter['filename']) == chapter['filename'],
+                     f"分区 '{section['name']}' 中的章节文件名无效")
+            _require(chapter['filename'] not in filenames,
+                     f"分区 '{section['name']}' 中的章节文件 '{chapter['filename']}' 重复")
+            filenames.add(chapter['filename'])
+            _require(is_content_hash(chapter.get('sha256')) and _chapter_blob_name(chapter['sha256']) in blob_names,
+                     f"归档中缺少章节文档 '{chapter['filename']}'")
+
+        linked_chapters = set()
+        for sheet in sheets:
+            _require(isinstance(sheet, dict) and isinstance(sheet.get('name'), str) and sheet['name'].strip(),
+                     f"分区 '{section['name']}' 中的表单名称不能为空")
+            name = sheet['name']
+            _require(name not in sheet_names, f"表单名称 '{name}' 重复或已存在于当前模板中")
+            sheet_names.add(name)
+            _require(sheet.get('sheet_type') in SHEET_TYPES, f"表单 '{name}' 的类型无效")
+
+            chapter = sheet.get('chapter')
+            if chapter is not None:
+                _require(isinstance(chapter, int) and 0 <= chapter < len(chapters) and chapter not in linked_chapters,
+                         f"表单 '{name}' 关联的章节无效")
+                linked_chapters.add(chapter)
+
+            fields = sheet.get('fields') or []
+            _require(isinstance(fields, list), f"表单 '{name}' 的字段列表格式不正确")
+            field_names = set()
+            for field in fields:
+                _require(isinstance(field, dict) and field.get('name') and field.get('label') and field.get('field_type'),
+                         f"表单 '{name}' 中存在缺少名称、标签或类型的字段")
+                _require(field['name'] not in field_names, f"表单 '{name}' 中的字段 '{field['name']}' 重复")
+                field_names.add(field['name'])
+                _require(all(isinstance(rule, dict) and rule.get('rule_type')
+                             for rule in field.get('validation_rules') or []),
+                         f"字段 '{field['name']}' 的校验规则格式不正确")
+
+            _require(all(isinstance(rule, dict) and rule.get('name') and isinstance(rule.get('definition'), dict)
+                         for rule in sheet.get('conditional_rules') or []),
+                     f"表单 '{name}' 的联动规则格式不正确")
+
+
+def _extract_chapter(archive, content_hash):
+    """分块解压章节文档到内容寻址存储并校验内容哈希"""
+    with archive.open(_chapter_blob_name(content_hash)) as src:
+        try:
+            return store_stream(src, expected_hash=content_hash)
+        except BlobHashMismatch:
+            raise ArchiveError("章节文档内容与清单中的哈希不一致，归档文件可能已损坏")
+
+
+def _bulk_insert_returning_ids(model, rows):
+    """批量插入并按参数顺序返回新行的ID"""
+    if not rows:
+        return []
+    result = db.session.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows)
+    return [row_id for (row_id,) in result]
+
+
+def import_template_archive(template, fileobj):
+    """
+    将归档中的分区及其全部内容追加到指定模板中。
+
+    先完整校验清单，再在同一个事务中批量插入各层定义；章节文档分块解压到内容寻址存储并校验哈希，
+    与已有文件内容相同时不重复存储。调用方负责提交事务；失败回滚后未被引用的文件由存储的回收清理。
+
+    Args:
+        template (Template): 目标模板。
+        fileobj: 可随机读取的归档文件对象。
+
+    Returns:
+        dict: 导入的分区、表单、字段、章节数量，以及其中标记了 is_indexed 的字段数量。
+
+    Raises:
+        ArchiveError: 归档无效。
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise ArchiveError("上传的文件不是有效的 zip 归档")
+
+    with archive:
+        try:
+            info = archive.getinfo(MANIFEST_NAME)
+        except KeyError:
+            raise ArchiveError("归档中缺少 manifest.json")
+        _require(info.file_size <= MAX_MANIFEST_SIZE, "manifest.json 过大")
+        try:
+            manifest = json.loads(archive.read(MANIFEST_NAME).decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            raise ArchiveError("manifest.json 不是有效的 JSON")
+
+        existing_sheet_names = {name for (name,) in db.session.query(SheetDefinition.name)
+                                .join(Section).filter(Section.template_id == template.id)}
+        _validate_manifest(manifest, set(archive.namelist()), existing_sheet_names)
+
+        return _insert_definitions(template, manifest, archive)
+
+
+def _insert_definitions(template, manifest, archive):
+    sections = manifest['sections']
+    start_order = (db.session.query(func.max(Section.display_order))
+                   .filter_by(template_id=template.id).scalar() or -1) + 1
+    section_ids = _bulk_insert_returning_ids(Section, [
+        {"template_id": template.id, "name": section['name'].strip(),
+         "display_order": start_order + index}
+        for index, section in enumerate(sections)])
+
+    # 归档内同一文件只解压一次
+    extracted = {}
+    chapter_rows, chapter_keys = [], []
+    for section_id, section in zip(section_ids, sections):
+        for index, chapter in enumerate(section.get('chapters') or []):
+            content_hash = chapter['sha256']
+            if content_hash not in extracted:
+                extracted[content_hash] = _extract_chapter(archive, content_hash)
+            chapter_rows.append({"section_id": section_id, "filename": chapter['filename'],
+                                 "content_hash": content_hash,
+                                 "display_order": chapter.get('display_order', index)})
+            chapter_keys.append((section_id, index))
+    chapter_ids = dict(zip(chapter_keys, _bulk_insert_returning_ids(WordTemplateChapter, chapter_rows)))
+
+    # 占位符索引：每个文件内容只提取一次
+    chapter_ids_by_hash = {}
+    for chapter_id, row in zip(chapter_ids.values(), chapter_rows):
+        chapter_ids_by_hash.setdefault(row['content_hash'], []).append(chapter_id)
+    placeholders = placeholder_rows(chapter_ids_by_hash)
+    if placeholders:
+        db.session.execute(insert(ChapterPlaceholder), placeholders)
+
+    sheet_rows, sheets = [], []
+    for section_id, section in zip(section_ids, sections):
+        for index, sheet in enumerate(section.get('sheets') or []):
+            chapter = sheet.get('chapter')
+            sheet_rows.append({
+                "section_id": section_id, "name": sheet['name'].strip(), "sheet_type": sheet['sheet_type'],
+                "display_order": sheet.get('display_order', index),
+                "model_identifier": sheet.get('model_identifier'),
+                "word_template_chapter_id": chapter_ids[(section_id, chapter)] if chapter is not None else None
+            })
+            sheets.append(sheet)
+    sheet_ids = _bulk_insert_returning_ids(SheetDefinition, sheet_rows)
+
+    field_rows, fields = [], []
+    rule_rows = []
+    for sheet_id, sheet in zip(sheet_ids, sheets):
+        for index, field in enumerate(sheet.get('fields') or []):
+            row = {key: field.get(key) for key in FIELD_KEYS}
+            row.update(sheet_id=sheet_id, display_order=field.get('display_order', index),
+                       export_word_as_label=bool(field.get('export_word_as_label', False)),
+                       export_excel_as_label=bool(field.get('export_excel_as_label', True)),
+                       is_indexed=bool(field.get('is_indexed', False)))
+            field_rows.append(row)
+            fields.append(field)
+        rule_rows.extend({"sheet_id": sheet_id, "name": rule['name'], "definition": rule['definition']}
+                         for rule in sheet.get('conditional_rules') or [])
+    field_ids = _bulk_insert_returning_ids(FieldDefinition, field_rows)
+
+    validation_rows = [{"field_id": field_id, "rule_type": rule['rule_type'],
+                        "rule_value": rule.get('rule_value'), "message": rule.get('message')}
+                       for field_id, field in zip(field_ids, fields)
+                       for rule in field.get('validation_rules') or []]
+    if validation_rows:
+        db.session.execute(insert(ValidationRule), validation_rows)
+    if rule_rows:
+        db.session.execute(insert(ConditionalRule), rule_rows)
+
+    return {"sections": len(section_ids), "sheets": len(sheet_ids), "fields": len(field_ids),
+            "chapters": len(chapter_rows), "indexed_fields": sum(1 for row in field_rows if row['is_indexed'])}
@@ -0,0 +1,291 @@
+# app/services/template_artifacts.py
+
+import hashlib
+
+from flask import current_app
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.models import Template, Section, SheetDefinition, FieldDefinition, WordTemplateChapter, CompiledTemplate
+from app.services.blob_store import blob_path
+from app.services.conditional_rules import RuleCycleError, compile_rule_graph
+from app.services.signals import template_changed
+
+
+def build_rule_graph(definitions):
+    """编译联动规则依赖图。历史数据中已存在循环依赖时返回 None，前端退回到全量求值"""
+    try:
+        return compile_rule_graph(definitions)
+    except RuleCycleError:
+        return None
+
+
+# ==============================================================================
+# 编译
+# ==============================================================================
+
+def _serialize_field(f):
+    return {
+        "name": f.name, "label": f.label, "field_type": f.field_type,
+        "default_value": f.default_value, "options": f.options,
+        "validation_rules": [{"rule_type": r.rule_type, "rule_value": r.rule_value, "message": r.message}
+                             for r in sorted(f.validation_rules, key=lambda r: r.id)]
+    }
+
+
+def _export_field(f):
+    return {
+        "name": f.name, "label": f.label, "field_type": f.field_type,
+        "default_value": f.default_value, "options": f.options,
+        "export_word_as_label": f.export_word_as_label, "export_excel_as_label": f.export_excel_as_label
+    }
+
+
+def compile_template(template_id):
+    """
+    将模板版本编译为 CompiledTemplate（未加入会话）。
+
+    使用固定数量的预加载查询：模板、分区、表单、字段、校验规则、联动规则、章节、占位符各一条，
+    另有一条查询同名模板各版本的动态表格，与模板包含多少分区、表单和字段无关。
+    章节的占位符来自上传时建立的索引，不读取文档。
+
+    动态表格行按表单ID保存，写入时使用当时生效版本的表单。各动态表格的 row_sheet_ids
+    列出同名模板所有版本中同名动态表格的ID，读取行数据时按这些ID查询，切换版本后数据仍然可见。
+
+    Returns:
+        CompiledTemplate: 模板不存在时为 None。
+    """
+    sections_path = selectinload(Template.sections)
+    sheets_path = sections_path.selectinload(Section.sheets)
+    template = Template.query.options(
+        sheets_path.selectinload(SheetDefinition.fields).selectinload(FieldDefinition.validation_rules),
+        sheets_path.selectinload(SheetDefinition.conditional_rules),
+        sections_path.selectinload(Section.chapters).selectinload(WordTemplateChapter.placeholders),
+    ).filter_by(id=template_id).first()
+    if not template:
+        return None
+
+    row_sheet_ids = {}
+    for sheet_id, name in db.session.query(SheetDefinition.id, SheetDefinition.name).join(Section).join(Template) \
+            .filter(Template.name == template.name, SheetDefinition.sheet_type == 'dynamic_table') \
+            .order_by(SheetDefinition.id):
+        row_sheet_ids.setdefault(name, []).append(sheet_id)
+
+    config = {"sections": {}}
+    sections, placeholders = [], {}
+    for section in template.sections:
+        section_config = {"order": [], "forms": {}}
+        export_sheets = []
+        for sheet in section.sheets:
+            section_config["order"].append(sheet.name)
+            sheet_config = {
+                "id": sheet.id,
+                "type": sheet.sheet_type,
+                "model_identifier": sheet.model_identifier
+            }
+            fields_list = [_serialize_field(f) for f in sheet.fields]
+
+            if sheet.sheet_type == 'fixed_form':
+                sheet_config['fields'] = fields_list
+                rules = sorted(sheet.conditional_rules, key=lambda r: r.id)
+                sheet_config['conditional_rules'] = [{"id": r.id, "name": r.name, "definition": r.definition} for r in rules]
+                rule_graph = build_rule_graph(r.definition for r in rules)
+                sheet_config['rule_graph'] = rule_graph.to_dict() if rule_graph else None
+            else:
+                sheet_config['columns'] = fields_list
+                # 写入配置使其参与 etag：其他版本增删表单后，各进程缓存的配置随之失效
+                sheet_config['row_sheet_ids'] = row_sheet_ids.get(sheet.name, [sheet.id])
+
+            section_config["forms"][sheet.name] = sheet_config
+            export_sheets.append({
+                "id": sheet.id, "name": sheet.name, "sheet_type": sheet.sheet_type,
+                "word_template_chapter_id": sheet.word_template_chapter_id,
+                "fields": [_export_field(f) for f in sheet.fields],
+                "row_sheet_ids": sheet_config.get('row_sheet_ids', [sheet.id])
+            })
+        config["sections"][section.name] = section_config
+
+        chapters = []
+        for chapter in section.chapters:
+            chapters.append({"id": chapter.id, "filename": chapter.filename, "content_hash": chapter.content_hash})
+            placeholders[str(chapter.id)] = [p.field_name for p in chapter.placeholders]
+        sections.append({"name": section.name, "sheets": export_sheets, "chapters": chapters})
+
+    body = current_app.json.dumps(config)
+    return CompiledTemplate(
+        template_id=template.id, name=template.name, version=template.version,
+        config=body, etag=hashlib.sha1(body.encode('utf-8')).hexdigest(),
+        sections=sections, placeholders=placeholders, compiled_at=db.func.now()
+    )
+
+
+def _store(artifact, active):
+    artifact.is_active = active
+    return db.session.merge(artifact)
+
+
+# ==============================================================================
+# 发布与生效
+#
+# 以下函数只修改会话，由调用方在同一个事务中提交，提交后发送模板变更信号。
+# 同一模板名称下最多一个版本生效（已发布且为最新版本），项目页面和导出只读取其产物。
+# ==============================================================================
+
+def _set_active_artifact(name, template_id):
+    """一条语句切换同名模板各版本产物的生效状态；template_id 为 None 时全部失效"""
+    value = CompiledTemplate.template_id == template_id if template_id is not None else False
+    CompiledTemplate.query.filter(CompiledTemplate.name == name).update(
+        {CompiledTemplate.is_active: value}, synchronize_session='fetch')
+
+
+def publish_template(template, activate=False):
+    """
+    发布模板版本：编译并保存产物。activate 为 True 时同时设为最新版本；
+    已是最新版本时产物立即生效。
+    """
+    template.status = 'published'
+    if activate:
+        activate_template(template)
+        return
+    _store(compile_template(template.id), active=False)
+    if template.is_latest:
+        _set_active_artifact(template.name, template.id)
+
+
+def unpublish_template(template):
+    """撤回发布：删除产物，该模板名称不再有生效的配置"""
+    template.status = 'draft'
+    CompiledTemplate.query.filter_by(template_id=template.id).delete(synchronize_session='fetch')
+
+
+def activate_template(template):
+    """
+    将模板版本设为最新版本：一条语句切换同名各版本的 is_latest。
+    该版本已发布时重新编译其产物并使之生效（期间新增的版本可能已写入动态表格行，见 row_sheet_ids），
+    否则该模板名称不再有生效的配置。
+    """
+    Template.query.filter(Template.name == template.name).update(
+        {Template.is_latest: Template.id == template.id}, synchronize_session='fetch')
+    if template.status != 'published':
+        _set_active_artifact(template.name, None)
+        return
+    _store(compile_template(template.id), active=False)
+    db.session.flush()
+    _set_active_artifact(template.name, template.id)
+
+
+def compile_missing_artifacts():
+    """
+    为缺少产物的已发布版本编译产物（例如在引入产物之前发布的模板），并使各名称的已发布最新版本生效。
+    由命令行 flask compile-templates 调用；页面请求只读取产物，缺失时视为未发布。只修改会话，由调用方提交。
+
+    Returns:
+        int: 新编译的产物数量。
+    """
+    compiled_ids = {template_id for (template_id,) in db.session.query(CompiledTemplate.template_id)}
+    count = 0
+    for template in Template.query.filter_by(status='published').order_by(Template.id):
+        if template.id not in compiled_ids:
+            _store(compile_template(template.id), active=False)
+            count += 1
+    db.session.flush()
+    for template in Template.query.filter_by(status='published', is_latest=True):
+        _set_active_artifact(template.name, template.id)
+    return count
+
+
+def refresh_template_artifacts(template_id=None, name=None):
+    """
+    模板定义被修改后重新编译已有的产物（template_id、name 均为 None 时为全部产物），
+    只有编译结果发生变化时才替换。指定 name 时重新编译该模板所有版本的产物。
+    """
+    query = CompiledTemplate.query
+    if template_id is not None:
+        query = query.filter_by(template_id=template_id)
+    if name is not None:
+        query = query.filter_by(name=name)
+    changed = False
+    for artifact in query.all():
+        fresh = compile_template(artifact.template_id)
+        if fresh is None:
+            continue
+        if (fresh.etag, fresh.sections, fresh.placeholders, fresh.name, fresh.version) != \
+                (artifact.etag, artifact.sections, artifact.placeholders, artifact.name, artifact.version):
+            _store(fresh, active=artifact.is_active)
+            changed = True
+    if changed:
+        db.session.commit()
+    return changed
+
+
+@template_changed.connect
+def _on_template_changed(sender, template_id=None, **extra):
+    # 无法确定受影响的模板时不在请求中重新编译全部产物（耗时随模板数量增长），
+    # 由管理员执行 flask compile-templates --all 重新编译
+    if template_id is None:
+        current_app.logger.warning("模板定义已修改但无法确定所属模板，未重新编译产物；"
+                                   "可执行 flask compile-templates --all 重新编译")
+        return
+    # 信号在模板修改提交后发出；重新编译失败不影响已经提交的修改
+    try:
+        refresh_template_artifacts(template_id)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("重新编译模板产物失败")
+
+
+# ==============================================================================
+# 产物中的导出结构
+#
+# 属性名与 Section / SheetDefinition / FieldDefinition / WordTemplateChapter 一致，
+# 导出和预览代码可以直接使用，无需访问定义表。
+# ==============================================================================
+
+class ArtifactField:
+    __slots__ = ('name', 'label', 'field_type', 'default_value', 'options',
+                 'export_word_as_label', 'export_excel_as_label')
+
+    def __init__(self, data):
+        for name in self.__slots__:
+            setattr(self, name, data.get(name))
+
+
+class ArtifactSheet:
+    __slots__ = ('id', 'name', 'sheet_type', 'word_template_chapter_id', 'fields', 'row_sheet_ids')
+
+    def __init__(self, data):
+        self.id = data['id']
+        self.name = data['name']
+        self.sheet_type = data['sheet_type']
+        self.word_template_chapter_id = data.get('word_template_chapter_id')
+        self.fields = [ArtifactField(f) for f in data.get('fields') or []]
+        # 动态表格行数据所在的表单ID（同名模板各版本中的同名表单），见 compile_template
+        self.row_sheet_ids = data.get('row_sheet_ids') or [self.id]
+
+
+class ArtifactChapter:
+    __slots__ = ('id', 'filename', 'content_hash', 'placeholders')
+
+    def __init__(self, data, placeholders):
+        self.id = data['id']
+        self.filename = data['filename']
+        self.content_hash = data.get('content_hash')
+        self.placeholders = frozenset(placeholders.get(str(data['id'])) or ())
+
+    @property
+    def filepath(self):
+        return blob_path(self.content_hash) if self.content_hash else ''
+
+
+class ArtifactSection:
+    __slots__ = ('name', 'sheets', 'chapters')
+
+    def __init__(self, data, placeholders):
+        self.name = data['name']
+        self.sheets = [ArtifactSheet(s) for s in data.get('sheets') or []]
+        self.chapters = [ArtifactChapter(c, placeholders) for c in data.get('chapters') or []]
+
+
+def load_sections(sections, placeholders):
+    """由产物的 sections 与 placeholders 构建按显示顺序排列的 ArtifactSection 列表"""
+    return [ArtifactSection(s, placeholders or {}) for s in sections or []]
@@ -0,0 +1,165 @@
+# app/services/template_clone.py
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, delete, func, insert, literal, select, text, update
+
+from app import db
+from app.models import (
+    Template, Section, SheetDefinition, FieldDefinition, ValidationRule, ConditionalRule, WordTemplateChapter,
+    ChapterPlaceholder, CompiledTemplate
+)
+
+# 旧ID -> 新ID 的映射表。使用临时表，只在当前数据库连接内可见，不属于应用的数据模型
+_id_map = Table(
+    'clone_id_map', MetaData(),
+    Column('kind', String(30), nullable=False),
+    Column('old_id', Integer, nullable=False),
+    Column('new_id', Integer, nullable=False),
+    prefixes=['TEMPORARY']
+)
+
+# 按依赖顺序复制的子表: (模型, 指向父表的外键列, 父表在映射表中的类型, 其他需要重映射的外键 {列名: 类型})
+_CLONE_PLAN = (
+    (Section, 'template_id', 'template', {}),
+    (WordTemplateChapter, 'section_id', 'section', {}),
+    (SheetDefinition, 'section_id', 'section', {'word_template_chapter_id': 'word_template_chapter'}),
+    (FieldDefinition, 'sheet_id', 'sheet_definition', {}),
+    (ValidationRule, 'field_id', 'field_definition', {}),
+    (ConditionalRule, 'sheet_id', 'sheet_definition', {}),
+)
+
+
+def _prepare_id_map(session):
+    bind = session.connection()
+    if bind.dialect.name == 'postgresql':
+        bind.execute(text(
+            "CREATE TEMPORARY TABLE IF NOT EXISTS clone_id_map "
+            "(kind VARCHAR(30) NOT NULL, old_id INTEGER NOT NULL, new_id INTEGER NOT NULL) ON COMMIT DELETE ROWS"))
+    else:
+        _id_map.create(bind, checkfirst=True)
+    bind.execute(_id_map.delete())
+    bind.execute(text("CREATE INDEX IF NOT EXISTS ix_clone_id_map ON clone_id_map (kind, old_id)"))
+
+
+def _new_id_expression(session, table, source):
+    """
+    为待复制的行分配新ID。PostgreSQL 直接从表的序列中取值（并发安全）；
+    其他数据库在当前最大ID之后按旧ID顺序连续编号（SQLite 的写事务本身是串行的）。
+    """
+    if session.get_bind().dialect.name == 'postgresql':
+        return func.nextval(func.pg_get_serial_sequence(table.name, 'id'))
+    base = session.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+    return literal(base) + func.row_number().over(order_by=source.c.id)
+
+
+def _parent_ids(kind):
+    return select(_id_map.c.old_id).where(_id_map.c.kind == kind)
+
+
+def _copy_children(session, model, parent_column, parent_kind, remaps):
+    """
+    用两条 INSERT ... SELECT 复制一张子表中属于已复制父行的所有行：
+    先在映射表中为每一行分配新ID，再按映射插入副本并重写外键。
+    """
+    table = model.__table__
+    source = table.alias('src')
+    kind = table.name
+
+    session.execute(insert(_id_map).from_select(
+        ['kind', 'old_id', 'new_id'],
+        select(literal(kind), source.c.id, _new_id_expression(session, table, source))
+        .where(source.c[parent_column].in_(_parent_ids(parent_kind)))
+    ))
+
+    own = _id_map.alias('own')
+    parent = _id_map.alias('parent')
+    joined = source.join(own, (own.c.kind == kind) & (own.c.old_id == source.c.id)) \
+        .join(parent, (parent.c.kind == parent_kind) & (parent.c.old_id == source.c[parent_column]))
+
+    columns, values = ['id', parent_column], [own.c.new_id, parent.c.new_id]
+    for column_name, ref_kind in remaps.items():
+        ref = _id_map.alias(f'ref_{column_name}')
+        joined = joined.outerjoin(ref, (ref.c.kind == ref_kind) & (ref.c.old_id == source.c[column_name]))
+        columns.append(column_name)
+        values.append(ref.c.new_id)
+    for column in table.c:
+        if column.name not in columns:
+            columns.append(column.name)
+            values.append(source.c[column.name])
+
+    session.execute(insert(table).from_select(columns, select(*values).select_from(joined)))
+
+
+def _copy_chapter_placeholders(session):
+    """章节的占位符索引没有自己的ID，按章节的映射一条语句复制"""
+    table = ChapterPlaceholder.__table__
+    chapter_map = _id_map.alias('chapter_map')
+    session.execute(insert(table).from_select(
+        ['chapter_id', 'field_name'],
+        select(chapter_map.c.new_id, table.c.field_name).select_from(
+            table.join(chapter_map, (chapter_map.c.kind == 'word_template_chapter')
+                       & (chapter_map.c.old_id == table.c.chapter_id)))
+    ))
+
+
+def clone_template(source):
+    """
+    深度复制一个模板的全部结构，作为同名模板的新版本（草稿，版本号递增）：
+    分区、章节文档引用及其占位符索引、表单、字段、校验规则和联动规则。
+
+    每张表只执行两条集合式 INSERT ... SELECT 语句，新旧ID的对应关系记录在临时映射表中。
+    章节文档只复制引用（content_hash），不复制文件本身。调用方负责提交事务。
+
+    Args:
+        source (Template): 被复制的模板。
+
+    Returns:
+        Template: 新创建的模板版本（尚未提交）。
+    """
+    session = db.session
+    version = (session.query(func.max(Template.version)).filter(Template.name == source.name).scalar() or 0) + 1
+
+    new_template = Template(name=source.name, version=version, status='draft', is_latest=False,
+                            parent_id=source.id, display_order=source.display_order)
+    session.add(new_template)
+    session.flush()
+
+    _prepare_id_map(session)
+    session.execute(insert(_id_map).values(kind='template', old_id=source.id, new_id=new_template.id))
+    for model, parent_column, parent_kind, remaps in _CLONE_PLAN:
+        _copy_children(session, model, parent_column, parent_kind, remaps)
+    _copy_chapter_placeholders(session)
+    session.execute(_id_map.delete())
+    return new_template
+
+
+
+def delete_template(template):
+    """
+    删除一个模板版本及其全部结构，与 clone_template 对应：每张子表一条集合式
+    DELETE ... WHERE ... IN (子查询)，不把分区、表单、字段等逐行加载到会话中。
+
+    从该版本克隆出的版本保留，其 parent_id 置空。调用方负责提交事务，
+    并事先处理仍引用该版本表单的动态表格行。
+    """
+    session = db.session
+    sections = select(Section.id).where(Section.template_id == template.id)
+    sheets = select(SheetDefinition.id).where(SheetDefinition.section_id.in_(sections))
+    fields = select(FieldDefinition.id).where(FieldDefinition.sheet_id.in_(sheets))
+    chapters = select(WordTemplateChapter.id).where(WordTemplateChapter.section_id.in_(sections))
+
+    # 按外键依赖顺序：表单引用章节（word_template_chapter_id），因此先删除表单
+    statements = (
+        update(Template).where(Template.parent_id == template.id).values(parent_id=None),
+        delete(ValidationRule).where(ValidationRule.field_id.in_(fields)),
+        delete(ConditionalRule).where(ConditionalRule.sheet_id.in_(sheets)),
+        delete(FieldDefinition).where(FieldDefinition.sheet_id.in_(sheets)),
+        delete(SheetDefinition).where(SheetDefinition.section_id.in_(sections)),
+        delete(ChapterPlaceholder).where(ChapterPlaceholder.chapter_id.in_(chapters)),
+        delete(WordTemplateChapter).where(WordTemplateChapter.section_id.in_(sections)),
+        delete(Section).where(Section.template_id == template.id),
+        delete(CompiledTemplate).where(CompiledTemplate.template_id == template.id),
+        delete(Template).where(Template.id == template.id),
+    )
+    for statement in statements:
+        session.execute(statement.execution_options(synchronize_session=False))
+    session.expunge(template)
@@ -0,0 +1,190 @@
+# app/services/validation.py
+
+import re
+
+
+class RecordValidationError(ValueError):
+    """提交的数据未通过字段校验规则"""
+
+    def __init__(self, errors, message="数据未通过校验"):
+        super().__init__(message)
+        self.errors = errors
+
+
+def _parse_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ==============================================================================
+# 规则编译
+#
+# 每条规则被编译为按列工作的检查函数 check(items) -> [(行索引, 错误信息), ...]，
+# items 为 [(行索引, 文本), ...]。单条记录的校验也是长度为 1 的列，
+# 因此固定表单保存和 5 万行导入共用同一套实现，导入时每列只做一次遍历。
+# ==============================================================================
+
+def _compile_rule(rule_type, rule_value, message):
+    """
+    将一条 ValidationRule 编译为列检查函数。
+    正则、数值边界等参数在此处一次性解析；无法解析的规则返回 None（忽略）。
+    """
+    if rule_type == 'pattern':
+        try:
+            search = re.compile(rule_value).search
+        except (re.error, TypeError):
+            return None
+        error = message or f"格式不符合要求: {rule_value}"
+        return lambda items: [(i, error) for i, text in items if not search(text)]
+
+    if rule_type in ('minLength', 'maxLength'):
+        bound = _parse_number(rule_value)
+        if bound is None:
+            return None
+        if rule_type == 'minLength':
+            error = message or f"长度不能少于 {int(bound)} 个字符"
+            return lambda items: [(i, error) for i, text in items if len(text) < bound]
+        error = message or f"长度不能超过 {int(bound)} 个字符"
+        return lambda items: [(i, error) for i, text in items if len(text) > bound]
+
+    if rule_type in ('minValue', 'maxValue'):
+        bound = _parse_number(rule_value)
+        if bound is None:
+            return None
+        nan_error = message or "必须是数字"
+        if rule_type == 'minValue':
+            error = message or f"不能小于 {rule_value}"
+            out_of_range = bound.__gt__
+        else:
+            error = message or f"不能大于 {rule_value}"
+            out_of_range = bound.__lt__
+
+        def check(items):
+            failed = []
+            for i, text in items:
+                number = _parse_number(text)
+                if number is None:
+                    failed.append((i, nan_error))
+                elif out_of_range(number):
+                    failed.append((i, error))
+            return failed
+        return check
+
+    if rule_type in ('contains', 'excludes'):
+        words = [w for w in (rule_value or '').split(',') if w]
+        if not words:
+            return None
+        if rule_type == 'contains':
+            return lambda items: [(i, message or f"必须包含 '{missing}'") for i, text in items
+                                  for missing in [next((w for w in words if w not in text), None)]
+                                  if missing is not None]
+        return lambda items: [(i, message or f"不能包含 '{found}'") for i, text in items
+                              for found in [next((w for w in words if w in text), None)]
+                              if found is not None]
+
+    # required / disabled / allowEnglishSpace / allowChineseSpace 等由调用方或前端处理
+    return None
+
+
+class FieldValidator:
+    """单个字段编译后的校验器"""
+
+    __slots__ = ('name', 'label', 'required', 'disabled', 'numeric', 'checks')
+
+    def __init__(self, name, label, field_type, rules):
+        """
+        Args:
+            rules (iterable): (rule_type, rule_value, message) 三元组。
+        """
+        rules = {rule_type: (rule_value, message) for rule_type, rule_value, message in rules}
+        self.name = name
+        self.label = label
+        self.required = str(rules.get('required', ('',))[0]).lower() == 'true'
+        self.disabled = str(rules.get('disabled', ('',))[0]).lower() == 'true'
+        self.numeric = field_type == 'number'
+        self.checks = [check for check in (_compile_rule(rule_type, value, message)
+                                           for rule_type, (value, message) in rules.items())
+                       if check is not None]
+
+    def validate_column(self, values, enforce_required=True):
+        """
+        校验一列值。
+
+        Returns:
+            dict: 行索引 -> 错误信息（每个值只报告第一条错误）。
+        """
+        if self.disabled:
+            return {}
+        errors, items = {}, []
+        for i, value in enumerate(values):
+            text = '' if value is None else (value if isinstance(value, str) else str(value))
+            if text.strip():
+                items.append((i, text))
+            elif enforce_required and self.required:
+                errors[i] = "此项为必填项"
+
+        if self.numeric and items:
+            failed = [(i, "必须是数字") for i, text in items if _parse_number(text) is None]
+            if failed:
+                errors.update(failed)
+                items = [item for item in items if item[0] not in errors]
+
+        for check in self.checks:
+            if not items:
+                break
+            failed = check(items)
+            if failed:
+                errors.update(failed)
+                items = [item for item in items if item[0] not in errors]
+        return errors
+
+    def validate(self, value, enforce_required=True):
+        """校验单个值，通过时返回 None，否则返回错误信息"""
+        return self.validate_column((value,), enforce_required).get(0)
+
+
+def compile_field_validators(fields):
+    """将一组 FieldDefinition 编译为 {字段名: FieldValidator}"""
+    return {f.name: FieldValidator(f.name, f.label, f.field_type,
+                                   ((r.rule_type, r.rule_value, r.message) for r in f.validation_rules))
+            for f in fields}
+
+
+def compile_config_validators(field_configs):
+    """将表单配置（forms-config 中的字段字典）编译为 {字段名: FieldValidator}"""
+    return {f['name']: FieldValidator(f['name'], f['label'], f['field_type'],
+                                      ((r['rule_type'], r['rule_value'], r.get('message'))
+                                       for r in f.get('validation_rules') or []))
+            for f in field_configs}
+
+
+def validate_records(validators, records, enforce_required=True):
+    """
+    按列批量校验多条记录：每个字段的每条规则对整列只遍历一次。
+
+    Returns:
+        dict: 记录索引 -> {字段名: 错误信息}，只包含未通过的记录。
+    """
+    errors = {}
+    for name, validator in validators.items():
+        column = [record.get(name) for record in records]
+        for index, error in validator.validate_column(column, enforce_required).items():
+            errors.setdefault(index, {})[name] = error
+    return errors
+
+
+def validate_record(validators, record, enforce_required=True, fields=None):
+    """
+    按已编译的校验器校验一条记录（固定表单数据或动态表格的一行）。
+
+    Args:
+        fields (iterable): 只校验这些字段（例如增量保存时提交的字段）；为 None 时校验全部字段。
+
+    Returns:
+        dict: 字段名 -> 错误信息，全部通过时为空字典。
+    """
+    if fields is not None:
+        validators = {name: validators[name] for name in fields if name in validators}
+    return validate_records(validators, [record], enforce_required).get(0, {})
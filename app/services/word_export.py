@@ -0,0 +1,426 @@
+# app/services/word_export.py
+
+import copy
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+import docx
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.oxml import parse_xml
+from docx.parts.numbering import NumberingPart
+from lxml import etree
+
+from app.services.field_format import build_label_map, format_field_value
+from app.services.preview_generator import PLACEHOLDER_PATTERN
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+W_P, W_T, W_TR, W_TBL = (f'{{{W_NS}}}{tag}' for tag in ('p', 't', 'tr', 'tbl'))
+W_VAL = f'{{{W_NS}}}val'
+W_NUM, W_NUM_ID, W_ABSTRACT_NUM, W_ABSTRACT_NUM_ID = (
+    f'{{{W_NS}}}{tag}' for tag in ('num', 'numId', 'abstractNum', 'abstractNumId'))
+
+# 编译时用于标记可重复表格行位置的元素
+_ROW_MARKER_PATTERN = re.compile(r"<yoo_rows_(\d+)/>")
+# 一个值中的换行在 Word 中渲染为 <w:br/>
+_LINE_BREAK = '</w:t><w:br/><w:t xml:space="preserve">'
+_PAGE_BREAK = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+_STYLE_REF_PATTERN = re.compile(r'<w:(?:pStyle|rStyle|tblStyle) w:val="([^"]+)"')
+_REL_REF_PATTERN = re.compile(r'(r:(?:embed|id|link))="([^"]+)"')
+_NUM_REF_PATTERN = re.compile(r'(<w:numId w:val=")(\d+)(")')
+# 动态表格中自动生成的序号列
+SEQUENCE_FIELD = 'sequence'
+
+
+# ==============================================================================
+# 章节模板编译
+# ==============================================================================
+
+def _merge_split_placeholders(paragraph):
+    """
+    Word 经常把 {{field_name}} 拆分到多个 run 中。将每个占位符的全部字符移动到
+    它起始所在的 <w:t> 中，使其在序列化后的XML里成为连续文本。
+    """
+    texts = list(paragraph.iter(W_T))
+    if len(texts) < 2:
+        return
+    joined = ''.join(t.text or '' for t in texts)
+    if '{{' not in joined:
+        return
+
+    owners = []
+    for index, t in enumerate(texts):
+        owners.extend([index] * len(t.text or ''))
+    for match in PLACEHOLDER_PATTERN.finditer(joined):
+        start_owner = owners[match.start()]
+        for pos in range(match.start(), match.end()):
+            owners[pos] = start_owner
+
+    new_texts = [''] * len(texts)
+    for char, owner in zip(joined, owners):
+        new_texts[owner] += char
+    for t, text in zip(texts, new_texts):
+        t.text = text
+        if PLACEHOLDER_PATTERN.search(text):
+            t.set(f'{{{XML_NS}}}space', 'preserve')
+
+
+def _split_segments(xml_text):
+    """将序列化的XML拆分为静态文本与占位符交替的片段列表: [str, name, str, name, ..., str]"""
+    return PLACEHOLDER_PATTERN.split(xml_text)
+
+
+class RowTemplate:
+    """包含占位符的表格行，渲染时可按动态表格的数据重复"""
+
+    __slots__ = ('segments', 'names')
+
+    def __init__(self, xml_text):
+        self.segments = _split_segments(xml_text)
+        self.names = frozenset(self.segments[1::2])
+
+
+class CompiledChapter:
+    """
+    预编译的章节模板。
+
+    document.xml 被解析一次：合并拆分的占位符、提取可重复的表格行，然后序列化并按占位符切分。
+    渲染时只需按片段拼接字符串，不再解析或扫描XML。
+    另保留一份正文为空的文档副本，作为导出时的基础文档（见 new_document）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            source = docx.Document(f)
+        self.source = source
+        root = copy.deepcopy(source.element)
+
+        for paragraph in root.iter(W_P):
+            _merge_split_placeholders(paragraph)
+
+        self.rows = []
+        for row in list(root.iter(W_TR)):
+            if row.find(f'.//{W_TBL}') is not None:
+                continue
+            row_xml = etree.tostring(row, encoding='unicode')
+            if not PLACEHOLDER_PATTERN.search(row_xml):
+                continue
+            marker = etree.Element(f'yoo_rows_{len(self.rows)}')
+            marker.tail = row.tail
+            row.getparent().replace(row, marker)
+            # 去除行片段上重复的命名空间声明，使其可以直接嵌入文档
+            self.rows.append(RowTemplate(re.sub(r'\sxmlns:\w+="[^"]*"', '', row_xml)))
+
+        xml_text = etree.tostring(root, encoding='unicode')
+        body_start = xml_text.index('>', xml_text.index('<w:body')) + 1
+        sect_start = xml_text.rfind('<w:sectPr')
+        body_end = sect_start if sect_start != -1 else xml_text.rindex('</w:body>')
+        self.head = xml_text[:body_start]
+        self.tail = xml_text[body_end:]
+
+        body = xml_text[body_start:body_end]
+        self.body = []
+        for index, part in enumerate(_ROW_MARKER_PATTERN.split(body)):
+            if index % 2:
+                self.body.append(int(part))
+            else:
+                self.body.append(_split_segments(part))
+
+        self.placeholders = frozenset(
+            name for part in self.body if isinstance(part, list) for name in part[1::2]
+        ).union(*(row.names for row in self.rows))
+
+        base = copy.deepcopy(source)
+        base_body = base.element.body
+        for child in list(base_body):
+            base_body.remove(child)
+        self._base = base
+
+    def new_document(self):
+        """
+        以本章节为基础的新文档：样式、编号、页面设置、页眉页脚和关系均为独立的副本，正文为空。
+        复制内存中的对象，不重新读取和解析 .docx 文件。
+        """
+        return copy.deepcopy(self._base)
+
+    def render_body(self, context):
+        """使用 ChapterContext 渲染正文（不含 <w:sectPr>）"""
+        out = []
+        for part in self.body:
+            if isinstance(part, int):
+                row = self.rows[part]
+                for values in context.rows_for(row.names):
+                    _render_segments(row.segments, values.get, out)
+            else:
+                _render_segments(part, context.value, out)
+        return ''.join(out)
+
+
+def _render_segments(segments, lookup, out):
+    for index, segment in enumerate(segments):
+        if index % 2:
+            value = lookup(segment)
+            if value:
+                out.append(escape(str(value)).replace('\n', _LINE_BREAK))
+        else:
+            out.append(segment)
+
+
+_compiled_cache = OrderedDict()
+_compiled_lock = threading.Lock()
+COMPILED_CACHE_SIZE = 64
+
+
+def get_compiled_chapter(path):
+    """获取章节模板的编译结果；以 (路径, 修改时间, 大小) 为键缓存，文件被覆盖后自动重新编译"""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _compiled_lock:
+        compiled = _compiled_cache.get(key)
+        if compiled is not None:
+            _compiled_cache.move_to_end(key)
+            return compiled
+
+    compiled = CompiledChapter(path)
+    with _compiled_lock:
+        _compiled_cache[key] = compiled
+        while len(_compiled_cache) > COMPILED_CACHE_SIZE:
+            _compiled_cache.popitem(last=False)
+    return compiled
+
+
+# ==============================================================================
+# 数据上下文
+# ==============================================================================
+
+class ChapterContext:
+    """为一个章节解析占位符的值：优先使用章节关联表单的字段，其次是模板中任意固定表单的同名字段"""
+
+    def __init__(self, local_values, global_values, dynamic_sheets, row_loader):
+        self._local = local_values
+        self._global = global_values
+        self._dynamic_sheets = dynamic_sheets
+        self._row_loader = row_loader
+
+    def value(self, name):
+        if name in self._local:
+            return self._local[name]
+        return self._global.get(name, '')
+
+    def rows_for(self, names):
+        """返回表格行模板对应的数据行；找不到对应的动态表格时按固定值渲染一次"""
+        for sheet in self._dynamic_sheets:
+            if names & sheet.column_names:
+                return self._row_loader(sheet)
+        return [{name: self.value(name) for name in names}]
+
+
+class DynamicSheetInfo:
+    """动态表格导出所需的列信息"""
+
+    def __init__(self, sheet):
+        self.row_sheet_ids = sheet.row_sheet_ids
+        self.columns = [(f.name, f.field_type, build_label_map(f), f.export_word_as_label) for f in sheet.fields]
+        self.column_names = frozenset(name for name, *_ in self.columns) | {SEQUENCE_FIELD}
+
+
+# ==============================================================================
+# 文档拼接
+# ==============================================================================
+
+def _copy_missing_styles(target_doc, source_doc, style_ids):
+    """将目标文档中缺少的样式（及其 basedOn 样式）复制过去，返回复制的样式元素"""
+    copied = []
+    target_styles = target_doc.styles.element
+    source_styles = source_doc.styles.element
+    existing = {s.get(f'{{{W_NS}}}styleId') for s in target_styles.iterchildren(f'{{{W_NS}}}style')}
+    pending = list(style_ids)
+    while pending:
+        style_id = pending.pop()
+        if style_id in existing:
+            continue
+        style = source_styles.find(f'{{{W_NS}}}style[@{{{W_NS}}}styleId="{style_id}"]')
+        if style is None:
+            continue
+        copied.append(copy.deepcopy(style))
+        target_styles.append(copied[-1])
+        existing.add(style_id)
+        based_on = style.find(f'{{{W_NS}}}basedOn')
+        if based_on is not None:
+            pending.append(based_on.get(f'{{{W_NS}}}val'))
+    return copied
+
+
+def _numbering_element(doc, create=False):
+    """文档的 <w:numbering> 元素；文档没有编号部件时为 None，或在 create 为 True 时新建"""
+    try:
+        return doc.part.part_related_by(RT.NUMBERING).element
+    except KeyError:
+        if not create:
+            return None
+    part = NumberingPart(PackURI('/word/numbering.xml'), CT.WML_NUMBERING,
+                         parse_xml(f'<w:numbering xmlns:w="{W_NS}"/>'), doc.part.package)
+    doc.part.relate_to(part, RT.NUMBERING)
+    return part.element
+
+
+def _merge_numbering(target_doc, source_doc, body_xml, styles):
+    """
+    将章节正文和新复制的样式引用的列表编号定义（w:num 及其 w:abstractNum）复制到目标文档，
+    以新的ID编号并改写引用。每个章节的列表使用自己的定义，编号不会与其他章节连续。
+    """
+    style_refs = [el for style in styles for el in style.iter(W_NUM_ID)]
+    num_ids = {m.group(2) for m in _NUM_REF_PATTERN.finditer(body_xml)} | {el.get(W_VAL) for el in style_refs}
+    num_ids.discard('0')  # numId 为 0 表示取消编号
+    source = _numbering_element(source_doc) if num_ids else None
+    if source is None:
+        return body_xml
+
+    target = _numbering_element(target_doc, create=True)
+    next_num = max((int(n.get(W_NUM_ID)) for n in target.iterchildren(W_NUM)), default=0) + 1
+    next_abstract = max((int(a.get(W_ABSTRACT_NUM_ID)) for a in target.iterchildren(W_ABSTRACT_NUM)), default=-1) + 1
+    num_map, abstract_map = {}, {}
+    for num_id in sorted(num_ids, key=int):
+        num = source.find(f'{W_NUM}[@{W_NUM_ID}="{num_id}"]')
+        if num is None:
+            continue
+        num = copy.deepcopy(num)
+        abstract_ref = num.find(W_ABSTRACT_NUM_ID)
+        abstract_id = abstract_ref.get(W_VAL)
+        if abstract_id not in abstract_map:
+            abstract = source.find(f'{W_ABSTRACT_NUM}[@{W_ABSTRACT_NUM_ID}="{abstract_id}"]')
+            if abstract is None:
+                continue
+            abstract = copy.deepcopy(abstract)
+            abstract.set(W_ABSTRACT_NUM_ID, str(next_abstract))
+            abstract_map[abstract_id] = str(next_abstract)
+            next_abstract += 1
+            # w:abstractNum 须位于所有 w:num 之前
+            first_num = target.find(W_NUM)
+            if first_num is not None:
+                first_num.addprevious(abstract)
+            else:
+                target.append(abstract)
+        abstract_ref.set(W_VAL, abstract_map[abstract_id])
+        num.set(W_NUM_ID, str(next_num))
+        num_map[num_id] = str(next_num)
+        next_num += 1
+        last_num = target.findall(W_NUM)
+        if last_num:
+            last_num[-1].addnext(num)
+        else:
+            target.append(num)
+
+    for el in style_refs:
+        el.set(W_VAL, num_map.get(el.get(W_VAL), el.get(W_VAL)))
+    return _NUM_REF_PATTERN.sub(lambda m: m.group(1) + num_map.get(m.group(2), m.group(2)) + m.group(3), body_xml)
+
+
+def _remap_relationships(target_doc, source_doc, body_xml):
+    """将章节正文中引用的图片、超链接关系复制到目标文档，并改写 rId"""
+    source_rels = source_doc.part.rels
+    mapping = {}
+
+    def remap(match):
+        attr, rid = match.groups()
+        if rid not in mapping:
+            rel = source_rels.get(rid)
+            if rel is None:
+                mapping[rid] = rid
+            elif rel.is_external:
+                mapping[rid] = target_doc.part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+            elif rel.reltype == RT.IMAGE:
+                mapping[rid], _ = target_doc.part.get_or_add_image(io.BytesIO(rel.target_part.blob))
+            else:
+                mapping[rid] = rid
+        return f'{attr}="{mapping[rid]}"'
+
+    return _REL_REF_PATTERN.sub(remap, body_xml)
+
+
+def assemble_document(chapters, fileobj):
+    """
+    将多个章节渲染并按顺序拼接为一个 .docx 文档。
+
+    Args:
+        chapters (list): [(CompiledChapter, ChapterContext), ...]，至少一项。
+        fileobj: 可写的二进制文件对象。
+
+    以第一个章节的基础文档副本为输出（保留其页面设置、页眉页脚，见 CompiledChapter.new_document），
+    后续章节以分页符分隔追加，其图片、超链接、缺失的样式和列表编号定义会被复制到输出文档中。
+    """
+    first, first_context = chapters[0]
+    target = first.new_document()
+
+    bodies = [first.render_body(first_context)]
+    for compiled, context in chapters[1:]:
+        body = compiled.render_body(context)
+        body = _remap_relationships(target, compiled.source, body)
+        styles = _copy_missing_styles(target, compiled.source, set(_STYLE_REF_PATTERN.findall(body)))
+        body = _merge_numbering(target, compiled.source, body, styles)
+        bodies.append(body)
+
+    rendered = parse_xml((first.head + _PAGE_BREAK.join(bodies) + first.tail).encode('utf-8'))
+    target.element.body.extend(list(rendered.body))
+    target.save(fileobj)
+
+
+def format_sheet_values(sheet, stored, as_label=None):
+    """
+    格式化一个固定表单的全部字段值；未填写的字段使用默认值。
+
+    Args:
+        sheet (ArtifactSheet): 固定表单（含 fields）。
+        stored (dict): 已保存的 {field_name: field_value}。
+        as_label (bool): 为 None 时按字段的 export_word_as_label 设置决定是否转换为选项标签。
+    """
+    values = {}
+    for f in sheet.fields:
+        value = stored.get(f.name)
+        if value in (None, ''):
+            value = f.default_value or ''
+        use_label = f.export_word_as_label if as_label is None else as_label
+        values[f.name] = format_field_value(f.field_type, build_label_map(f), value, use_label)
+    return values
+
+
+def build_value_maps(fixed_sheets, entries, as_label=None):
+    """
+    根据固定表单数据构建占位符取值表。
+
+    Args:
+        fixed_sheets (list): 模板中按顺序排列的固定表单 ArtifactSheet。
+        entries (iterable): (sheet_name, field_name, field_value) 三元组。
+        as_label (bool): 见 format_sheet_values。
+
+    Returns:
+        tuple: (按表单名称分组的取值 {sheet_name: {field: value}}, 全局取值 {field: value})
+               同名字段的全局取值来自模板中第一个定义该字段的固定表单。
+    """
+    raw = {}
+    for sheet_name, field_name, field_value in entries:
+        raw.setdefault(sheet_name, {})[field_name] = field_value
+
+    per_sheet, global_values = {}, {}
+    for sheet in fixed_sheets:
+        values = format_sheet_values(sheet, raw.get(sheet.name, {}), as_label)
+        per_sheet[sheet.name] = values
+        for name, value in values.items():
+            global_values.setdefault(name, value)
+    return per_sheet, global_values
+
+
+def format_dynamic_row(info, index, data):
+    """按导出设置格式化动态表格的一行数据"""
+    values = {SEQUENCE_FIELD: str(index)}
+    for name, field_type, label_map, as_label in info.columns:
+        if name == SEQUENCE_FIELD:
+            continue
+        values[name] = format_field_value(field_type, label_map, data.get(name), as_label)
+    return values
@@ -142,6 +142,7 @@ function updateModalUI() {
     // 根据模式显示/隐藏选项
     document.getElementById('fixed-form-only-options').style.display = isColumnMode ? 'none' : 'block';
     document.getElementById('fixed-form-validation-rules').style.display = isColumnMode ? 'none' : 'block';
+    document.getElementById('fieldIndexedGroup').style.display = isColumnMode ? 'block' : 'none';
 
     // 控制选项区域的可见性
     const optionsGroup = document.getElementById('optionsGroup');
@@ -246,6 +247,7 @@ function openFieldModal(fieldData = null) {
         if(fieldData.field_type === 'textarea') document.getElementById('fieldDefaultMulti').value = fieldData.default_value || '';
         else document.getElementById('fieldDefaultSingle').value = fieldData.default_value || '';
         document.getElementById('fieldHelpTip').value = fieldData.help_tip || '';
+        document.getElementById('fieldIsIndexed').checked = !!fieldData.is_indexed;
 
         currentFieldName = fieldData.name;
 
@@ -329,6 +331,10 @@ function saveField() {
         validation: validation
     };
 
+    if (isColumnMode) {
+        payload.is_indexed = document.getElementById('fieldIsIndexed').checked;
+    }
+
     if (!isColumnMode && FIELD_TYPES_REQUIRING_OPTIONS.includes(fieldType)) {
         payload.option_labels = document.getElementById('fieldOptionLabels').value.trim().split('\n');
         payload.option_values = document.getElementById('fieldOptionValues').value.trim().split('\n');
@@ -5,9 +5,9 @@ window.onload = function() {
     // 首次加载项目列表
     fetchProjects();
     // 为筛选框添加事件监听，实现实时筛选
-    document.getElementById('filterName').addEventListener('input', fetchProjects);
-    document.getElementById('filterNumber').addEventListener('input', fetchProjects);
-    document.getElementById('filterMethod').addEventListener('change', fetchProjects);
+    document.getElementById('filterName').addEventListener('input', scheduleFetchProjects);
+    document.getElementById('filterNumber').addEventListener('input', scheduleFetchProjects);
+    document.getElementById('filterMethod').addEventListener('change', () => fetchProjects());
 };
 
 // 从后端 API 获取所有已发布的采购方式（模板）
@@ -25,34 +25,63 @@ function loadProcurementMethods() {
         .catch(error => console.error('加载采购方式失败:', error));
 }
 
-// 根据筛选条件从后端 API 获取项目列表并渲染到表格中
-function fetchProjects() {
+// 当前筛选条件下下一页的游标，以及已加载的项目数量（用于序号）
+let nextCursor = null;
+let loadedCount = 0;
+// 递增的请求序号：输入过程中只渲染最后一次筛选的结果
+let fetchSequence = 0;
+let filterTimer = null;
+
+function buildProjectsUrl(path, cursor) {
     const name = document.getElementById('filterName').value;
     const number = document.getElementById('filterNumber').value;
     const method = document.getElementById('filterMethod').value;
 
-    const url = new URL('/api/projects', window.location.origin);
+    const url = new URL(path, window.location.origin);
     if (name) url.searchParams.append('name', name);
     if (number) url.searchParams.append('number', number);
     if (method) url.searchParams.append('method', method);
+    if (cursor) url.searchParams.append('cursor', cursor);
+    return url;
+}
+
+// 输入关键词时稍作延迟再请求，避免每个按键都触发一次查询
+function scheduleFetchProjects() {
+    clearTimeout(filterTimer);
+    filterTimer = setTimeout(fetchProjects, 250);
+}
+
+// 根据筛选条件从后端 API 获取项目列表并渲染到表格中；append 为 true 时加载下一页
+function fetchProjects(append = false) {
+    append = append === true;
+    const sequence = ++fetchSequence;
+    if (!append) fetchProjectCount(sequence);
 
-    fetch(url)
+    fetch(buildProjectsUrl('/api/projects', append ? nextCursor : null))
         .then(response => response.json())
-        .then(projects => {
+        .then(page => {
+            if (sequence !== fetchSequence) return;
+            const projects = page.projects || [];
             const projectListBody = document.getElementById('project-list-body');
             const noProjectsMessage = document.getElementById('no-projects-message');
-            projectListBody.innerHTML = '';
+            if (!append) {
+                projectListBody.innerHTML = '';
+                loadedCount = 0;
+            }
+            nextCursor = page.next_cursor;
+            document.getElementById('load-more-button').classList.toggle('d-none', !nextCursor);
 
-            if (projects.length === 0) {
+            if (!append && projects.length === 0) {
                 noProjectsMessage.classList.remove('d-none');
             } else {
                 noProjectsMessage.classList.add('d-none');
-                projects.forEach((project, index) => {
+                const rows = projects.map(project => {
                     const projectName = project.name.replace(/'/g, "\\'").replace(/"/g, '\\"');
                     const badgeClass = project.procurement_method === '公开招标' ? 'bg-zhaobiao' : 'bg-xunbi';
-                    const projectRow = `
+                    loadedCount += 1;
+                    return `
                         <tr>
-                            <th scope="row" class="text-center-cell">${index + 1}</th>
+                            <th scope="row" class="text-center-cell">${loadedCount}</th>
                             <td class="project-name-cell">
                                 <div>${project.name}</div>
                                 <small class="text-muted">${project.number}</small>
@@ -64,13 +93,30 @@ function fetchProjects() {
                                 <button class="btn btn-outline-danger btn-sm ms-2" onclick="deleteProject(${project.id}, '${projectName}', event)">删除</button>
                             </td>
                         </tr>`;
-                    projectListBody.innerHTML += projectRow;
                 });
+                projectListBody.insertAdjacentHTML('beforeend', rows.join(''));
             }
         })
         .catch(error => console.error('获取项目列表失败:', error));
 }
 
+// 加载下一页
+function loadMoreProjects() {
+    if (nextCursor) fetchProjects(true);
+}
+
+// 获取满足筛选条件的项目数量（数量较大时为估计值）
+function fetchProjectCount(sequence) {
+    fetch(buildProjectsUrl('/api/projects/count'))
+        .then(response => response.json())
+        .then(data => {
+            if (sequence !== fetchSequence || data.count === undefined) return;
+            document.getElementById('project-count').textContent =
+                data.estimated ? `共 ${data.count} 个以上项目` : `共 ${data.count} 个项目`;
+        })
+        .catch(error => console.error('获取项目数量失败:', error));
+}
+
 // 重置所有筛选条件并重新加载项目列表
 function resetFilters() {
     document.getElementById('filterName').value = '';
@@ -1,6 +1,8 @@
 // app/static/js/modules/live_preview.js
 
 const projectId = document.body.dataset.projectId;
+// 整个项目预览的数据修订号；为 null 表示当前显示的不是整个项目的预览
+let projectPreviewRevision = null;
 
 /**
  * 【新】加载并显示单个章节的预览。
@@ -15,6 +17,7 @@ export function loadChapterPreview(sheetId) {
         return;
     }
 
+    projectPreviewRevision = null;
     previewContainer.innerHTML = '<p class="text-muted">正在加载预览...</p>';
     fetch(`/api/sheets/${sheetId}/preview`)
         .then(response => response.json())
@@ -39,6 +42,7 @@ export function loadInitialProjectPreview() {
         .then(data => {
             if (data.html) {
                 previewContainer.innerHTML = data.html;
+                projectPreviewRevision = data.revision;
             } else {
                 previewContainer.innerHTML = `<p class="text-danger">加载预览失败: ${data.error || '未知错误'}</p>`;
             }
@@ -48,6 +52,37 @@ export function loadInitialProjectPreview() {
         });
 }
 
+/**
+ * 增量刷新整个项目的预览：只获取自上次加载以来值发生变化的占位符并就地替换。
+ * 当前显示的不是整个项目的预览时不执行任何操作。
+ */
+export function refreshProjectPreview() {
+    const previewContainer = document.getElementById('preview-content');
+    if (!previewContainer || projectPreviewRevision === null) return;
+
+    fetch(`/api/projects/${projectId}/preview?since=${projectPreviewRevision}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.html !== undefined) {
+                previewContainer.innerHTML = data.html;
+            } else if (data.chapters) {
+                Object.entries(data.chapters).forEach(([chapterId, updates]) => {
+                    const chapterEl = previewContainer.querySelector(`[data-chapter-id="${chapterId}"]`);
+                    if (!chapterEl) return;
+                    Object.entries(updates).forEach(([fieldName, html]) => {
+                        chapterEl.querySelectorAll(`[data-placeholder-for="${fieldName}"]`).forEach(span => {
+                            span.innerHTML = html;
+                        });
+                    });
+                });
+            }
+            if (data.revision !== undefined) {
+                projectPreviewRevision = data.revision;
+            }
+        })
+        .catch(error => console.error('Preview refresh error:', error));
+}
+
 /**
  * 更新单个占位符的显示。
  * @param {string} fieldName - 字段的内部名称。
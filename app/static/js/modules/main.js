@@ -1,7 +1,7 @@
 // app/static/js/modules/main.js
 
 import { initializeSidebar } from './sidebar_handler.js';
-import { loadInitialProjectPreview, loadChapterPreview, initializeLivePreview, updatePreviewOnLoad } from './live_preview.js';
+import { loadInitialProjectPreview, loadChapterPreview, initializeLivePreview, updatePreviewOnLoad, refreshProjectPreview } from './live_preview.js';
 
 const projectId = document.body.dataset.projectId;
 const procurementMethod = document.body.dataset.procurementMethod;
@@ -11,8 +11,17 @@ let currentSheetName = '', currentSectionName = '';
 const FIELD_TYPES_REQUIRING_OPTIONS = ['select', 'select-multiple', 'radio', 'checkbox-group'];
 let periodicSaveTimer;
 let hasChanges = false;
+// 增量保存：当前表单的服务器修订号，以及最近一次成功保存时的数据快照
+let sheetRevision = 0;
+let savedSnapshot = null;
 const saveStatusEl = document.getElementById('save-status');
 let visibleRankCount = 5, editModal = null, logicEngine = null;
+// 当前动态表格的窗口化视图（固定表单时为 null）
+let dynamicView = null;
+// 待保存的表单：表单名称 -> { patch, onSaved(revision, created) }，合并为一次批量请求提交
+const pendingSaves = new Map();
+// 正在进行的批量保存请求（没有时为 null）
+let savingPromise = null;
 
 // ==============================================================================
 //  Main Initialization
@@ -33,6 +42,18 @@ window.onload = function() {
     // loadInitialProjectPreview();
 };
 
+// 关闭或离开页面时，把尚未保存的表单通过 keepalive 请求一次性提交
+window.addEventListener('pagehide', () => {
+    if (hasChanges) queueCurrentSheet();
+    if (!pendingSaves.size) return;
+    fetch(`/api/projects/${projectId}/sheets:batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(batchSavePayload()),
+        keepalive: true
+    });
+});
+
 // ... (The rest of the functions from project.js are below) ...
 
 function updateSaveStatus(text) {
@@ -46,11 +67,13 @@ function updateSaveStatus(text) {
 // 联动规则引擎 (Conditional Logic Engine)
 // ==============================================================================
 class ConditionalLogicEngine {
-    constructor(formId, rules, fields) {
+    constructor(formId, rules, fields, ruleGraph) {
         this.form = document.getElementById(formId);
         this.rules = rules;
         this.fields = fields.reduce((acc, f) => ({ ...acc, [f.name]: f }), {});
         this.originalOptions = {};
+        // 服务端编译的依赖图：字段变化时只重新求值受其影响的规则（按拓扑顺序）
+        this.ruleGraph = ruleGraph || null;
     }
 
     init() {
@@ -59,8 +82,8 @@ class ConditionalLogicEngine {
             if (this.originalOptions[fieldName] === undefined && el.tagName === 'SELECT') {
                  this.originalOptions[fieldName] = Array.from(el.options).map(opt => ({ value: opt.value, text: opt.text }));
             }
-            el.addEventListener('change', () => this.evaluateAllRules());
-            el.addEventListener('input', () => this.evaluateAllRules());
+            el.addEventListener('change', () => this.evaluateFieldRules(fieldName));
+            el.addEventListener('input', () => this.evaluateFieldRules(fieldName));
         });
 
         this._applyInitialDisabledState();
@@ -132,7 +155,19 @@ class ConditionalLogicEngine {
     }
 
     evaluateAllRules() {
-        this.rules.forEach(rule => this.applyRule(rule));
+        if (this.ruleGraph) {
+            this.ruleGraph.order.forEach(index => this.applyRule(this.rules[index]));
+        } else {
+            this.rules.forEach(rule => this.applyRule(rule));
+        }
+    }
+
+    evaluateFieldRules(fieldName) {
+        if (!this.ruleGraph) {
+            this.evaluateAllRules();
+            return;
+        }
+        (this.ruleGraph.dependents[fieldName] || []).forEach(index => this.applyRule(this.rules[index]));
     }
 
     applyRule(rule) {
@@ -239,6 +274,16 @@ function createSidebarNav(sections) {
 }
 
 function loadForm(sheetName, sectionName) {
+    // 切换表单时不单独保存，当前表单的修改加入待保存队列，由下一次定时保存与其他表单一并提交；
+    // 目标表单本身还有未提交的修改时先完成保存，再从服务器读取。
+    // 正在保存时等待其完成，使加入队列的修改基于最新的修订号
+    (savingPromise || Promise.resolve()).then(() => {
+        if (currentSheetName && hasChanges) queueCurrentSheet();
+        return pendingSaves.has(sheetName) ? flushPendingSaves(true) : null;
+    }).then(() => showSheet(sheetName, sectionName));
+}
+
+function showSheet(sheetName, sectionName) {
     clearInterval(periodicSaveTimer);
     hasChanges = false;
     visibleRankCount = 5;
@@ -263,18 +308,28 @@ function loadForm(sheetName, sectionName) {
     document.getElementById('save-button').classList.remove('d-none');
     updateSaveStatus('已加载');
 
-    fetch(`/api/projects/${projectId}/sheets/${sheetName}`).then(r => r.json()).then(data => {
+    savedSnapshot = null;
+    dynamicView = null;
+    if (config.type === 'dynamic_table') {
+        // 动态表格按页加载、只渲染可见行，见 DynamicTableView
+        dynamicView = new DynamicTableView(contentDiv, config, sheetName);
+        dynamicView.load().then(() => startAutoSave({}));
+        return;
+    }
+
+    fetch(`/api/projects/${projectId}/sheets/${sheetName}`).then(r => {
+        sheetRevision = Number(r.headers.get('X-Sheet-Revision') || 0);
+        return r.json();
+    }).then(data => {
         if (config.type === 'fixed_form') {
             renderFixedForm(contentDiv, config, data);
             // Logic restored from the main branch's project.js
             if (config.conditional_rules && config.conditional_rules.length > 0) {
                 setTimeout(() => {
-                    logicEngine = new ConditionalLogicEngine('sheet-content', config.conditional_rules, config.fields);
+                    logicEngine = new ConditionalLogicEngine('sheet-content', config.conditional_rules, config.fields, config.rule_graph);
                     logicEngine.init();
                 }, 100);
             }
-        } else if (config.type === 'dynamic_table') {
-            renderDynamicTable(contentDiv, config, data);
         }
 
         // 构建 value -> label 映射表
@@ -295,6 +350,7 @@ function loadForm(sheetName, sectionName) {
         updatePreviewOnLoad(data, config, valueToLabelMaps);
         // Initialize any custom select multiple dropdowns
         initializeCustomSelects();
+        savedSnapshot = collectSheetPayload(config);
     });
 }
 
@@ -378,119 +434,288 @@ function renderFixedForm(container, config, data) {
     });
 }
 
-function renderDynamicTable(container, config, data) {
-    const columns = config.columns || [];
-    // 确保“序号”列始终在第一位
-    const finalColumns = [
-        { name: 'sequence', label: '序号', field_type: 'number', validation_rules: [{rule_type: 'disabled', rule_value: 'True'}] },
-        ...columns.filter(c => c.name !== 'sequence')
-    ];
-
-    let tableHtml = `
-        <table class="table table-bordered table-hover">
-            <thead>
-                <tr>
-                    ${finalColumns.map(col => `<th>${col.label}</th>`).join('')}
-                    <th style="width: 10%;">操作</th>
-                </tr>
-            </thead>
-            <tbody>
-    `;
-
-    if (data.length > 0) {
-        data.forEach((rowData, index) => {
-            tableHtml += `<tr data-row-index="${index}">`;
-            finalColumns.forEach(col => {
-                const value = rowData[col.name] || (col.name === 'sequence' ? index + 1 : '');
-                const isDisabled = (col.validation_rules || []).some(r => r.rule_type === 'disabled' && r.rule_value === 'True');
-                const readonlyAttr = isDisabled ? 'readonly' : '';
-
-                let inputHtml = '';
-                switch(col.field_type) {
-                    case 'textarea':
-                        inputHtml = `<textarea class="form-control" name="${col.name}" ${readonlyAttr}>${value}</textarea>`;
-                        break;
-                    case 'number':
-                        inputHtml = `<input type="number" class="form-control" name="${col.name}" value="${value}" ${readonlyAttr}>`;
-                        break;
-                    case 'date':
-                        inputHtml = `<input type="date" class="form-control" name="${col.name}" value="${value}" ${readonlyAttr}>`;
-                        break;
-                    default: // text
-                        inputHtml = `<input type="text" class="form-control" name="${col.name}" value="${value}" ${readonlyAttr}>`;
+// ==============================================================================
+// 动态表格窗口化渲染 (Windowed Dynamic Table)
+// ==============================================================================
+const DYNAMIC_PAGE_SIZE = 200;
+// 可见区域上下额外渲染的行数，减少快速滚动时的空白
+const DYNAMIC_OVERSCAN = 10;
+const SEQUENCE_COLUMN = { name: 'sequence', label: '序号', field_type: 'number', validation_rules: [{rule_type: 'disabled', rule_value: 'True'}] };
+
+function escapeHtml(value) {
+    return String(value).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;');
+}
+
+/**
+ * 动态表格的窗口化视图。
+ * 行数据保存在内存模型中（按页从服务器加载），DOM 中只渲染可见区域附近的行，上下用占位行撑开滚动高度，
+ * 因此首屏时间和 DOM 规模与表格总行数无关。保存时只提交被修改、新增和删除的行。
+ *
+ * 模型中的每一行: { serverIndex, id, data, loaded, dirty, version, clientId }；
+ * serverIndex 为行在服务器上的位置（新行为 Infinity），用于把分页结果对应回本地行，
+ * 删除的行保存成功后，其后各行的 serverIndex 随之前移。
+ */
+class DynamicTableView {
+    constructor(container, config, sheetName) {
+        this.container = container;
+        this.sheetName = sheetName;
+        this.columns = [SEQUENCE_COLUMN, ...(config.columns || []).filter(c => c.name !== 'sequence')];
+        this.rows = [];
+        this.deletedIds = [];
+        // 已删除但尚未保存的行: 行ID -> 删除时的 serverIndex
+        this.deletedPositions = new Map();
+        this.loadingPages = new Set();
+        // serverIndex 每次整体前移时加一，使之前发出的分页请求作废
+        this.generation = 0;
+        this.nextDisplayOrder = 0;
+        this.nextClientId = 0;
+        this.rowHeight = 42;
+        this.range = null;
+        this.renderScheduled = false;
+    }
+
+    load() {
+        return fetch(`/api/projects/${projectId}/sheets/${this.sheetName}/count`)
+            .then(r => r.json())
+            .then(info => {
+                sheetRevision = info.revision;
+                this.nextDisplayOrder = info.max_display_order + 1;
+                this.rows = Array.from({ length: info.count }, (_, i) => ({ serverIndex: i, loaded: false }));
+                this._renderShell();
+                return this._fetchPage(0);
+            })
+            .then(() => this.render(true));
+    }
+
+    _renderShell() {
+        this.container.innerHTML = `
+            <div class="dynamic-table-viewport">
+                <table class="table table-bordered table-hover">
+                    <thead>
+                        <tr>
+                            ${this.columns.map(col => `<th>${col.label}</th>`).join('')}
+                            <th style="width: 10%;">操作</th>
+                        </tr>
+                    </thead>
+                    <tbody></tbody>
+                </table>
+            </div>
+            <button type="button" class="btn btn-success mt-2" onclick="addTableRow()">+ 新增一行</button>
+        `;
+        this.viewport = this.container.querySelector('.dynamic-table-viewport');
+        this.tbody = this.container.querySelector('tbody');
+        this.viewport.addEventListener('scroll', () => this.scheduleRender());
+        this.tbody.addEventListener('input', event => this._onInput(event));
+    }
+
+    _fetchPage(page) {
+        if (this.loadingPages.has(page)) return Promise.resolve();
+        this.loadingPages.add(page);
+        const offset = page * DYNAMIC_PAGE_SIZE;
+        const generation = this.generation;
+        return fetch(`/api/projects/${projectId}/sheets/${this.sheetName}?limit=${DYNAMIC_PAGE_SIZE}&offset=${offset}`)
+            .then(r => r.json())
+            .then(result => {
+                if (generation !== this.generation) {
+                    // 请求期间服务器上的行位置已变化，结果无法对应，重新渲染时按新位置再次加载
+                    this.scheduleRender();
+                    return;
                 }
-                tableHtml += `<td>${inputHtml}</td>`;
+                (result.rows || []).forEach((rowData, i) => {
+                    const row = this._findByServerIndex(offset + i);
+                    if (row && !row.loaded) {
+                        const { _row_id, sequence, ...data } = rowData;
+                        Object.assign(row, { id: _row_id, data: data, loaded: true, dirty: false, version: 0 });
+                    }
+                });
+                this.scheduleRender();
+            })
+            .finally(() => {
+                if (generation === this.generation) this.loadingPages.delete(page);
             });
-            tableHtml += `<td><button type="button" class="btn btn-danger btn-sm" onclick="removeTableRow(this)">删除</button></td>`;
-            tableHtml += `</tr>`;
+    }
+
+    // 服务器上的行在模型中保持原有顺序（本地只会删除已加载的行、在末尾追加新行），可二分查找
+    _findByServerIndex(serverIndex) {
+        let low = 0, high = this.rows.length - 1;
+        while (low <= high) {
+            const mid = (low + high) >> 1;
+            const value = this.rows[mid].serverIndex;
+            if (value === serverIndex) return this.rows[mid];
+            if (value < serverIndex) low = mid + 1; else high = mid - 1;
+        }
+        return null;
+    }
+
+    scheduleRender() {
+        if (this.renderScheduled) return;
+        this.renderScheduled = true;
+        requestAnimationFrame(() => {
+            this.renderScheduled = false;
+            this.render();
         });
     }
 
-    tableHtml += `
-            </tbody>
-        </table>
-        <button type="button" class="btn btn-success mt-2" onclick="addTableRow()">+ 新增一行</button>
-    `;
+    render(force = false) {
+        if (!this.tbody || !this.tbody.isConnected) return;
+        const scrollTop = this.viewport.scrollTop;
+        const height = this.viewport.clientHeight || 600;
+        const start = Math.max(0, Math.floor(scrollTop / this.rowHeight) - DYNAMIC_OVERSCAN);
+        const end = Math.min(this.rows.length, Math.ceil((scrollTop + height) / this.rowHeight) + DYNAMIC_OVERSCAN);
 
-    container.innerHTML = tableHtml;
-}
+        const pending = this.rows.slice(start, end).filter(row => !row.loaded);
+        new Set(pending.map(row => Math.floor(row.serverIndex / DYNAMIC_PAGE_SIZE))).forEach(page => this._fetchPage(page));
 
-// 新增：用于动态表格交互的辅助函数
-window.addTableRow = function() {
-    const table = document.querySelector('#sheet-content table');
-    const tbody = table.querySelector('tbody');
-    const newIndex = tbody.rows.length;
-    const newRow = tbody.insertRow();
-    newRow.dataset.rowIndex = newIndex;
-
-    const columns = masterConfig.sections[currentSectionName].forms[currentSheetName].columns || [];
-    const finalColumns = [
-        { name: 'sequence', label: '序号', field_type: 'number', validation_rules: [{rule_type: 'disabled', rule_value: 'True'}] },
-        ...columns.filter(c => c.name !== 'sequence')
-    ];
-
-    finalColumns.forEach(col => {
-        const cell = newRow.insertCell();
-        const value = (col.name === 'sequence') ? newIndex + 1 : '';
-        const isDisabled = (col.validation_rules || []).some(r => r.rule_type === 'disabled' && r.rule_value === 'True');
-        const readonlyAttr = isDisabled ? 'readonly' : '';
-
-        let inputHtml = '';
-        switch(col.field_type) {
-            case 'textarea':
-                inputHtml = `<textarea class="form-control" name="${col.name}" ${readonlyAttr}>${value}</textarea>`;
-                break;
-            case 'number':
-                inputHtml = `<input type="number" class="form-control" name="${col.name}" value="${value}" ${readonlyAttr}>`;
-                break;
-            case 'date':
-                inputHtml = `<input type="date" class="form-control" name="${col.name}" value="${value}" ${readonlyAttr}>`;
-                break;
-            default: // text
-                inputHtml = `<input type="text" class="form-control" name="${col.name}" value="${value}" ${readonlyAttr}>`;
+        const key = `${start}:${end}:${pending.length}:${this.rows.length}`;
+        if (!force && this.range === key) return;
+        this.range = key;
+
+        // 重新渲染时保留正在编辑的输入框的焦点
+        const active = this.tbody.contains(document.activeElement) ? document.activeElement : null;
+        const focus = active ? { index: active.closest('tr').dataset.rowIndex, name: active.name } : null;
+
+        const colspan = this.columns.length + 1;
+        let html = `<tr class="row-spacer"><td colspan="${colspan}" style="height: ${start * this.rowHeight}px"></td></tr>`;
+        for (let index = start; index < end; index++) {
+            html += this._rowHtml(this.rows[index], index);
         }
-        cell.innerHTML = inputHtml;
-    });
+        html += `<tr class="row-spacer"><td colspan="${colspan}" style="height: ${(this.rows.length - end) * this.rowHeight}px"></td></tr>`;
+        this.tbody.innerHTML = html;
+
+        const sample = this.tbody.querySelector('tr[data-row-index]');
+        if (sample && sample.offsetHeight && Math.abs(sample.offsetHeight - this.rowHeight) > 1) {
+            this.rowHeight = sample.offsetHeight;
+            this.scheduleRender();
+        }
+        if (focus) {
+            const el = this.tbody.querySelector(`tr[data-row-index="${focus.index}"] [name="${focus.name}"]`);
+            if (el) el.focus();
+        }
+    }
+
+    _rowHtml(row, index) {
+        if (!row.loaded) {
+            return `<tr data-row-index="${index}" class="text-muted"><td>${index + 1}</td><td colspan="${this.columns.length}">加载中...</td></tr>`;
+        }
+        const cells = this.columns.map(col => {
+            const raw = col.name === 'sequence' ? index + 1 : (row.data[col.name] ?? '');
+            const value = escapeHtml(raw);
+            const isDisabled = (col.validation_rules || []).some(r => r.rule_type === 'disabled' && r.rule_value === 'True');
+            const readonlyAttr = isDisabled ? 'readonly' : '';
+            switch (col.field_type) {
+                case 'textarea':
+                    return `<td><textarea class="form-control" name="${col.name}" ${readonlyAttr}>${value}</textarea></td>`;
+                case 'number':
+                    return `<td><input type="number" class="form-control" name="${col.name}" value="${value}" ${readonlyAttr}></td>`;
+                case 'date':
+                    return `<td><input type="date" class="form-control" name="${col.name}" value="${value}" ${readonlyAttr}></td>`;
+                default: // text
+                    return `<td><input type="text" class="form-control" name="${col.name}" value="${value}" ${readonlyAttr}></td>`;
+            }
+        }).join('');
+        return `<tr data-row-index="${index}" data-row-id="${row.id || ''}">${cells}` +
+            `<td><button type="button" class="btn btn-danger btn-sm" onclick="removeTableRow(this)">删除</button></td></tr>`;
+    }
 
-    const actionCell = newRow.insertCell();
-    actionCell.innerHTML = `<button type="button" class="btn btn-danger btn-sm" onclick="removeTableRow(this)">删除</button>`;
+    _onInput(event) {
+        const tr = event.target.closest('tr[data-row-index]');
+        const row = tr ? this.rows[Number(tr.dataset.rowIndex)] : null;
+        if (!row || !row.loaded || event.target.name === 'sequence') return;
+        row.data[event.target.name] = event.target.value;
+        row.dirty = true;
+        row.version += 1;
+    }
+
+    addRow() {
+        this.rows.push({
+            serverIndex: Infinity, id: null, data: {}, loaded: true, dirty: true, version: 0,
+            clientId: `new-${this.nextClientId++}`, displayOrder: this.nextDisplayOrder++
+        });
+        this.render(true);
+        this.viewport.scrollTop = this.viewport.scrollHeight;
+    }
+
+    removeRow(index) {
+        const [row] = this.rows.splice(index, 1);
+        if (row && row.id) {
+            this.deletedIds.push(row.id);
+            this.deletedPositions.set(row.id, row.serverIndex);
+        }
+        this.render(true);
+    }
+
+    /**
+     * 服务器删除了位于 removed（升序）的行后，其后各行在服务器上的位置前移。
+     * 尚未保存的删除对应的行仍在服务器上，不计入。模型按 serverIndex 有序，一次遍历即可。
+     */
+    _shiftServerIndexes(removed) {
+        let shift = 0;
+        this.rows.forEach(row => {
+            while (shift < removed.length && removed[shift] < row.serverIndex) shift++;
+            row.serverIndex -= shift;
+        });
+        this.generation += 1;
+        this.loadingPages.clear();
+    }
+
+    /**
+     * 生成只包含变化部分的 PATCH 请求体（没有变化时返回 null），并记录本次提交的行及其版本，
+     * 保存成功后只清除提交之后未再修改的行的脏标记。
+     */
+    buildPatch(baseRevision) {
+        const submitted = [];
+        const upserts = [];
+        this.rows.forEach(row => {
+            if (!row.loaded || !row.dirty) return;
+            if (!row.id) {
+                // 与原有行为一致：全部为空的新行不保存
+                if (!Object.values(row.data).some(value => value !== '')) return;
+                upserts.push({ client_id: row.clientId, data: row.data, display_order: row.displayOrder });
+            } else {
+                upserts.push({ id: row.id, data: row.data });
+            }
+            submitted.push({ row: row, version: row.version });
+        });
+        const deletes = this.deletedIds.slice();
+        if (!upserts.length && !deletes.length) return null;
+        this.pendingSave = { submitted: submitted, deletes: deletes };
+        return { base_revision: baseRevision, upserts: upserts, deletes: deletes };
+    }
 
+    // 校验错误中的行号为最近一次提交的 upserts 中的位置，换算为表格中的序号（找不到时为 null）
+    rowNumber(upsertIndex) {
+        const entry = this.pendingSave && this.pendingSave.submitted[upsertIndex];
+        const index = entry ? this.rows.indexOf(entry.row) : -1;
+        return index >= 0 ? index + 1 : null;
+    }
+
+    markSaved(created) {
+        if (!this.pendingSave) return;
+        const { submitted, deletes } = this.pendingSave;
+        submitted.forEach(({ row, version }) => {
+            if (!row.id && created && created[row.clientId]) row.id = created[row.clientId];
+            if (row.version === version) row.dirty = false;
+        });
+        this.deletedIds = this.deletedIds.filter(id => !deletes.includes(id));
+        const removed = deletes.map(id => this.deletedPositions.get(id)).filter(Number.isFinite).sort((a, b) => a - b);
+        deletes.forEach(id => this.deletedPositions.delete(id));
+        if (removed.length) this._shiftServerIndexes(removed);
+        this.pendingSave = null;
+        this.render(true);
+    }
+}
+
+// 用于动态表格交互的辅助函数
+window.addTableRow = function() {
+    if (!dynamicView) return;
+    dynamicView.addRow();
     // 标记表单已更改
     triggerChange();
 }
 
 window.removeTableRow = function(button) {
-    const row = button.closest('tr');
-    row.remove();
-    // 重新计算所有行的序号
-    const tbody = document.querySelector('#sheet-content tbody');
-    Array.from(tbody.rows).forEach((r, index) => {
-        r.dataset.rowIndex = index;
-        const seqInput = r.querySelector('input[name="sequence"]');
-        if (seqInput) {
-            seqInput.value = index + 1;
-        }
-    });
+    if (!dynamicView) return;
+    dynamicView.removeRow(Number(button.closest('tr').dataset.rowIndex));
     // 标记表单已更改
     triggerChange();
 }
@@ -585,7 +810,7 @@ function startAutoSave(valueToLabelMaps) {
     document.getElementById('sheet-content').addEventListener('input', triggerChange);
     initializeLivePreview(valueToLabelMaps); // Call this here to attach listeners to the newly rendered form
     periodicSaveTimer = setInterval(() => {
-        if (hasChanges) {
+        if ((hasChanges || pendingSaves.size) && !savingPromise) {
             saveData(true);
         }
     }, 30000);
@@ -600,10 +825,10 @@ function manualSave() {
     saveData(false);
 }
 
-function saveData(isAuto) {
-    if (!currentSheetName) return;
-
-    const config = masterConfig.sections[currentSectionName].forms[currentSheetName];
+/**
+ * 从页面中收集当前固定表单的完整数据 {字段名: 值}。动态表格的数据由 DynamicTableView 维护。
+ */
+function collectSheetPayload(config) {
     const formElement = document.getElementById('sheet-content');
     let payload;
 
@@ -631,48 +856,212 @@ function saveData(isAuto) {
                 }
             }
         });
-    } else if (config.type === 'dynamic_table') {
-        payload = [];
-        const rows = formElement.querySelectorAll('tbody tr');
-        rows.forEach(row => {
-            const rowData = {};
-            const inputs = row.querySelectorAll('input, textarea, select');
-            inputs.forEach(input => {
-                rowData[input.name] = input.value;
-            });
-            // 只添加非空行
-            if (Object.values(rowData).some(val => val !== '')) {
-                payload.push(rowData);
-            }
-        });
     }
+    return payload;
+}
+
+/**
+ * 对比当前固定表单数据与最近一次保存的快照，生成只包含变化字段的 PATCH 请求体。
+ * 没有任何变化时返回 null。
+ */
+function buildSheetPatch(current, snapshot) {
+    const fields = {};
+    Object.keys(current).forEach(name => {
+        if (!snapshot || current[name] !== snapshot[name]) {
+            fields[name] = current[name];
+        }
+    });
+    return Object.keys(fields).length ? { base_revision: sheetRevision, fields: fields } : null;
+}
+
+function markSaved() {
+    hasChanges = false;
+    const now = new Date();
+    updateSaveStatus(`已于 ${now.getHours()}:${String(now.getMinutes()).padStart(2, '0')} 保存`);
+}
+
+/**
+ * 把当前表单相对上次保存的变化加入待保存队列（没有变化时不加入）。
+ * 保存成功后，如果该表单仍是当前表单，更新其修订号和保存快照。
+ */
+function queueCurrentSheet() {
+    if (!currentSheetName) return;
+    const sheetName = currentSheetName;
+    const config = masterConfig.sections[currentSectionName].forms[sheetName];
+    const view = dynamicView;
+    if (config.type === 'dynamic_table' && !view) return;
+    const current = view ? null : collectSheetPayload(config);
+    const patch = view ? view.buildPatch(sheetRevision) : buildSheetPatch(current, savedSnapshot);
+    if (!patch) return;
+
+    pendingSaves.set(sheetName, {
+        patch: patch,
+        rowNumber: view ? index => view.rowNumber(index) : null,
+        onSaved: (revision, created) => {
+            if (currentSheetName !== sheetName || dynamicView !== view) return;
+            sheetRevision = revision;
+            if (view) {
+                // 为新行写入服务器分配的稳定行ID，并清除已保存行的修改标记
+                view.markSaved(created);
+            } else {
+                savedSnapshot = current;
+            }
+        }
+    });
+}
+
+// 批量保存的请求体: 表单名称 -> PATCH 请求体
+function batchSavePayload(entries = pendingSaves) {
+    const payload = {};
+    entries.forEach((entry, sheetName) => { payload[sheetName] = entry.patch; });
+    return payload;
+}
 
-    if (isAuto) {
-        updateSaveStatus('自动保存中...');
-    } else {
-        updateSaveStatus('正在保存...');
+// 保存失败时把提交的表单放回队列（期间重新加入的同名表单以较新的为准），skipSheet 除外
+function requeueSaves(entries, skipSheet) {
+    entries.forEach((entry, sheetName) => {
+        if (sheetName !== skipSheet && !pendingSaves.has(sheetName)) pendingSaves.set(sheetName, entry);
+    });
+}
+
+/**
+ * 将批量保存返回的校验错误 {表单名称: 错误明细} 整理为提示文字。
+ * 固定表单的明细为 {字段名: 错误信息}；动态表格为 [{row, errors}]，row 为提交的修改行中的位置。
+ */
+function describeSaveErrors(errors, entries) {
+    return Object.keys(errors).map(sheetName => {
+        const detail = errors[sheetName];
+        const entry = entries.get(sheetName);
+        if (Array.isArray(detail)) {
+            return detail.map(item => {
+                const number = entry && entry.rowNumber ? entry.rowNumber(item.row) : null;
+                const where = number ? `第 ${number} 行` : `第 ${item.row + 1} 条修改的行`;
+                return `${sheetName} ${where}: ${Object.values(item.errors).join('；')}`;
+            }).join('；');
+        }
+        return `${sheetName}: ${Object.values(detail).join('；')}`;
+    }).join('；');
+}
+
+/**
+ * 将待保存队列中的全部表单通过一次批量请求保存（服务器在同一个事务中写入）。
+ * 已有保存请求进行中时排在其后执行。
+ */
+function flushPendingSaves(isAuto) {
+    if (savingPromise) {
+        return savingPromise.then(() => flushPendingSaves(isAuto));
+    }
+    if (!pendingSaves.size) {
+        markSaved();
+        return Promise.resolve();
     }
 
-    fetch(`/api/projects/${projectId}/sheets/${currentSheetName}`, {
+    const entries = new Map(pendingSaves);
+    pendingSaves.clear();
+    updateSaveStatus(isAuto ? '自动保存中...' : '正在保存...');
+
+    savingPromise = fetch(`/api/projects/${projectId}/sheets:batch`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(payload)
+        body: JSON.stringify(batchSavePayload(entries))
     })
-    .then(response => response.json())
-    .then(data => {
-        if (data.message) {
-            hasChanges = false;
-            const now = new Date();
-            updateSaveStatus(`已于 ${now.getHours()}:${String(now.getMinutes()).padStart(2, '0')} 保存`);
+    .then(response => response.json().then(data => ({ status: response.status, data: data })))
+    .then(({ status, data }) => {
+        if (status >= 200 && status < 300 && data.revisions) {
+            entries.forEach((entry, sheetName) => {
+                entry.onSaved(data.revisions[sheetName], (data.created || {})[sheetName]);
+            });
+            markSaved();
+            refreshProjectPreview();
+            return;
+        }
+        // 服务器整体回滚，没有写入任何表单：放回队列下次重试；只有指明的表单本身有问题
+        // （修订号冲突、配置不存在等重试也无法成功的错误）时丢弃该表单，其余表单照常重试
+        const rejected = data.errors ? null : data.sheet;
+        requeueSaves(entries, rejected);
+        if (status === 409) {
+            updateSaveStatus(`保存冲突: 表单 '${data.sheet}' 已在其他页面被修改，请刷新后重试`);
+        } else if (data.errors) {
+            updateSaveStatus(`保存失败: ${describeSaveErrors(data.errors, entries)}`);
         } else {
             updateSaveStatus(`保存失败: ${data.error || '未知错误'}`);
         }
     })
     .catch(error => {
         console.error('Save error:', error);
+        // 网络错误时放回队列，下一次保存时重试
+        requeueSaves(entries, null);
         updateSaveStatus('保存出错，请检查网络');
+    })
+    .finally(() => {
+        savingPromise = null;
     });
+    return savingPromise;
+}
+
+function saveData(isAuto) {
+    if (savingPromise) {
+        return savingPromise.then(() => saveData(isAuto));
+    }
+    queueCurrentSheet();
+    return flushPendingSaves(isAuto);
 }
 
 // Expose manualSave for the button's onclick attribute
 window.manualSave = manualSave;
+
+
+// 提交后台导出任务，轮询任务状态，完成后下载结果文件
+function runExportJob(payload, button) {
+    const originalText = button.textContent;
+    button.disabled = true;
+    button.textContent = '正在生成...';
+    const restore = () => {
+        button.disabled = false;
+        button.textContent = originalText;
+    };
+
+    const poll = (job) => {
+        if (job.status === 'done') {
+            restore();
+            window.location.href = job.download_url;
+        } else if (job.status === 'failed') {
+            restore();
+            alert(`导出失败: ${job.error || '未知错误'}`);
+        } else {
+            setTimeout(() => {
+                fetch(`/api/jobs/${job.id}`).then(r => r.json()).then(poll).catch(error => {
+                    console.error('Export job error:', error);
+                    restore();
+                });
+            }, 1000);
+        }
+    };
+
+    fetch('/api/jobs', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(Object.assign({ project_id: projectId }, payload))
+    })
+    .then(r => r.json().then(data => ({ ok: r.ok, data })))
+    .then(({ ok, data }) => {
+        if (!ok) throw new Error(data.error || '未知错误');
+        poll(data);
+    })
+    .catch(error => {
+        console.error('Export job error:', error);
+        restore();
+        alert(`导出失败: ${error.message}`);
+    });
+}
+
+// 导出当前分区的Excel文件（由后台任务生成）
+window.exportProject = function() {
+    if (!currentSectionName) return;
+    runExportJob({ type: 'excel', section: currentSectionName }, document.getElementById('export-button'));
+}
+
+// 导出整个项目的Word文档（按分区、章节顺序拼接，由后台任务生成）
+window.exportWord = function() {
+    runExportJob({ type: 'word' }, document.getElementById('export-word-button'));
+}
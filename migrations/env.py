@@ -45,6 +45,15 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+# 不属于模型定义的数据库对象（全文检索虚拟表及其影子表、trigram 索引、
+# 应用按字段配置维护的动态表格列索引），自动生成迁移时忽略
+UNMANAGED_PREFIXES = ('project_search', 'ix_project_name_trgm', 'ix_project_number_trgm', 'ix_dtr_field_')
+
+
+def include_name(name, type_, parent_names):
+    return not (name and name.startswith(UNMANAGED_PREFIXES))
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -93,18 +102,31 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_name", include_name)
 
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # SQLite 的 batch 迁移通过重建表来修改结构，重建时删除旧表会触发外键的级联删除，
+        # 因此迁移期间关闭外键检查（该 PRAGMA 只能在事务之外设置）
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
             **conf_args
         )
 
-        with context.begin_transaction():
-            context.run_migrations()
+        try:
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if sqlite:
+                connection.commit()
+                # 连接归还连接池后仍供应用使用，恢复 configure_sqlite 的设置
+                if current_app.config['SQLITE_FOREIGN_KEYS']:
+                    connection.exec_driver_sql('PRAGMA foreign_keys=ON')
 
 
 if context.is_offline_mode():
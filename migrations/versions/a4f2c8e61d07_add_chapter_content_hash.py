@@ -0,0 +1,86 @@
+"""Store chapter documents by content hash
+
+Revision ID: a4f2c8e61d07
+Revises: 7d1b3e9a5c28
+Create Date: 2026-10-17 20:14:09.533187
+
+"""
+import hashlib
+import os
+import shutil
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f2c8e61d07'
+down_revision = '7d1b3e9a5c28'
+branch_labels = None
+depends_on = None
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+chapter_table = sa.table(
+    'word_template_chapter',
+    sa.column('id', sa.Integer),
+    sa.column('filepath', sa.String),
+    sa.column('content_hash', sa.String),
+)
+
+
+def _blob_path(content_hash):
+    # 与 services/blob_store.py 的存储布局一致: <BLOB_STORE_FOLDER>/<哈希前两位>/<SHA-256>
+    return os.path.join(current_app.config['BLOB_STORE_FOLDER'], content_hash[:2], content_hash)
+
+
+def _store_file(path):
+    """将已有的章节文件复制到内容寻址存储中，返回内容哈希"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    content_hash = digest.hexdigest()
+    target = _blob_path(content_hash)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, target)
+    return content_hash
+
+
+def upgrade():
+    with op.batch_alter_table('word_template_chapter', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_word_template_chapter_content_hash'), ['content_hash'], unique=False)
+
+    # 原有文件复制到存储中，原文件保留（确认迁移无误后可手动删除 uploads 下的旧目录）；
+    # 文件已丢失的章节 content_hash 为空，导出时报告缺失
+    bind = op.get_bind()
+    for chapter_id, path in bind.execute(sa.select(chapter_table.c.id, chapter_table.c.filepath)).all():
+        if path and os.path.exists(path):
+            bind.execute(chapter_table.update().where(chapter_table.c.id == chapter_id)
+                         .values(content_hash=_store_file(path)))
+
+    with op.batch_alter_table('word_template_chapter', schema=None) as batch_op:
+        batch_op.drop_column('filepath')
+
+
+def downgrade():
+    with op.batch_alter_table('word_template_chapter', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('filepath', sa.String(length=512), nullable=False, server_default=''))
+
+    # 章节指向存储中的文件；多个章节可能共用同一个文件
+    bind = op.get_bind()
+    for chapter_id, content_hash in bind.execute(
+            sa.select(chapter_table.c.id, chapter_table.c.content_hash)
+            .where(chapter_table.c.content_hash.isnot(None))).all():
+        bind.execute(chapter_table.update().where(chapter_table.c.id == chapter_id)
+                     .values(filepath=_blob_path(content_hash)))
+
+    with op.batch_alter_table('word_template_chapter', schema=None) as batch_op:
+        batch_op.alter_column('filepath', server_default=None)
+        batch_op.drop_index(batch_op.f('ix_word_template_chapter_content_hash'))
+        batch_op.drop_column('content_hash')
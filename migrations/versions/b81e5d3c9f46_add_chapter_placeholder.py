@@ -0,0 +1,80 @@
+"""Add chapter placeholder index
+
+Revision ID: b81e5d3c9f46
+Revises: a4f2c8e61d07
+Create Date: 2026-10-17 21:03:52.118406
+
+"""
+import os
+import re
+import zipfile
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+from lxml import etree
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81e5d3c9f46'
+down_revision = 'a4f2c8e61d07'
+branch_labels = None
+depends_on = None
+
+# 与 services/chapter_placeholders.py 的提取方式一致（迁移不依赖应用代码）
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([\w\d_]+)\s*\}\}")
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+MAX_FIELD_NAME_LENGTH = 100
+
+chapter_table = sa.table(
+    'word_template_chapter',
+    sa.column('id', sa.Integer),
+    sa.column('content_hash', sa.String),
+)
+
+
+def _extract(path):
+    parser = etree.XMLParser(resolve_entities=False, no_network=True)
+    with zipfile.ZipFile(path) as archive:
+        root = etree.fromstring(archive.read('word/document.xml'), parser)
+    names = set()
+    for paragraph in root.iter(f'{{{W_NS}}}p'):
+        names.update(PLACEHOLDER_PATTERN.findall(''.join(t.text or '' for t in paragraph.iter(f'{{{W_NS}}}t'))))
+    return sorted(name for name in names if len(name) <= MAX_FIELD_NAME_LENGTH)
+
+
+def upgrade():
+    placeholder_table = op.create_table('chapter_placeholder',
+    sa.Column('chapter_id', sa.Integer(), nullable=False),
+    sa.Column('field_name', sa.String(length=100), nullable=False),
+    sa.ForeignKeyConstraint(['chapter_id'], ['word_template_chapter.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('chapter_id', 'field_name')
+    )
+    with op.batch_alter_table('chapter_placeholder', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chapter_placeholder_field_name'), ['field_name'], unique=False)
+
+    # 为已有章节建立索引，每个文件内容只解析一次；无法解析的文件视为没有占位符
+    bind = op.get_bind()
+    chapters_by_hash = {}
+    for chapter_id, content_hash in bind.execute(
+            sa.select(chapter_table.c.id, chapter_table.c.content_hash)
+            .where(chapter_table.c.content_hash.isnot(None))).all():
+        chapters_by_hash.setdefault(content_hash, []).append(chapter_id)
+
+    rows = []
+    for content_hash, chapter_ids in chapters_by_hash.items():
+        path = os.path.join(current_app.config['BLOB_STORE_FOLDER'], content_hash[:2], content_hash)
+        try:
+            names = _extract(path)
+        except Exception:
+            continue
+        rows.extend({"chapter_id": chapter_id, "field_name": name} for chapter_id in chapter_ids for name in names)
+    if rows:
+        op.bulk_insert(placeholder_table, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('chapter_placeholder', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chapter_placeholder_field_name'))
+
+    op.drop_table('chapter_placeholder')
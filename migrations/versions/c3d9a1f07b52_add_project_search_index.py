@@ -0,0 +1,76 @@
+"""Add project list indexes and name/number search index
+
+Revision ID: c3d9a1f07b52
+Revises: 9beddf9489a0
+Create Date: 2026-10-17 15:02:37.415208
+
+"""
+import sqlite3
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d9a1f07b52'
+down_revision = '9beddf9489a0'
+branch_labels = None
+depends_on = None
+
+
+# SQLite: 名称/编号的 FTS5 trigram 全文索引（外部内容表，rowid 即 project.id），由触发器与 project 表保持同步。
+# 注意：以 batch 模式重建 project 表的迁移会丢失这些触发器，需要重新创建。
+SQLITE_UPGRADE = (
+    "CREATE VIRTUAL TABLE project_search USING fts5("
+    "name, number, content='project', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER project_search_ai AFTER INSERT ON project BEGIN "
+    "INSERT INTO project_search(rowid, name, number) VALUES (new.id, new.name, new.number); END",
+    "CREATE TRIGGER project_search_ad AFTER DELETE ON project BEGIN "
+    "INSERT INTO project_search(project_search, rowid, name, number) "
+    "VALUES ('delete', old.id, old.name, old.number); END",
+    "CREATE TRIGGER project_search_au AFTER UPDATE OF name, number ON project BEGIN "
+    "INSERT INTO project_search(project_search, rowid, name, number) "
+    "VALUES ('delete', old.id, old.name, old.number); "
+    "INSERT INTO project_search(rowid, name, number) VALUES (new.id, new.name, new.number); END",
+    "INSERT INTO project_search(project_search) VALUES ('rebuild')",
+)
+
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS project_search_au",
+    "DROP TRIGGER IF EXISTS project_search_ad",
+    "DROP TRIGGER IF EXISTS project_search_ai",
+    "DROP TABLE IF EXISTS project_search",
+)
+
+
+def upgrade():
+    with op.batch_alter_table('project', schema=None) as batch_op:
+        batch_op.create_index('ix_project_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_project_method_created_at_id', ['procurement_method', 'created_at', 'id'],
+                              unique=False)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # trigram 分词器需要 SQLite 3.34+；更早的版本不建索引，检索退回 LIKE
+        if sqlite3.sqlite_version_info >= (3, 34, 0):
+            for statement in SQLITE_UPGRADE:
+                op.execute(statement)
+    elif dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index('ix_project_name_trgm', 'project', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_project_number_trgm', 'project', ['number'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'number': 'gin_trgm_ops'})
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        op.drop_index('ix_project_number_trgm', table_name='project')
+        op.drop_index('ix_project_name_trgm', table_name='project')
+
+    with op.batch_alter_table('project', schema=None) as batch_op:
+        batch_op.drop_index('ix_project_method_created_at_id')
+        batch_op.drop_index('ix_project_created_at_id')
@@ -0,0 +1,38 @@
+"""Add unique index on active jobs
+
+Revision ID: e6a1c7d4b235
+Revises: b81e5d3c9f46
+Create Date: 2026-10-17 23:14:27.530914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a1c7d4b235'
+down_revision = 'b81e5d3c9f46'
+branch_labels = None
+depends_on = None
+
+ACTIVE_WHERE = "status IN ('queued', 'running')"
+
+
+def upgrade():
+    # 之前并发提交可能留下重复的在途任务：每组只保留最新的一个，其余标记为失败
+    op.execute(f"""
+        UPDATE job SET status = 'failed', error = '重复提交的任务', finished_at = CURRENT_TIMESTAMP
+        WHERE {ACTIVE_WHERE} AND id NOT IN (
+            SELECT max(id) FROM job WHERE {ACTIVE_WHERE}
+            GROUP BY job_type, project_id, coalesce(section_name, ''), data_revision
+        )
+    """)
+    op.create_index('uq_job_active', 'job',
+                    ['job_type', 'project_id', sa.text("coalesce(section_name, '')"), 'data_revision'],
+                    unique=True,
+                    sqlite_where=sa.text(ACTIVE_WHERE),
+                    postgresql_where=sa.text(ACTIVE_WHERE))
+
+
+def downgrade():
+    op.drop_index('uq_job_active', table_name='job')
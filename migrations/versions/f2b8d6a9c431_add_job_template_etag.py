@@ -0,0 +1,45 @@
+"""Add template etag to job dedupe key
+
+Revision ID: f2b8d6a9c431
+Revises: e6a1c7d4b235
+Create Date: 2026-10-18 09:42:16.207583
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d6a9c431'
+down_revision = 'e6a1c7d4b235'
+branch_labels = None
+depends_on = None
+
+ACTIVE_WHERE = "status IN ('queued', 'running')"
+
+
+def upgrade():
+    # 先删除表达式索引：SQLite 的 batch 操作重建表时无法反射并保留它
+    op.drop_index('uq_job_active', table_name='job')
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('template_etag', sa.String(length=40), nullable=True))
+
+    # 已有任务的 template_etag 为空，与新提交的任务不会匹配，其结果文件到期后照常清理
+    op.create_index('uq_job_active', 'job',
+                    ['job_type', 'project_id', sa.text("coalesce(section_name, '')"), 'data_revision',
+                     sa.text("coalesce(template_etag, '')")],
+                    unique=True,
+                    sqlite_where=sa.text(ACTIVE_WHERE),
+                    postgresql_where=sa.text(ACTIVE_WHERE))
+
+
+def downgrade():
+    op.drop_index('uq_job_active', table_name='job')
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_column('template_etag')
+
+    op.create_index('uq_job_active', 'job',
+                    ['job_type', 'project_id', sa.text("coalesce(section_name, '')"), 'data_revision'],
+                    unique=True,
+                    sqlite_where=sa.text(ACTIVE_WHERE),
+                    postgresql_where=sa.text(ACTIVE_WHERE))
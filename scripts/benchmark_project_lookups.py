@@ -0,0 +1,96 @@
+"""
+基准测试：表单数据加载查询的耗时随系统中项目总数的变化。
+
+为不同数量的项目生成固定表单和动态表格数据，测量加载单个项目一个表单的平均耗时，
+并输出 SQLite 的查询计划。有复合索引时，耗时应基本保持不变（与项目总数无关）。
+
+用法:
+    python scripts/benchmark_project_lookups.py [项目数 ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import FixedFormData, DynamicTableRow  # noqa: E402
+
+FIELDS_PER_SHEET = 20
+ROWS_PER_TABLE = 20
+LOOKUPS = 500
+SHEET_NAME = 'sheet'
+SHEET_ID = 1
+
+
+def populate(project_count):
+    projects = [{"id": i, "name": f"P{i}", "number": f"N{i}", "procurement_method": "bench"}
+                for i in range(1, project_count + 1)]
+    db.session.execute(db.metadata.tables['project'].insert(), projects)
+    db.session.execute(db.text(
+        "INSERT INTO template (id, name, version, status, is_latest, display_order) "
+        "VALUES (1, 'bench', 1, 'published', 1, 0)"))
+    db.session.execute(db.text("INSERT INTO section (id, template_id, name, display_order) VALUES (1, 1, 's', 0)"))
+    db.session.execute(db.text(
+        "INSERT INTO sheet_definition (id, section_id, name, sheet_type, display_order) "
+        "VALUES (1, 1, 'sheet', 'dynamic_table', 0)"))
+    for start in range(1, project_count + 1, 1000):
+        ids = range(start, min(start + 1000, project_count + 1))
+        db.session.execute(FixedFormData.__table__.insert(), [
+            {"project_id": p, "sheet_name": SHEET_NAME, "field_name": f"f{i}", "field_value": "x", "revision": 0}
+            for p in ids for i in range(FIELDS_PER_SHEET)])
+        db.session.execute(DynamicTableRow.__table__.insert(), [
+            {"project_id": p, "sheet_id": SHEET_ID, "data": {"a": i}, "display_order": i, "revision": 0}
+            for p in ids for i in range(ROWS_PER_TABLE)])
+    db.session.commit()
+    db.session.execute(db.text("ANALYZE"))
+
+
+def fixed_form_query(project_id):
+    return FixedFormData.query.filter_by(project_id=project_id, sheet_name=SHEET_NAME)
+
+
+def dynamic_table_query(project_id):
+    return DynamicTableRow.query.filter_by(project_id=project_id, sheet_id=SHEET_ID) \
+        .order_by(DynamicTableRow.display_order)
+
+
+def explain(query):
+    statement = query.statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    return '; '.join(row[-1] for row in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {statement}")))
+
+
+def measure(project_count):
+    ids = [random.randint(1, project_count) for _ in range(LOOKUPS)]
+    timings = {}
+    for name, build in (("fixed_form", fixed_form_query), ("dynamic_table", dynamic_table_query)):
+        start = time.perf_counter()
+        for project_id in ids:
+            build(project_id).all()
+        timings[name] = (time.perf_counter() - start) / LOOKUPS * 1000
+        db.session.expunge_all()
+    return timings
+
+
+def main(counts):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'projects':>10} {'fixed_form ms':>15} {'dynamic_table ms':>18}")
+        plans = None
+        for count in counts:
+            app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp, f'bench_{count}.db')}"})
+            with app.app_context():
+                db.create_all()
+                populate(count)
+                timings = measure(count)
+                print(f"{count:>10} {timings['fixed_form']:>15.3f} {timings['dynamic_table']:>18.3f}")
+                plans = (explain(fixed_form_query(1)), explain(dynamic_table_query(1)))
+                db.session.remove()
+                db.engine.dispose()
+        print(f"\nfixed_form plan:    {plans[0]}")
+        print(f"dynamic_table plan: {plans[1]}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 50000])